@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db_utils import close_connections
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # the app works on relative db/ and data/ paths, so each test gets its own
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "db").mkdir()
+    (tmp_path / "data").mkdir()
+    yield tmp_path
+    close_connections()
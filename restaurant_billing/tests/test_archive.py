@@ -0,0 +1,33 @@
+import os
+from utils.archive import append_bills, load_columns, load_dictionaries, list_partitions
+from utils.billing import build_bill, make_line
+
+
+def _bill(oid, ts):
+    return build_bill(oid, [make_line("Paneer Tikka", 2, 180, 5), make_line("Lassi", 1, 60, 5)], timestamp=ts)
+
+
+def test_replayed_outbox_seqs_are_not_archived_twice(tmp_path):
+    root = str(tmp_path / "archive")
+    bills = [_bill(1, "2025-08-14 20:03:21"), _bill(2, "2025-08-31 23:00:00"), _bill(3, "2025-09-01 08:00:00")]
+    assert append_bills(bills[:2], root, seqs=[1, 2]) == 4
+    # a crash before the checkpoint: the batch comes again, now with one more bill
+    assert append_bills(bills, root, seqs=[1, 2, 3]) == 2
+    assert append_bills(bills, root, seqs=[1, 2, 3]) == 0
+    assert [os.path.basename(p) for p in list_partitions(root)] == ["2025-08", "2025-09"]
+    cols = load_columns(["order_id", "item_name", "quantity", "line_total"], root=root)
+    names = load_dictionaries(root)["item_name"]
+    assert list(cols["order_id"]) == [1, 1, 2, 2, 3, 3]
+    assert [names[c] for c in cols["item_name"]] == ["Paneer Tikka", "Lassi"] * 3
+    assert list(cols["quantity"]) == [2, 1] * 3
+    assert list(cols["line_total"]) == [360.0, 60.0] * 3
+
+
+def test_torn_append_is_cut_back_to_the_committed_rows(tmp_path):
+    root = str(tmp_path / "archive")
+    append_bills([_bill(1, "2025-08-14 20:03:21")], root)
+    # bytes of an append that died before meta.json was rewritten
+    with open(os.path.join(root, "2025-08", "order_id.bin"), "ab") as f:
+        f.write(b"\xff" * 12)
+    append_bills([_bill(2, "2025-08-15 10:00:00")], root)
+    assert list(load_columns(["order_id"], root=root)["order_id"]) == [1, 1, 2, 2]
@@ -0,0 +1,39 @@
+import random
+import pytest
+from utils.calculator import (calculate_totals, discount_paise, line_totals, order_totals, to_basis_points,
+                              to_paise)
+
+
+def test_half_up_rounding_edges():
+    assert [to_paise(v) for v in ("0.005", "0.004", 2.675, "-0.005")] == [1, 0, 268, -1]
+    assert to_basis_points("12.345") == 1235 and to_basis_points(5) == 500
+    # GST of exactly half a paisa rounds up, just under half rounds down
+    assert line_totals(1, 10, 500) == (10, 1)
+    assert line_totals(1, 9, 500) == (9, 0)
+    assert line_totals(3, 10, 500) == (30, 2)
+    assert discount_paise(5, 1000) == 1 and discount_paise(4, 1000) == 0
+    assert order_totals([(1, 10, 500), (1, 10, 500)], 1000) == (20, 2, 2, 20)
+
+
+def test_calculate_totals_keeps_line_amounts_and_flat_gst():
+    # (name, qty, line amount): item[2] is already qty * price
+    order = [("Paneer Tikka", 2, 360.0), ("Lassi", 1, 60.0)]
+    assert calculate_totals(order, 10) == (420.0, 21.0, 42.0, 399.0)
+    assert calculate_totals([("Chai", 1, 0.1)], 0) == (0.1, 0.01, 0.0, 0.11)
+
+
+def test_price_batch_matches_order_totals_on_unsorted_lines():
+    np = pytest.importorskip("numpy")
+    from utils.calculator import price_batch
+    rng = random.Random(7)
+    lines = [(rng.randrange(1, 40), rng.randrange(1, 5), rng.randrange(1, 99999), rng.choice((0, 500, 1200, 1800)))
+             for _ in range(500)]
+    rng.shuffle(lines)
+    discounts = {oid: rng.choice((0, 500, 1250)) for oid in {line[0] for line in lines}}
+    order_idx, qty, price, gst = (np.array(col) for col in zip(*lines))
+    ids, subtotal, gst_total, discount, total = price_batch(
+        order_idx, qty, price, gst, [discounts[oid] for oid in sorted(discounts)])
+    assert ids.tolist() == sorted(discounts)
+    for i, oid in enumerate(ids.tolist()):
+        expected = order_totals([line[1:] for line in lines if line[0] == oid], discounts[oid])
+        assert (subtotal[i], gst_total[i], discount[i], total[i]) == expected
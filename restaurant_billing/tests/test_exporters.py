@@ -0,0 +1,47 @@
+import json
+import pytest
+from utils.billing import build_bill, make_line, save_bills_to_db
+from utils.db_utils import initialize_database
+from utils.exporters import export_bills, iter_bills
+
+# order ids deliberately out of timestamp order, with ties on the timestamp
+ORDERS = [(5, "2025-03-01 10:00:00"), (2, "2025-03-01 10:00:00"), (9, "2025-03-01 10:00:00"),
+          (1, "2025-03-02 09:00:00"), (7, "2025-03-02 09:00:00"), (3, "2025-03-03 12:00:00"),
+          (8, "2025-02-28 23:59:59")]
+
+
+def _seed():
+    initialize_database()
+    save_bills_to_db([build_bill(oid, [make_line("Paneer Tikka", 1, 180, 5), make_line("Lassi", 2, 60, 5)],
+                                 timestamp=ts) for oid, ts in ORDERS])
+
+
+def test_keyset_pages_cover_every_bill_once(workdir):
+    _seed()
+    pages = []
+    bills = list(iter_bills(page_size=2, progress=pages.append))
+    assert [b["order_id"] for b in bills] == [1, 2, 3, 5, 7, 8, 9]
+    assert pages == [2, 4, 6, 7]
+    # a date range pages on (timestamp, order_id), across the ties
+    ranged = list(iter_bills("2025-03-01", "2025-03-03", page_size=2))
+    assert [b["order_id"] for b in ranged] == [2, 5, 9, 1, 7]
+    assert all(len(b["items"]) == 2 for b in ranged)
+
+
+def test_export_replaces_the_file_only_when_complete(workdir):
+    _seed()
+    path = str(workdir / "bills.json")
+    assert export_bills(path, "json") == len(ORDERS)
+    with open(path, encoding="utf-8") as f:
+        before = f.read()
+    assert [b["order_id"] for b in json.loads(before)] == [1, 2, 3, 5, 7, 8, 9]
+
+    def cancel(done, total):
+        if done:
+            raise KeyboardInterrupt
+    save_bills_to_db([build_bill(10, [make_line("Lassi", 1, 60, 5)], timestamp="2025-03-04 08:00:00")])
+    with pytest.raises(KeyboardInterrupt):
+        export_bills(path, "json", progress=cancel)
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == before
+    assert not (workdir / "bills.json.part").exists()
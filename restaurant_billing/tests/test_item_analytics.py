@@ -0,0 +1,87 @@
+import random
+from collections import Counter
+from utils.billing import build_bill, make_line, save_bills_to_db
+from utils.db_utils import initialize_database
+from utils.item_analytics import SpaceSaving, approx_top_items_between, cover_range, top_items_between
+from utils.rollups import top_items
+
+MENU = {"Paneer Tikka": 180, "Lassi": 60, "Masala Dosa": 90, "Biryani": 250, "Naan": 40, "Kulfi": 70}
+
+
+def _orders(seed=7):
+    # (timestamp, mode, [(name, qty)]) over the end of July to mid September, Naan most often
+    rng = random.Random(seed)
+    names = list(MENU)
+    orders = []
+    for day in range(60):
+        month, dom = (7, 25 + day) if day < 7 else ((8, day - 6) if day < 38 else (9, day - 37))
+        for n in range(rng.randint(1, 4)):
+            picks = rng.sample(names, 2) + ["Naan"]
+            orders.append((f"2025-{month:02d}-{dom:02d} 1{n}:00:00", rng.choice(["Dine-In", "Takeaway"]),
+                           [(name, rng.randint(1, 3)) for name in picks]))
+    return orders
+
+
+def _load(orders):
+    initialize_database()
+    save_bills_to_db([build_bill(i + 1, [make_line(name, qty, MENU[name], 5) for name, qty in lines],
+                                 mode=mode, timestamp=ts) for i, (ts, mode, lines) in enumerate(orders)])
+
+
+def _exact(orders, start, end, mode="*"):
+    qty = Counter()
+    for ts, m, lines in orders:
+        if start <= ts[:10] < end and mode in ("*", m):
+            for name, q in lines:
+                qty[name] += q
+    return qty
+
+
+def test_space_saving_bounds():
+    stream = ["a"] * 50 + ["b"] * 30 + [f"x{i}" for i in range(40)]
+    random.Random(1).shuffle(stream)
+    sketch = SpaceSaving(capacity=5)
+    for item in stream:
+        sketch.add(item)
+    assert sketch.total == len(stream)
+    top = {name: (count, error) for name, count, error in sketch.top(2)}
+    assert set(top) == {"a", "b"}
+    for name, truth in (("a", 50), ("b", 30)):
+        count, error = top[name]
+        assert count - error <= truth <= count
+
+
+def test_cover_range_uses_whole_months():
+    assert cover_range("2025-07-30", "2025-09-02") == [
+        ("Daily", "2025-07-30"), ("Daily", "2025-07-31"), ("Monthly", "2025-08"),
+        ("Daily", "2025-09-01")]
+
+
+def test_top_items_match_the_bills(workdir):
+    orders = _orders()
+    _load(orders)
+    august = _exact(orders, "2025-08-01", "2025-09-01")
+    assert [(n, q) for n, q, _ in top_items("Monthly", "2025-08", k=3)] == august.most_common(3)
+    takeaway = _exact(orders, "2025-08-14", "2025-08-15", "Takeaway")
+    got = top_items("Daily", "2025-08-14", mode="Takeaway", k=10)
+    assert {n: q for n, q, _ in got} == dict(takeaway)
+    by_revenue = top_items("Monthly", "2025-08", k=1, by="revenue")[0]
+    assert by_revenue[2] == max(q * MENU[n] for n, q in august.items())
+
+    exact = _exact(orders, "2025-07-30", "2025-09-03")
+    expected = sorted(exact.items(), key=lambda kv: (-kv[1], kv[0]))[:4]
+    assert [(n, q) for n, q, _ in top_items_between("2025-07-30", "2025-09-03", k=4)] == expected
+    approx = approx_top_items_between("2025-07-30", "2025-09-03", k=4)
+    assert [(n, q) for n, q, _ in approx] == expected
+    assert all(error == 0 for _, _, error in approx)
+
+
+def test_approx_top_items_stay_within_their_error(workdir):
+    orders = _orders()
+    _load(orders)
+    exact = _exact(orders, "2025-07-25", "2025-09-23")
+    approx = approx_top_items_between("2025-07-25", "2025-09-23", k=3, capacity=2)
+    assert approx[0][0] == "Naan"
+    for name, estimate, error in approx:
+        # truncated periods can undercount as well as the sketch overcounting
+        assert abs(estimate - exact[name]) <= error
@@ -0,0 +1,29 @@
+import sqlite3
+from utils.db_utils import DB_PATH, add_menu_item, initialize_database
+from utils.menu_cache import MenuCache, fetch_menu_version
+
+
+def test_every_menu_edit_bumps_the_version_other_terminals_poll(workdir):
+    initialize_database()
+    cache = MenuCache()
+    assert cache.refresh() and cache.items == []
+    assert not cache.changed() and not cache.refresh()
+
+    # another terminal, on its own connection
+    other = sqlite3.connect(DB_PATH)
+    start = fetch_menu_version()
+    with other:
+        other.execute("INSERT INTO menu (item_name, category, price, gst) VALUES ('Lassi', 'Drinks', 60, 5)")
+    assert fetch_menu_version() == start + 1 and cache.changed()
+    assert cache.refresh() and cache.items == [("Lassi", 60.0, 5.0)]
+    with other:
+        other.execute("UPDATE menu SET price = 70 WHERE item_name = 'Lassi'")
+        # no row matched: nothing changed, no bump
+        other.execute("UPDATE menu SET price = 1 WHERE item_name = 'Nothing'")
+    assert fetch_menu_version() == start + 2
+    assert cache.refresh() and cache.items == [("Lassi", 70.0, 5.0)]
+    with other:
+        other.execute("DELETE FROM menu")
+    other.close()
+    assert cache.refresh() and cache.items == []
+    assert add_menu_item("Chai", "Drinks", 20, 5) and cache.changed()
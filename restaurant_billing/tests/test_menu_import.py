@@ -0,0 +1,42 @@
+import csv
+from utils.db_utils import add_menu_item, get_connection, initialize_database
+from utils.menu_import import import_menu_csv
+
+MENU_CSV = """item_name,category,price,gst
+Paneer Tikka,Starters,200,5
+Lassi,Drinks,60,5
+Masala Dosa,Mains,120,5
+,Mains,100,5
+Chai,Drinks,free,5
+Lassi,Drinks,65,5
+"""
+
+
+def _read(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_dry_run_reports_every_row_and_writes_nothing(workdir):
+    initialize_database()
+    add_menu_item("Paneer Tikka", "Starters", 180, 5)
+    add_menu_item("Lassi", "Drinks", 60, 5)
+    (workdir / "menu.csv").write_text(MENU_CSV, encoding="utf-8")
+    counts = import_menu_csv("menu.csv", "report.csv", chunk_size=2, dry_run=True)
+    assert counts == {"added": 1, "updated": 2, "unchanged": 1, "invalid": 2}
+    assert _read("report.csv") == [
+        ["row", "item_name", "status", "detail"],
+        ["2", "Paneer Tikka", "updated", "price 180.0 -> 200.0"],
+        ["3", "Lassi", "unchanged", ""],
+        ["4", "Masala Dosa", "added", ""],
+        ["5", "", "invalid", "item_name is required"],
+        ["6", "Chai", "invalid", "invalid price 'free'"],
+        # a later duplicate is diffed against the earlier row, not the database
+        ["7", "Lassi", "updated", "price 60.0 -> 65.0"],
+    ]
+    conn = get_connection()
+    assert conn.execute("SELECT item_name, price FROM menu ORDER BY id").fetchall() == [("Paneer Tikka", 180.0),
+                                                                                       ("Lassi", 60.0)]
+    assert import_menu_csv("menu.csv", chunk_size=2) == counts
+    assert conn.execute("SELECT item_name, price FROM menu ORDER BY item_name").fetchall() == [
+        ("Lassi", 65.0), ("Masala Dosa", 120.0), ("Paneer Tikka", 200.0)]
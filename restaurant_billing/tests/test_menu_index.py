@@ -0,0 +1,40 @@
+from utils.menu_index import MenuIndex
+from utils.workload import generate_menu
+
+NAMES = ["Paneer Tikka", "Paneer Tikka Masala", "Pani Puri", "Chicken Tikka", "Masala Dosa", "Café Latte",
+         "Butter Chicken"]
+
+
+def _index(names=NAMES):
+    return MenuIndex({"name": name, "price": 100.0, "gst": 5.0} for name in names)
+
+
+def test_name_prefix_then_word_prefix():
+    index = _index()
+    assert index.search("pan") == ["Paneer Tikka", "Paneer Tikka Masala", "Pani Puri"]
+    assert index.search("PANEER tikka", limit=1) == ["Paneer Tikka"]
+    # names starting with the query come before names with a later word starting with it
+    assert index.search("masala", fuzzy=False) == ["Masala Dosa", "Paneer Tikka Masala"]
+    # word matches keep menu order
+    assert index.search("tik", fuzzy=False) == ["Paneer Tikka", "Paneer Tikka Masala", "Chicken Tikka"]
+
+
+def test_accents_and_case_are_ignored():
+    index = _index()
+    assert index.get("cafe LATTE")["name"] == "Café Latte"
+    assert index.search("cafe") == ["Café Latte"]
+
+
+def test_typos_fall_back_to_trigram_similarity():
+    index = _index()
+    assert index.search("panner tika")[0] == "Paneer Tikka"
+    assert index.search("buter chiken")[0] == "Butter Chicken"
+    assert index.search("xyzzy") == []
+
+
+def test_typos_on_a_large_menu_still_find_the_dish():
+    index = MenuIndex({"name": it["item_name"]} for it in generate_menu(12000, seed=1))
+    assert len(index) == 12000
+    for query, dish in (("panner tika", "Paneer Tikka"), ("buter chiken", "Butter Chicken"),
+                        ("masla dosa", "Masala Dosa"), ("chiken 65", "Chicken 65")):
+        assert index.search(query)[0] == dish
@@ -0,0 +1,64 @@
+import urllib.request
+import pytest
+from utils import metrics
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+def test_histogram_quantiles_are_bucket_upper_bounds():
+    h = metrics.Histogram(bounds=(0.001, 0.01, 0.1))
+    assert h.quantile(0.5) == 0.0
+    for v in [0.0005] * 90 + [0.005] * 9 + [5.0]:
+        h.observe(v)
+    assert (h.count, h.counts) == (100, [90, 9, 0, 1])
+    assert h.quantile(0.5) == 0.001
+    assert h.quantile(0.95) == 0.01
+    assert h.quantile(1.0) == float("inf")
+
+
+def test_prometheus_text_is_cumulative(fresh):
+    for v in (0.00005, 0.00015, 100.0):
+        fresh.observe("save_bill", v)
+    with fresh.span("receipt"):
+        pass
+    fresh.count("bill_saved")
+    fresh.count("bill_saved", 2)
+    text = fresh.render_prometheus()
+    assert 'rbs_span_seconds_bucket{span="save_bill",le="0.0001"} 1' in text
+    assert 'rbs_span_seconds_bucket{span="save_bill",le="0.0002"} 2' in text
+    assert f'rbs_span_seconds_bucket{{span="save_bill",le="{0.0001 * 2 ** 19!r}"}} 2' in text
+    assert 'rbs_span_seconds_bucket{span="save_bill",le="+Inf"} 3' in text
+    assert 'rbs_span_seconds_count{span="save_bill"} 3' in text
+    assert 'rbs_span_seconds_count{span="receipt"} 1' in text
+    assert 'rbs_events_total{event="bill_saved"} 3' in text
+    assert "bill_saved" in fresh.summary()
+
+
+def test_disabled_records_nothing(fresh, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    with fresh.span("save_bill"):
+        fresh.count("bill_saved")
+    assert fresh.summary() == ""
+
+
+def test_http_scrape_and_profile_arming(fresh):
+    fresh.count("bill_saved")
+    server = fresh.serve(0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(base + "/metrics", timeout=5) as r:
+            assert 'rbs_events_total{event="bill_saved"} 1' in r.read().decode("utf-8")
+        assert not fresh.take_profile()
+        with urllib.request.urlopen(base + "/profile-next-bill", timeout=5) as r:
+            assert r.read() == b"armed\n"
+        assert fresh.take_profile()
+        assert not fresh.take_profile()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,88 @@
+import threading
+import pytest
+from utils.order_ids import MAX_SEQUENCE, OrderIdAllocator, decode_order_id, terminal_id_from_env
+
+NOW = 50_000_000_000  # about 19 months after EPOCH
+
+
+class FakeClock:
+    # milliseconds since EPOCH, set by hand; optional ticks taken on each later read
+    def __init__(self, now):
+        self.now = now
+        self.ticks = []
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        if self.ticks:
+            self.now = self.ticks.pop(0)
+        return self.now
+
+
+def test_ids_unique_and_increasing_across_threads_and_terminals():
+    terminals, threads, per_thread = 4, 4, 5000
+    allocators = [OrderIdAllocator(t) for t in range(terminals)]
+    results = [None] * (terminals * threads)
+    barrier = threading.Barrier(len(results))
+
+    def work(slot, alloc):
+        barrier.wait()
+        results[slot] = [alloc.next_id() for _ in range(per_thread)]
+
+    workers = [threading.Thread(target=work, args=(i, allocators[i % terminals])) for i in range(len(results))]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    ids = [i for r in results for i in r]
+    assert len(set(ids)) == len(ids)
+    assert all(a < b for r in results for a, b in zip(r, r[1:]))
+    assert {decode_order_id(i)[1] for i in ids} == set(range(terminals))
+
+
+def test_clock_stepping_backwards_does_not_reissue_ids():
+    clock = FakeClock(NOW)
+    alloc = OrderIdAllocator(3, clock=clock)
+    before = [alloc.next_id() for _ in range(3)]
+    clock.now = NOW - 1000  # e.g. an NTP correction
+    after = [alloc.next_id() for _ in range(3)]
+    ids = before + after
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    # the stepped-back ids keep the last timestamp and carry on its sequence
+    assert [decode_order_id(i)[2] for i in ids] == [0, 1, 2, 3, 4, 5]
+    assert len({decode_order_id(i)[0] for i in ids}) == 1
+    clock.now = NOW + 1
+    assert decode_order_id(alloc.next_id())[2] == 0
+
+
+def test_sequence_wrap_waits_for_the_next_millisecond():
+    clock = FakeClock(NOW)
+    alloc = OrderIdAllocator(1, clock=clock)
+    ids = [alloc.next_id() for _ in range(MAX_SEQUENCE + 1)]
+    assert decode_order_id(ids[-1])[2] == MAX_SEQUENCE
+    # the 4097th id in one millisecond spins on the clock until it moves on
+    clock.ticks = [NOW, NOW, NOW + 1]
+    reads = clock.reads
+    wrapped = alloc.next_id()
+    assert clock.reads - reads == 3
+    assert wrapped > ids[-1]
+    stamp, terminal, sequence = decode_order_id(wrapped)
+    assert (terminal, sequence) == (1, 0)
+    assert stamp > decode_order_id(ids[-1])[0]
+    assert len(set(ids + [wrapped])) == len(ids) + 1
+
+
+def test_terminal_id_is_required_with_an_order_service(monkeypatch):
+    monkeypatch.delenv("RBS_TERMINAL_ID", raising=False)
+    monkeypatch.delenv("RBS_ORDER_SERVER", raising=False)
+    assert terminal_id_from_env() == 0
+    monkeypatch.setenv("RBS_ORDER_SERVER", "127.0.0.1:8765")
+    with pytest.raises(ValueError):
+        terminal_id_from_env()
+    with pytest.raises(ValueError):
+        OrderIdAllocator()
+    monkeypatch.setenv("RBS_TERMINAL_ID", "7")
+    assert OrderIdAllocator().terminal_id == 7
+    monkeypatch.setenv("RBS_TERMINAL_ID", "1024")
+    with pytest.raises(ValueError):
+        terminal_id_from_env()
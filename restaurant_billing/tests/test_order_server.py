@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from utils.billing import build_bill, make_line
+from utils.db_utils import close_connections, get_connection, initialize_database
+from utils.order_server import OrderClient, OrderServer, RemoteMenuCache
+from utils.persistence import PersistenceWorker
+from utils.tabs import TabManager
+
+
+def _serve(server, ready, stop):
+    async def run():
+        await server.start()
+        ready.set()
+        while not stop.is_set():
+            await asyncio.sleep(0.01)
+        await server.close()
+    asyncio.run(run())
+
+
+def test_resent_commit_is_acknowledged_not_duplicated(workdir):
+    initialize_database()
+    server = OrderServer(port=0, idle=None)
+    ready, stop = threading.Event(), threading.Event()
+    thread = threading.Thread(target=_serve, args=(server, ready, stop))
+    thread.start()
+    try:
+        assert ready.wait(5)
+        client = OrderClient(f"127.0.0.1:{server.port}")
+        bills = [build_bill(oid, [make_line("Paneer Tikka", 2, 180, 5)]) for oid in (101, 102)]
+        assert client.commit(bills[:1]) == [101]
+        # the reply to the first send was lost and the terminal sends it again, with more
+        assert client.commit(bills) == [101, 102]
+        assert client.commit(bills[1:] + bills[1:]) == [102, 102]
+        client.close()
+    finally:
+        stop.set()
+        thread.join(5)
+    close_connections()
+    conn = get_connection()
+    assert conn.execute("SELECT order_id, COUNT(*) FROM order_items GROUP BY order_id").fetchall() == [(101, 1), (102, 1)]
+    assert conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0] == 2
+
+
+def test_terminal_tabs_are_written_by_the_service(workdir):
+    initialize_database()
+    server = OrderServer(port=0, idle=None)
+    ready, stop = threading.Event(), threading.Event()
+    thread = threading.Thread(target=_serve, args=(server, ready, stop))
+    thread.start()
+    try:
+        assert ready.wait(5)
+        client = OrderClient(f"127.0.0.1:{server.port}")
+        writer = PersistenceWorker(commit=client.commit, write_tabs=client.write_tabs, idle=None)
+        tabs = TabManager(terminal_id=4, write=writer.submit_tabs)
+        tab = tabs.open("Table 2")
+        tabs.add_line(tab, make_line("Paneer Tikka", 2, 180, 5))
+        writer.flush()
+        assert get_connection().execute("SELECT label FROM open_tab_items i JOIN open_tabs t "
+                                        "ON t.tab_id = i.tab_id").fetchall() == [("Table 2",)]
+        writer.submit(tabs.finalize(tab, 201))
+        writer.stop()
+        assert [err for _, err in writer.poll()] == [None]
+        client.close()
+    finally:
+        stop.set()
+        thread.join(5)
+    close_connections()
+    conn = get_connection()
+    assert conn.execute("SELECT order_id, item_name FROM order_items").fetchall() == [(201, "Paneer Tikka")]
+    assert conn.execute("SELECT COUNT(*) FROM open_tabs").fetchone()[0] == 0
+
+
+def test_menu_edits_go_through_the_service(workdir):
+    initialize_database()
+    server = OrderServer(port=0, idle=None)
+    ready, stop = threading.Event(), threading.Event()
+    thread = threading.Thread(target=_serve, args=(server, ready, stop))
+    thread.start()
+    try:
+        assert ready.wait(5)
+        client = OrderClient(f"127.0.0.1:{server.port}")
+        menu = RemoteMenuCache(client)
+        menu.refresh()
+        assert client.add_menu_item("Masala Dosa", "South Indian", 120, 5) is True
+        assert client.add_menu_item("masala dosa", "South Indian", 130, 5) is False
+        assert menu.refresh() and menu.items == [("Masala Dosa", 120.0, 5.0)]
+        assert client.delete_menu_item("MASALA DOSA") == 1
+        assert client.delete_menu_item("Masala Dosa") is None
+        assert menu.refresh() and menu.items == []
+        client.close()
+    finally:
+        stop.set()
+        thread.join(5)
@@ -0,0 +1,39 @@
+import threading
+import pytest
+from utils.billing import build_bill, make_line, save_bills_to_db
+from utils.db_utils import get_connection, initialize_database
+from utils.filelock import LockBusy, dir_lock
+from utils.outbox import checkpoint, sync_artifact, sync_artifacts
+
+
+def _commit(*order_ids):
+    save_bills_to_db([build_bill(oid, [make_line("Paneer Tikka", 1, 180, 5)]) for oid in order_ids])
+
+
+def test_skipped_artifact_holds_back_the_trim(workdir):
+    initialize_database()
+    archive, store = str(workdir / "data" / "archive"), str(workdir / "data" / "bill_store")
+    _commit(1, 2, 3)
+    assert sync_artifacts(archive_dir=archive, store_dir=None) == {"archive": 3}
+    # the bill store never consumed these rows, so they must stay
+    assert get_connection().execute("SELECT COUNT(*) FROM outbox").fetchone()[0] == 3
+    assert sync_artifacts(archive_dir=archive, store_dir=store) == {"archive": 0, "bill_store": 3}
+    assert get_connection().execute("SELECT COUNT(*) FROM outbox").fetchone()[0] == 0
+
+
+def test_sync_waits_for_the_directory_lock(workdir):
+    initialize_database()
+    archive = str(workdir / "data" / "archive")
+    _commit(1, 2)
+    result = []
+    with dir_lock(archive):
+        with pytest.raises(LockBusy):
+            with dir_lock(archive, wait=False):
+                pass
+        t = threading.Thread(target=lambda: result.append(sync_artifact("archive", archive)))
+        t.start()
+        t.join(0.3)
+        assert t.is_alive() and checkpoint("archive") == 0
+    t.join(5)
+    assert result == [2]
+    assert checkpoint("archive") == get_connection().execute("SELECT MAX(seq) FROM outbox").fetchone()[0]
@@ -0,0 +1,22 @@
+from utils import metrics
+from utils.persistence import PersistenceWorker
+
+
+def test_profiled_bill_is_committed_and_profiled_on_the_writer(workdir, monkeypatch):
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(workdir / "profiles"))
+    committed = []
+
+    def commit(bills):
+        if any(b["order_id"] == 2 for b in bills):
+            raise ValueError("disk full")
+        committed.extend(b["order_id"] for b in bills)
+
+    writer = PersistenceWorker(commit=commit, idle=None, write_tabs=lambda ops: None)
+    writer.submit({"order_id": 1})
+    writer.submit_profiled({"order_id": 2}, "bill_2_commit")
+    writer.submit({"order_id": 3})
+    writer.stop()
+    assert committed == [1, 3]
+    # the failure comes back through poll(), like any other bill
+    assert [([b["order_id"] for b in batch], str(err)) for batch, err in writer.poll() if err] == [([2], "disk full")]
+    assert (workdir / "profiles" / "bill_2_commit.prof").exists()
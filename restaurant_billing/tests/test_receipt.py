@@ -0,0 +1,42 @@
+import os
+from utils.billing import build_bill, make_line
+from utils.receipt import (ALIGN_CENTER, ALIGN_LEFT, BOLD_OFF, BOLD_ON, INIT, PARTIAL_CUT, WIDTH,
+                           format_receipt, print_receipt, to_escpos)
+
+
+def _bill():
+    lines = [make_line("Paneer Tikka", 2, 180, 5), make_line("Masala Dosa with extra chutney and sambar", 1, 90, 5)]
+    return build_bill(42, lines, discount_pct=10, timestamp="2026-01-01 12:00:00")
+
+
+def test_escpos_bytes_frame_the_text_receipt():
+    bill = _bill()
+    data = to_escpos(bill)
+    assert data.startswith(INIT + b"\x1bt\x00" + ALIGN_CENTER + BOLD_ON)
+    assert data.endswith(b"\x1bd\x04" + PARTIAL_CUT)
+    assert not to_escpos(bill, cut=False).endswith(PARTIAL_CUT)
+    # the printable text is the plain receipt with the control codes stripped
+    text = data
+    for code in (INIT, b"\x1bt\x00", ALIGN_CENTER, ALIGN_LEFT, BOLD_ON, BOLD_OFF, b"\x1d!\x11", b"\x1d!\x00",
+                 b"\x1bd\x04", PARTIAL_CUT):
+        text = text.replace(code, b"")
+    plain = format_receipt(bill)
+    assert text.decode("cp437") == "Restaurant Bill\n" + plain.split("\n", 1)[1]
+    body = plain.splitlines()
+    assert all(len(line) <= WIDTH for line in body)
+    assert body[-1].startswith("TOTAL") and body[-1].endswith(f"Rs{bill['total']:.2f}")
+    assert "Discount" in plain and "10.0%" in plain
+
+
+def test_print_receipt_spools_one_file_per_bill(tmp_path):
+    bill = _bill()
+    dest, ms = print_receipt(bill, str(tmp_path))
+    assert ms >= 0
+    assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(dest)]
+    assert os.path.basename(dest).startswith("receipt_42_")
+    with open(dest, "rb") as f:
+        assert f.read() == to_escpos(bill)
+    device = tmp_path / "lp0"
+    print_receipt(bill, str(device))
+    print_receipt(bill, str(device))
+    assert device.read_bytes() == to_escpos(bill) * 2
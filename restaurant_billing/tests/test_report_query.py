@@ -0,0 +1,72 @@
+from datetime import datetime
+import pytest
+from utils.billing import build_bill, make_line, save_bills_to_db
+from utils.db_utils import get_connection, initialize_database
+from utils.report_query import build_report_sql, fetch_report, run_report
+
+# (timestamp, mode, payment, [(item, qty, price)]); 2025-08-15 is a Friday, 08-16 a Saturday
+ORDERS = [
+    ("2025-08-15 19:05:00", "Dine-In", "Cash", [("Paneer Tikka", 2, 180), ("Lassi", 1, 60)]),
+    ("2025-08-15 20:30:00", "Takeaway", "UPI", [("Biryani", 1, 250)]),
+    ("2025-08-15 22:10:00", "Dine-In", "UPI", [("Lassi", 3, 60)]),
+    ("2025-08-16 13:00:00", "Dine-In", "Card", [("Paneer Tikka", 1, 180), ("Biryani", 2, 250)]),
+    ("2025-08-16 21:59:59", "Takeaway", "UPI", [("Lassi", 1, 60), ("Naan", 4, 40)]),
+    ("2025-08-17 19:00:00", "Dine-In", "Cash", [("Naan", 2, 40)]),
+]
+
+
+@pytest.fixture
+def db(workdir):
+    initialize_database()
+    save_bills_to_db([build_bill(i + 1, [make_line(n, q, p, 5) for n, q, p in lines], mode=mode,
+                                 payment_method=pay, timestamp=ts)
+                      for i, (ts, mode, pay, lines) in enumerate(ORDERS)])
+    return get_connection()
+
+
+def _totals(conn, order_ids):
+    return conn.execute(f"SELECT order_id, total FROM orders WHERE order_id IN ({','.join('?' * len(order_ids))})",
+                        order_ids).fetchall()
+
+
+def test_order_filters_combine(db):
+    # Friday and Saturday evenings, 7-10pm inclusive of the 21:xx hour, paid by UPI
+    columns, rows = run_report(hours=(19, 21), weekdays=[5, 6], payments=["UPI"], group_by="day")
+    assert columns == ["day", "orders", "total_sales", "subtotal", "gst", "avg_ticket"]
+    totals = dict(_totals(db, [2, 5]))
+    assert [row[:3] for row in rows] == [("2025-08-15", 1, totals[2]), ("2025-08-16", 1, totals[5])]
+
+    _, rows = run_report(start="2025-08-15", end=datetime(2025, 8, 16, 21, 59, 59), group_by="mode")
+    assert [row[:2] for row in rows] == [("Dine-In", 3), ("Takeaway", 1)]
+    _, rows = run_report(modes=["Takeaway", ""], group_by="none")
+    assert list(rows)[0][:2] == ("all", 2)
+    _, rows = run_report(group_by="weekday")
+    assert [row[:2] for row in rows] == [("Sun", 1), ("Fri", 3), ("Sat", 2)]
+
+
+def test_item_filters_join_order_items(db):
+    columns, rows = run_report(items=["Lassi"], group_by="payment")
+    assert columns == ["payment", "orders", "quantity", "revenue"]
+    assert list(rows) == [("UPI", 2, 4, 240.0), ("Cash", 1, 1, 60.0)]
+    _, rows = run_report(start="2025-08-16", group_by="item")
+    rows = list(rows)
+    assert [row[2] for row in rows] == [6, 2, 1, 1]
+    assert set(rows) == {("Naan", 2, 6, 240.0), ("Biryani", 1, 2, 500.0), ("Lassi", 1, 1, 60.0),
+                         ("Paneer Tikka", 1, 1, 180.0)}
+
+
+def test_sql_is_parameterised_and_uses_the_report_index(db):
+    sql, params, _ = build_report_sql(start="2025-08-01", payments=["x' OR 1=1 --"], group_by="payment")
+    assert "OR 1=1" not in sql and params == ["2025-08-01", "x' OR 1=1 --"]
+    assert db.execute(sql, params).fetchall() == []
+    plan = " ".join(row[-1] for row in db.execute("EXPLAIN QUERY PLAN " + sql, params))
+    assert "COVERING INDEX idx_orders_report" in plan
+    with pytest.raises(ValueError):
+        build_report_sql(group_by="table")
+
+
+def test_fetch_report_reports_progress(db):
+    seen = []
+    columns, rows = fetch_report(group_by="item", progress=seen.append, chunk_size=2)
+    assert len(rows) == 4 and seen == [2, 4]
+    assert columns[0] == "item"
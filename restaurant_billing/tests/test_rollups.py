@@ -0,0 +1,47 @@
+import threading
+from utils.billing import build_bill, make_line, save_bills_to_db
+from utils.db_utils import get_connection, initialize_database, transaction
+from utils.rollups import fetch_sales_summary, rebuild_rollups
+
+
+def _bills(first_id, timestamps):
+    return [build_bill(first_id + i, [make_line("Paneer Tikka", 2, 180, 5), make_line("Lassi", 1, 60, 5)],
+                       discount_pct=10 if i % 2 else 0, mode="Takeaway" if i % 3 else "Dine-In", timestamp=ts)
+            for i, ts in enumerate(timestamps)]
+
+
+def _snapshot(conn):
+    return (conn.execute("SELECT * FROM sales_rollup ORDER BY 1, 2").fetchall(),
+            conn.execute("SELECT * FROM item_rollup ORDER BY 1, 2, 3, 4").fetchall())
+
+
+def test_incremental_rollups_match_a_rebuild(workdir):
+    initialize_database()
+    save_bills_to_db(_bills(1, ["2025-08-14 20:03:21", "2025-08-14 21:00:00", "2025-08-18 09:30:00"]))
+    save_bills_to_db(_bills(10, ["2025-09-01 12:00:00"]))
+    conn = get_connection()
+    incremental = _snapshot(conn)
+    assert [row[:2] for row in fetch_sales_summary("Daily")] == [("2025-08-14", 2), ("2025-08-18", 1),
+                                                                 ("2025-09-01", 1)]
+    with transaction() as cur:
+        rebuild_rollups(cur)
+    assert _snapshot(conn) == incremental
+
+
+def test_bills_committed_during_a_rebuild_are_not_lost(workdir):
+    initialize_database()
+    save_bills_to_db(_bills(1, ["2025-08-14 20:03:21", "2025-08-15 10:00:00"]))
+    writer = threading.Thread(target=save_bills_to_db, args=(_bills(100, ["2025-08-15 11:00:00"]),))
+    with transaction() as cur:
+        rebuild_rollups(cur)
+        # the bill insert queues on the write lock the rebuild holds
+        writer.start()
+        writer.join(0.3)
+        assert writer.is_alive()
+    writer.join(5)
+    conn = get_connection()
+    assert dict(row[:2] for row in fetch_sales_summary("Daily")) == {"2025-08-14": 1, "2025-08-15": 2}
+    live = _snapshot(conn)
+    with transaction() as cur:
+        rebuild_rollups(cur)
+    assert _snapshot(conn) == live
@@ -0,0 +1,80 @@
+import sqlite3
+from utils.db_utils import (DB_PATH, SCHEMA_VERSION, check_query_plans, close_connections, get_connection,
+                            initialize_database, schema_version)
+
+# the tables as the first release created them: no foreign key, no indexes, user_version 0
+BASELINE_SCHEMA = '''
+    CREATE TABLE menu (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_name TEXT NOT NULL UNIQUE,
+        category TEXT,
+        price REAL NOT NULL,
+        gst REAL DEFAULT 0
+    );
+    CREATE TABLE orders (
+        order_id INTEGER PRIMARY KEY,
+        mode TEXT,
+        payment_method TEXT,
+        subtotal REAL,
+        gst REAL,
+        discount REAL,
+        total REAL,
+        timestamp TEXT
+    );
+    CREATE TABLE order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER,
+        item_name TEXT,
+        quantity INTEGER,
+        price REAL,
+        gst REAL DEFAULT 0
+    );
+'''
+
+
+def _indexes(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA index_list({table})")}
+
+
+def test_hot_queries_use_their_indexes(workdir):
+    initialize_database()
+    assert check_query_plans() == {}
+
+
+def test_baseline_database_is_upgraded_in_place(workdir):
+    conn = sqlite3.connect(DB_PATH)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO orders VALUES (1, 'Dine-In', 'Cash', 200, 10, 0, 210, '2025-08-14 20:03:21')")
+    conn.execute("INSERT INTO order_items (order_id, item_name, quantity, price, gst) "
+                 "VALUES (1, 'Paneer Tikka', 2, 100, 5)")
+    conn.commit()
+    conn.close()
+
+    initialize_database()
+    close_connections()
+    conn = get_connection()
+    assert schema_version(conn) == SCHEMA_VERSION
+    fks = conn.execute("PRAGMA foreign_key_list(order_items)").fetchall()
+    assert [(fk[2], fk[3], fk[4], fk[6]) for fk in fks] == [("orders", "order_id", "order_id", "CASCADE")]
+    assert "idx_order_items_order_id" in _indexes(conn, "order_items")
+    assert {"idx_orders_timestamp", "idx_orders_report"} <= _indexes(conn, "orders")
+    assert conn.execute("SELECT order_id, item_name, quantity FROM order_items").fetchall() == [(1, "Paneer Tikka", 2)]
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    assert check_query_plans(conn) == {}
+
+
+def test_order_lines_without_an_order_are_quarantined(workdir):
+    conn = sqlite3.connect(DB_PATH)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO orders VALUES (1, 'Dine-In', 'Cash', 200, 10, 0, 210, '2025-08-14 20:03:21')")
+    conn.executemany("INSERT INTO order_items (order_id, item_name, quantity, price, gst) VALUES (?, ?, ?, ?, ?)",
+                     [(1, "Paneer Tikka", 2, 100, 5), (7, "Dal Makhani", 1, 150, 5)])
+    conn.commit()
+    conn.close()
+
+    initialize_database()
+    close_connections()
+    conn = get_connection()
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    assert conn.execute("SELECT order_id, item_name FROM order_items").fetchall() == [(1, "Paneer Tikka")]
+    assert conn.execute("SELECT id, order_id, item_name FROM order_items_orphans").fetchall() == [(2, 7, "Dal Makhani")]
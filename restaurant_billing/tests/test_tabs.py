@@ -0,0 +1,56 @@
+from utils.billing import make_line
+from utils.db_utils import get_connection, initialize_database
+from utils.order_ids import next_order_id
+from utils.persistence import PersistenceWorker
+from utils.tabs import TabManager, apply_tab_ops
+
+
+def _rows(sql):
+    return get_connection().execute(sql).fetchall()
+
+
+def test_tab_ops_go_through_the_writer_with_the_bills(workdir):
+    initialize_database()
+    writer = PersistenceWorker(idle=None)
+    tabs = TabManager(terminal_id=2, write=writer.submit_tabs)
+    t5 = tabs.open("Table 5")
+    tabs.add_line(t5, make_line("Paneer Tikka", 2, 180, 5))
+    tabs.add_line(t5, make_line("Lassi", 1, 60, 5))
+    tabs.update(t5, mode="Takeaway", discount_pct=10.0)
+    t7 = tabs.open("Table 7")
+    tabs.add_line(t7, make_line("Tea", 3, 20, 5))
+    writer.flush()
+    assert _rows("SELECT label, mode, discount_pct FROM open_tabs ORDER BY tab_id") == [
+        ("Table 5", "Takeaway", 10.0), ("Table 7", "Dine-In", 0.0)]
+
+    reloaded = TabManager(terminal_id=2)
+    reloaded.load()
+    again = reloaded.get("Table 5")
+    assert [l["name"] for l in again.lines] == ["Paneer Tikka", "Lassi"]
+    assert again.amounts == t5.amounts and again.totals.final(10.0) == t5.totals.final(10.0)
+
+    # a line added right before billing is written before the bill removes the tab
+    tabs.add_line(t7, make_line("Samosa", 2, 25, 5))
+    writer.submit(tabs.finalize(t7, next_order_id()))
+    tabs.close(t5)
+    writer.flush()
+    writer.stop()
+    assert [err for _, err in writer.poll()] == [None]
+    assert _rows("SELECT COUNT(*) FROM open_tabs") == [(0,)]
+    assert _rows("SELECT COUNT(*) FROM open_tab_items") == [(0,)]
+    assert _rows("SELECT item_name FROM order_items ORDER BY id") == [("Tea",), ("Samosa",)]
+
+
+def test_replayed_tab_ops_are_harmless(workdir):
+    initialize_database()
+    sent = []
+    tabs = TabManager(terminal_id=1, write=sent.extend)
+    tab = tabs.open("Bar")
+    tabs.add_line(tab, make_line("Tea", 1, 20, 5))
+    tabs.update(tab, payment_method="UPI")
+    apply_tab_ops(sent)
+    apply_tab_ops(sent)
+    assert _rows("SELECT label, payment_method FROM open_tabs") == [("Bar", "UPI")]
+    assert _rows("SELECT item_name, quantity FROM open_tab_items") == [("Tea", 1)]
+    apply_tab_ops([{"op": "update", "tab_id": tab.tab_id, "changes": {"label = 'x', mode": "y"}}])
+    assert _rows("SELECT label FROM open_tabs") == [("Bar",)]
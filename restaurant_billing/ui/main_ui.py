@@ -1,34 +1,71 @@
-import tkinter as tk
 import customtkinter as ctk
-from CTkMessagebox import CTkMessagebox
-import sqlite3 as s
-import hashlib
 import os
 import json
-import pandas as pd
+import tempfile
+import time
 from datetime import datetime
-from fpdf import FPDF
-import platform
-import subprocess
-from collections import Counter
-from utils.db_utils import create_folders, initialize_database, fetch_menu_items
-
-DATA_DIR = os.path.abspath("data")
-BILLS_JSON_DIR = os.path.join(DATA_DIR, "bills")
-CSV_EXPORT_PATH = os.path.join(DATA_DIR, "orders_detailed.csv")
+from utils.db_utils import (create_folders, initialize_database, get_connection,
+                            close_connections, add_menu_item, delete_menu_item)
+from utils.billing import DATA_DIR, BILLS_JSON_DIR, CSV_EXPORT_PATH, make_line, RunningTotals
+from utils.persistence import PersistenceWorker
+from utils.jobs import JobPool, DONE, FAILED
+from utils.tabs import TabManager, DEFAULT_TAB
+from utils.bill_store import open_store, migrate_json_dir
+from utils import metrics
+from utils.rollups import (write_sales_summary, PERIOD_COLUMNS, ALL_MODES, period_key,
+                           top_items)
+from utils.menu_index import MenuIndex
+from utils.menu_cache import MenuCache
+from utils.receipt import format_receipt, print_receipt
+from utils.order_ids import next_order_id, terminal_id_from_env
+from utils.users import check_login, setup_users
+
 SALES_REPORT_PATH = os.path.join(DATA_DIR, "sales_report.csv")
 ALL_BILLS_JSON_PATH = os.path.join(DATA_DIR, "all_bills.json")
-
-os.makedirs(BILLS_JSON_DIR, exist_ok=True)
-os.makedirs(DATA_DIR, exist_ok=True)
-
-def hash_password(pw):
-    return hashlib.sha256(pw.encode()).hexdigest()
+RECEIPTS_DIR = os.path.join(DATA_DIR, "receipts")
+PDF_DIR = os.path.join(DATA_DIR, "pdfs")
+# device file (/dev/usb/lp0), tcp://host:port or spool directory for the receipt printer
+RECEIPT_TARGET = os.environ.get("RBS_RECEIPT_PRINTER", RECEIPTS_DIR)
+# host:port of a local order service (python -m utils.order_server); unset writes the DB directly
+ORDER_SERVER = os.environ.get("RBS_ORDER_SERVER")
+DROPDOWN_LIMIT = 100
+REPORT_ROWS_PER_TICK = 200
+JOB_POLL_MS = 200
+MENU_POLL_MS = 2000
+
+# PDF export (fpdf), the order service client, the exporters and the report query
+# are imported where they are first used so the login window does not wait on them;
+# python -m utils.startup_profile keeps an eye on the import cost
+
+def _report_cell(value):
+    if isinstance(value, float):
+        return f"{value:>12.2f}"
+    return f"{str(value)[:14]:>14}"
+
+def create_data_folders():
+    for d in (DATA_DIR, RECEIPTS_DIR):
+        os.makedirs(d, exist_ok=True)
+
+def migrate_json_bills():
+    # one-time move of the old data/bills/bill_<id>.json files into the bill store;
+    # the folder is renamed afterwards so later starts do not scan it again.
+    # Terminals of an order service leave it alone: only the service may append to
+    # the bill store, so there it is run by hand with the service stopped
+    if ORDER_SERVER or not os.path.isdir(BILLS_JSON_DIR):
+        return
+    migrated, skipped, failed = migrate_json_dir(BILLS_JSON_DIR)
+    if failed:
+        show_msgbox("Warning", f"{len(failed)} bill JSON file(s) in {BILLS_JSON_DIR} could not be read", "warning")
+        return
+    os.replace(BILLS_JSON_DIR, f"{BILLS_JSON_DIR}_migrated_{datetime.now().strftime('%Y%m%d%H%M%S')}")
 
 def show_msgbox(title, message, icon):
+    from CTkMessagebox import CTkMessagebox
     CTkMessagebox(title=title, message=message, icon=icon)
 
 def open_file(path):
+    import platform
+    import subprocess
     try:
         if platform.system() == "Windows":
             os.startfile(path)
@@ -39,31 +76,6 @@ def open_file(path):
     except Exception:
         show_msgbox("Saved", f"File saved: {path}", "check")
 
-def check_login(username, password):
-    conn = s.connect("db/restaurant.db")
-    cur = conn.cursor()
-    cur.execute("SELECT password_hash, role FROM users WHERE username=?", (username,))
-    row = cur.fetchone()
-    conn.close()
-    return row[1] if row and row[0] == hash_password(password) else None
-
-def setup_users():
-    conn = s.connect("db/restaurant.db")
-    cur = conn.cursor()
-    cur.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE,
-        password_hash TEXT,
-        role TEXT)''')
-    if not cur.execute("SELECT 1 FROM users WHERE username='admin'").fetchone():
-        cur.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                    ("admin", hash_password("admin123"), "admin"))
-    if not cur.execute("SELECT 1 FROM users WHERE username='cashier'").fetchone():
-        cur.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                    ("cashier", hash_password("cashier123"), "cashier"))
-    conn.commit()
-    conn.close()
-
 class LoginWindow:
     def __init__(self, root):
         self.root = root
@@ -95,6 +107,7 @@ class RestaurantApp:
         self.frame = parent
         self.role = role
         self.order = []
+        self.totals = RunningTotals()
 
         FONT_L = ("Arial", 18, "bold")
         FONT_M = ("Arial", 14)
@@ -110,13 +123,38 @@ class RestaurantApp:
         self.mode_cb = ctk.CTkComboBox(self.frame, values=["Dine-In", "Takeaway"], variable=self.mod_var)
         self.mode_cb.grid(row=0, column=1, sticky="w")
 
+        # open tables/tabs: pick one to switch, or type a new name and press Enter
+        # tab changes go to the bill writer thread with the bills, never to the database from here
+        self.open_tabs = TabManager(write=lambda ops: self.writer.submit_tabs(ops))
+        self.open_tabs.load()
+        self.tab = None
+        ctk.CTkLabel(self.frame, text="Table / Tab:", font=FONT_M).grid(row=0, column=2, sticky="e")
+        self.tab_var = ctk.StringVar(value=DEFAULT_TAB)
+        self.tab_cb = ctk.CTkComboBox(self.frame, values=self.open_tabs.labels() or [DEFAULT_TAB],
+                                      variable=self.tab_var, command=self.switch_tab)
+        self.tab_cb.grid(row=0, column=3, sticky="w")
+        self.tab_cb.bind("<Return>", lambda _e: self.switch_tab(self.tab_var.get()))
+
         self.menu = []
+        self.menu_index = MenuIndex()
+        self.client = None
+        self.menu_cache = MenuCache()
+        if ORDER_SERVER:
+            from utils.order_server import OrderClient, RemoteMenuCache
+            self.client = OrderClient(ORDER_SERVER)
+            self.menu_cache = RemoteMenuCache(self.client)
         self._load_menu_from_db()
+        if self.client:
+            # polls the service off the Tk thread; _poll_menu only looks at the result
+            self.menu_cache.watch(MENU_POLL_MS / 1000)
 
         ctk.CTkLabel(self.frame, text="Select Item:", font=FONT_M).grid(row=1, column=0, sticky="e")
         self.selected_item = ctk.StringVar(value=self.menu[0]['name'] if self.menu else "")
-        self.item_dropdown = ctk.CTkComboBox(self.frame, values=[i['name'] for i in self.menu], variable=self.selected_item)
+        self.item_dropdown = ctk.CTkComboBox(self.frame, values=self.menu_index.names(DROPDOWN_LIMIT), variable=self.selected_item)
         self.item_dropdown.grid(row=1, column=1, sticky="w")
+        self.search_entry = ctk.CTkEntry(self.frame, placeholder_text="Search menu...")
+        self.search_entry.grid(row=1, column=2, sticky="w")
+        self.search_entry.bind("<KeyRelease>", lambda _e: self.filter_menu())
 
         ctk.CTkLabel(self.frame, text="Quantity:", font=FONT_M).grid(row=2, column=0, sticky="e")
         self.quant_entry = ctk.CTkEntry(self.frame)
@@ -151,7 +189,7 @@ class RestaurantApp:
                 return False
         vcmd_float = self.frame.register(_valid_float)
         self.discount_entry.configure(validate="key", validatecommand=(vcmd_float, '%P'))
-        self.discount_var.trace_add("write", lambda *_: self.refresh_order_display())
+        self.discount_var.trace_add("write", lambda *_: self.update_total_label())
 
         ctk.CTkButton(self.frame, text="Generate Bill", command=self.show_bill_summary, fg_color="green", **B).grid(row=8, column=0)
         ctk.CTkButton(self.frame, text="Clear Order", command=self.clear_order, fg_color="red", **B).grid(row=8, column=1)
@@ -163,11 +201,88 @@ class RestaurantApp:
         self.clock_label.grid(row=12, column=0, columnspan=3)
         self.update_clock()
 
-        self.subtotal = 0.0
-        self.gst_total = 0.0
+        self.writer = (PersistenceWorker(commit=self.client.commit, write_tabs=self.client.write_tabs, idle=None)
+                       if self.client else PersistenceWorker())
+        # reports and exports run here so billing carries on while they do
+        self.jobs = JobPool()
+        self.job = None
+        # F9 profiles the next bill with cProfile (also: RBS_PROFILE_BILL=1, /profile-next-bill)
+        self.frame.bind("<F9>", lambda e: self.arm_bill_profile())
+        self._poll_writer()
+        self.frame.after(MENU_POLL_MS, self._poll_menu)
+        self.switch_tab(DEFAULT_TAB if DEFAULT_TAB in self.open_tabs.tabs or not self.open_tabs.tabs
+                        else self.open_tabs.labels()[0])
+
+    def _poll_writer(self):
+        for batch, err in self.writer.poll():
+            if err is not None and not batch:
+                show_msgbox("Error", f"Failed to save open tab changes: {err}", "cancel")
+                # show the tabs as the database has them
+                self.reload_tabs()
+            elif err is not None:
+                ids = ", ".join(str(b["order_id"]) for b in batch)
+                show_msgbox("Error", f"Failed to save order(s) {ids}: {err}", "cancel")
+                if any(b.get("tab_id") is not None for b in batch):
+                    # the failed tabs are still in the database; bring them back
+                    self.reload_tabs()
+        self.frame.after(250, self._poll_writer)
+
+    def _save_tab_header(self):
+        if self.tab is not None and self.open_tabs.get(self.tab.label) is self.tab:
+            self.open_tabs.update(self.tab, self.mode_cb.get(), self.payment_method.get(), self.get_discount_pct())
+
+    def switch_tab(self, label):
+        label = str(label).strip()
+        if not label or (self.tab is not None and label == self.tab.label):
+            return
+        self._save_tab_header()
+        self._show_tab(self.open_tabs.open(label))
+
+    def _show_tab(self, tab):
+        self.tab = tab
+        self.order = tab.lines
+        self.totals = tab.totals
+        self.mod_var.set(tab.mode or "Dine-In")
+        self.payment_method.set(tab.payment_method or "Cash")
+        self.discount_var.set(f"{tab.discount_pct:g}")
+        self.tab_cb.configure(values=self.open_tabs.labels())
+        self.tab_var.set(tab.label)
+        # the tab keeps its totals and line amounts, so this is only the text
+        self.order_listbox.delete("1.0", "end")
+        self.order_listbox.insert("end", "".join(
+            f"{i}. {itm['name']} x{itm['qty']} = ₹{amount:.2f}\n"
+            for i, (itm, amount) in enumerate(zip(tab.lines, tab.amounts), 1)))
+        self.update_total_label()
+
+    def reload_tabs(self):
+        # keep the current tab's mode, payment and discount, then re-read once the
+        # writer has applied every queued tab change (checked, never waited for)
+        self._save_tab_header()
+        if not self.writer.drained():
+            self.frame.after(JOB_POLL_MS, self.reload_tabs)
+            return
+        label = self.tab.label if self.tab is not None else DEFAULT_TAB
+        self.open_tabs.load()
+        self._show_tab(self.open_tabs.get(label) or self.open_tabs.open(label))
+
+    def _poll_menu(self):
+        # picks up price and item changes made on any terminal sharing the database
+        try:
+            if self.menu_cache.changed():
+                self.refresh_menu()
+        finally:
+            self.frame.after(MENU_POLL_MS, self._poll_menu)
+
+    def shutdown(self):
+        self.jobs.stop()
+        self.writer.stop()
+        if self.client:
+            self.menu_cache.stop()
+            self.client.close()
 
     def _load_menu_from_db(self):
-        rows = fetch_menu_items()
+        self.menu_cache.refresh()
+        rows = self.menu_cache.items
         self.menu = []
         seen = set()
         for row in rows:
@@ -180,13 +295,21 @@ class RestaurantApp:
             if name not in seen:
                 self.menu.append({"name": name, "price": price, "gst": gst})
                 seen.add(name)
+        with metrics.span("menu_index_build"):
+            self.menu_index = MenuIndex(self.menu)
 
     def _find_menu_item(self, name):
-        name = str(name).strip()
-        for it in self.menu:
-            if it["name"] == name:
-                return it
-        return None
+        return self.menu_index.get(name)
+
+    def _dropdown_names(self):
+        query = self.search_entry.get() if hasattr(self, "search_entry") else ""
+        return self.menu_index.search(query, DROPDOWN_LIMIT)
+
+    def filter_menu(self):
+        names = self._dropdown_names()
+        self.item_dropdown.configure(values=names)
+        if names:
+            self.selected_item.set(names[0])
 
     def update_clock(self):
         self.clock_label.configure(text=f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -213,221 +336,160 @@ class RestaurantApp:
             show_msgbox("Error", "Invalid item selected", "cancel")
             return
 
-        self.order.append({"name": item["name"], "qty": q, "price": item["price"], "gst": item["gst"]})
-        self.refresh_order_display()
+        itm = make_line(item["name"], q, item["price"], item["gst"])
+        line = self.open_tabs.add_line(self.tab, itm)
+        self.order_listbox.insert("end", f"{len(self.order)}. {itm['name']} x{itm['qty']} = ₹{line:.2f}\n")
+        self.update_total_label()
 
-    def refresh_order_display(self):
-        self.order_listbox.delete("1.0", "end")
-        subtotal = 0.0
-        gst_total = 0.0
-        for i, itm in enumerate(self.order, 1):
-            line = itm['qty'] * itm['price']
-            self.order_listbox.insert("end", f"{i}. {itm['name']} x{itm['qty']} = ₹{line:.2f}\n")
-            subtotal += line
-            gst_total += line * itm['gst'] / 100.0
+    @property
+    def subtotal(self):
+        return self.totals.subtotal
 
-        self.subtotal, self.gst_total = subtotal, gst_total
+    @property
+    def gst_total(self):
+        return self.totals.gst_total
 
-        disc_pct = self.get_discount_pct()
-        discount_amount = disc_pct * self.subtotal / 100.0
-        final = max(0.0, self.subtotal + self.gst_total - discount_amount)
-        self.total_label.configure(text=f"Total: ₹{final:.2f}")
+    def update_total_label(self):
+        self.total_label.configure(text=f"Total: ₹{self.totals.final(self.get_discount_pct()):.2f}")
 
-    def clear_order(self):
-        self.order.clear()
-        self.order_listbox.delete("1.0", "end")
-        self.total_label.configure(text="Total: ₹0")
+    def _leave_tab(self):
+        # the current tab is gone (billed or discarded); back to an empty counter tab
+        self.tab = None
         self.quant_entry.delete(0, "end")
         self.quant_entry.insert(0, "1")
-        self.discount_var.set("0")
         if self.menu:
             self.selected_item.set(self.menu[0]["name"])
         else:
             self.selected_item.set("")
-        self.mode_cb.set("Dine-In")
-        self.payment_method.set("Cash")
-        self.subtotal = 0.0
-        self.gst_total = 0.0
+        self.switch_tab(DEFAULT_TAB)
+
+    def clear_order(self):
+        # discards the current tab and its lines
+        if self.tab is not None:
+            self.open_tabs.close(self.tab)
+        self._leave_tab()
+
+    def arm_bill_profile(self):
+        metrics.arm_profile()
+        show_msgbox("Profiling", f"The next bill will be profiled into {metrics.PROFILE_DIR}", "info")
 
     def show_bill_summary(self):
         if not self.order:
             show_msgbox("Error", "Add items first", "cancel")
             return
+        if metrics.take_profile():
+            label = f"bill_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            # building the bill is profiled here, its commit on the writer thread (<label>_commit)
+            with metrics.profiled(label):
+                self._show_bill_summary(profile=label + "_commit")
+            return
+        with metrics.span("bill_summary"):
+            self._show_bill_summary()
 
-        oid = int(datetime.now().timestamp())
-        disc_pct = self.get_discount_pct()
-        discount_amount = disc_pct * self.subtotal / 100.0
-        final = max(0.0, self.subtotal + self.gst_total - discount_amount)
-
-        mode_val = self.mode_cb.get()
-        payment_val = self.payment_method.get()
-
+    def _show_bill_summary(self, profile=None):
+        oid = next_order_id()
         try:
-            self.save_order_to_db(oid, final, disc_pct, mode_val, payment_val)
-            self.append_order_to_csv(oid, final, disc_pct, mode_val, payment_val)
-            json_path = self.save_order_to_json(oid, final, disc_pct, mode_val, payment_val)
+            self._save_tab_header()
+            with metrics.span("bill_build"):
+                bill = self.open_tabs.finalize(self.tab, oid)
         except Exception as e:
             show_msgbox("Error", f"Failed to save order: {e}", "cancel")
             return
+        metrics.count("bills_generated")
+        # a failed commit is reported by _poll_writer, which brings the tab back
+        if profile:
+            self.writer.submit_profiled(bill, profile)
+        else:
+            self.writer.submit(bill)
+        # the tab's rows are deleted with the order insert; the counter is free right away
+        self._leave_tab()
 
         bill_popup = ctk.CTkToplevel(self.frame)
         bill_popup.title("Bill Summary")
-        bill_popup.geometry("420x520")
+        bill_popup.geometry("420x580")
         bill_popup.lift()
         bill_popup.attributes("-topmost", True)
         bill_popup.focus_force()
 
-        text = ctk.CTkTextbox(bill_popup, width=390, height=420)
+        text = ctk.CTkTextbox(bill_popup, width=390, height=420, font=("Courier", 12))
         text.pack(pady=10)
-        text.insert("end", f"Order ID: {oid}\nMode: {mode_val}\nPayment: {payment_val}\n\n")
-        for itm in self.order:
-            text.insert("end", f"{itm['name']} x{itm['qty']} = ₹{itm['qty']*itm['price']:.2f}\n")
-        text.insert("end",
-                    f"\nSubtotal: ₹{self.subtotal:.2f}"
-                    f"\nGST: ₹{self.gst_total:.2f}"
-                    f"\nDiscount: {disc_pct}%"
-                    f"\nTotal: ₹{final:.2f}")
+        text.insert("end", format_receipt(bill))
         text.configure(state="disabled")
 
+        def print_bill():
+            try:
+                with metrics.span("receipt_print"):
+                    print_receipt(bill, RECEIPT_TARGET)
+            except Exception as e:
+                show_msgbox("Error", f"Receipt print error: {e}", "cancel")
+
         def export_and_close():
             try:
-                self.export_bill_to_pdf(oid, self.order, self.subtotal, self.gst_total, disc_pct)
+                self.export_bill_to_pdf(bill)
             except Exception as e:
                 show_msgbox("Error", f"PDF export error: {e}", "cancel")
             bill_popup.destroy()
-            self.clear_order()
-
-        ctk.CTkButton(bill_popup, text="Export as PDF", command=export_and_close).pack(pady=10)
-        ctk.CTkButton(bill_popup, text="Open JSON Bill", command=lambda oid=oid: self.open_json_bill(oid)).pack(pady=6)
-        if json_path:
-            ctk.CTkLabel(bill_popup, text=f"JSON saved: {json_path}", font=("Arial", 10)).pack(pady=(6,4))
-
-    def save_order_to_db(self, oid, final, disc_pct, mode_val=None, payment_val=None):
-        conn = s.connect("db/restaurant.db")
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO orders (order_id, mode, payment_method, subtotal, gst, discount, total, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            oid,
-            mode_val if mode_val is not None else self.mode_cb.get(),
-            payment_val if payment_val is not None else self.payment_method.get(),
-            float(self.subtotal),
-            float(self.gst_total),
-            float(disc_pct),
-            float(final),
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        ))
-        for itm in self.order:
-            cur.execute(
-                "INSERT INTO order_items(order_id,item_name,quantity,price,gst) VALUES(?,?,?,?,?)",
-                (oid, itm['name'].strip(), int(itm['qty']), float(itm['price']), float(itm['gst']))
-            )
-        conn.commit()
-        conn.close()
-
-    def append_order_to_csv(self, order_id, total, discount_pct, mode_val=None, payment_val=None):
-        rows = []
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        mode = mode_val if mode_val is not None else self.mode_cb.get()
-        payment = payment_val if payment_val is not None else self.payment_method.get()
-        for itm in self.order:
-            line_total = itm['qty'] * itm['price']
-            rows.append({
-                "order_id": order_id,
-                "timestamp": ts,
-                "mode": mode,
-                "payment_method": payment,
-                "item_name": itm['name'],
-                "quantity": itm['qty'],
-                "price": itm['price'],
-                "gst": itm['gst'],
-                "line_total": line_total,
-                "subtotal": self.subtotal,
-                "gst_total": self.gst_total,
-                "discount_pct": discount_pct,
-                "total": total
-            })
-        df = pd.DataFrame(rows)
-        try:
-            if not os.path.exists(CSV_EXPORT_PATH):
-                df.to_csv(CSV_EXPORT_PATH, index=False)
-            else:
-                df.to_csv(CSV_EXPORT_PATH, mode="a", header=False, index=False)
-        except Exception as e:
-            show_msgbox("Error", f"CSV export error: {e}", "cancel")
-
-    def save_order_to_json(self, order_id, total, discount_pct, mode_val=None, payment_val=None):
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        mode = mode_val if mode_val is not None else self.mode_cb.get()
-        payment = payment_val if payment_val is not None else self.payment_method.get()
-
-        bill = {
-            "order_id": int(order_id),
-            "timestamp": ts,
-            "mode": mode,
-            "payment_method": payment,
-            "items": [],
-            "subtotal": float(self.subtotal),
-            "gst_total": float(self.gst_total),
-            "discount_pct": float(discount_pct),
-            "total": float(total)
-        }
-        for itm in self.order:
-            bill["items"].append({
-                "item_name": str(itm["name"]),
-                "quantity": int(itm["qty"]),
-                "price": float(itm["price"]),
-                "gst": float(itm["gst"]),
-                "line_total": float(itm["qty"] * itm["price"])
-            })
-
-        fp = os.path.join(BILLS_JSON_DIR, f"bill_{order_id}.json")
-        try:
-            with open(fp, "w", encoding="utf-8") as f:
-                json.dump(bill, f, ensure_ascii=False, indent=2)
-            return fp
-        except Exception as e:
-            show_msgbox("Error", f"Save JSON error: {e}", "cancel")
-            return None
 
-    def open_json_bill(self, order_id):
-        fp = os.path.join(BILLS_JSON_DIR, f"bill_{order_id}.json")
-        if not os.path.exists(fp):
-            show_msgbox("Error", f"No JSON found for order {order_id}", "cancel")
+        ctk.CTkButton(bill_popup, text="Print Receipt", command=print_bill).pack(pady=(10, 4))
+        ctk.CTkButton(bill_popup, text="Export as PDF", command=export_and_close).pack(pady=6)
+        ctk.CTkButton(bill_popup, text="Open JSON Bill", command=lambda: self.open_json_bill(oid, bill)).pack(pady=6)
+        ctk.CTkLabel(bill_popup, text=f"Order {oid} saved", font=("Arial", 10)).pack(pady=(6,4))
+
+    def open_json_bill(self, order_id, bill=None):
+        # the bill just generated is shown as is, even while the writer still has it queued
+        if bill is not None:
+            bill = {k: v for k, v in bill.items() if k != "tab_id"}
+        else:
+            bill = open_store().get(order_id)
+        if bill is None:
+            # not synced into the store yet (utils.outbox); the database always has it
+            from utils.exporters import fetch_bills
+            bill = fetch_bills([order_id]).get(order_id)
+        if bill is None:
+            show_msgbox("Error", f"No bill found for order {order_id}", "cancel")
             return
+        fp = os.path.join(tempfile.gettempdir(), f"bill_{order_id}.json")
+        with open(fp, "w", encoding="utf-8") as f:
+            json.dump(bill, f, ensure_ascii=False, indent=2)
         open_file(fp)
 
+    def start_job(self, name, fn, *args, on_done=None, error="Report error"):
+        # one report job at a time; on_done(result) runs on the Tk thread
+        if self.job is not None and not self.job.finished:
+            show_msgbox("Info", f"{self.job.name} is still running.", "info")
+            return None
+        self.job = self.jobs.submit(name, self._after_queued_bills, fn, *args)
+        self._poll_job(self.job, on_done, error)
+        return self.job
+
+    def _after_queued_bills(self, fn, *args, progress):
+        # runs on the job worker: reports include every bill submitted so far, and the
+        # wait for the bill writer happens here (cancellable) rather than on the Tk thread
+        while not self.writer.drained():
+            progress(0)
+            time.sleep(JOB_POLL_MS / 1000)
+        return fn(*args, progress=progress)
+
+    def _poll_job(self, job, on_done, error):
+        if not job.finished:
+            self.frame.after(JOB_POLL_MS, lambda: self._poll_job(job, on_done, error))
+        elif job.state == DONE and on_done is not None:
+            on_done(job.result)
+        elif job.state == FAILED:
+            show_msgbox("Error", f"{error}: {job.error}", "cancel")
+
     def open_orders_csv(self):
-        if not os.path.exists(CSV_EXPORT_PATH):
-            pd.DataFrame(columns=[
-                "order_id","timestamp","mode","payment_method","item_name","quantity","price","gst",
-                "line_total","subtotal","gst_total","discount_pct","total"
-            ]).to_csv(CSV_EXPORT_PATH, index=False)
-        open_file(CSV_EXPORT_PATH)
-
-    def export_bill_to_pdf(self, order_id, order_list, subtotal, gst_total, discount):
-        os.makedirs(BILLS_JSON_DIR, exist_ok=True)
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", "B", 16)
-        pdf.cell(0, 10, "Restaurant Bill", ln=True, align="C")
-        pdf.set_font("Arial", size=12)
-        pdf.cell(0, 10, f"Order ID: {order_id}", ln=True)
-        pdf.cell(0, 10, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
-        pdf.ln(5)
-        for itm in order_list:
-            pdf.cell(0, 10, f"{itm['name']} x{itm['qty']} Rs{itm['price']} | GST:{itm['gst']}%", ln=True)
-        pdf.cell(0, 10, f"Subtotal: Rs{subtotal:.2f}", ln=True)
-        pdf.cell(0, 10, f"GST: Rs{gst_total:.2f}", ln=True)
-        pdf.cell(0, 10, f"Discount: {discount}%", ln=True)
-        total_val = subtotal + gst_total - (discount * subtotal / 100.0)
-        if total_val < 0:
-            total_val = 0.0
-        pdf.cell(0, 10, f"Total: Rs{total_val:.2f}", ln=True)
-        fp = os.path.abspath(os.path.join(BILLS_JSON_DIR, f"bill_{order_id}.pdf"))
+        from utils.exporters import export_bills
+        return self.start_job("Orders CSV export", export_bills, CSV_EXPORT_PATH, "csv",
+                              on_done=lambda count: open_file(CSV_EXPORT_PATH), error="CSV export error")
+
+    def export_bill_to_pdf(self, bill):
+        from utils.pdf_render import render_bill_pdf, bill_pdf_path
+        os.makedirs(PDF_DIR, exist_ok=True)
+        fp = bill_pdf_path(PDF_DIR, bill["order_id"])
         try:
-            pdf.output(fp)
+            with metrics.span("pdf_export"):
+                render_bill_pdf(bill, fp)
             open_file(fp)
         except Exception as e:
             show_msgbox("Error", f"PDF export error: {e}", "cancel")
@@ -466,7 +528,7 @@ class RestaurantApp:
         def _refresh_all_dropdowns(set_selected=None):
             self._load_menu_from_db()
             names = [i['name'] for i in self.menu]
-            self.item_dropdown.configure(values=names)
+            self.item_dropdown.configure(values=self._dropdown_names())
             if names:
                 if set_selected and set_selected in names:
                     self.selected_item.set(set_selected)
@@ -495,21 +557,20 @@ class RestaurantApp:
                 show_msgbox("Error", "Price/GST must be numbers", "cancel")
                 return
 
-            conn = s.connect("db/restaurant.db")
-            cur = conn.cursor()
-            cur.execute("SELECT 1 FROM menu WHERE lower(item_name) = lower(?) LIMIT 1", (nm,))
-            if cur.fetchone():
-                conn.close()
+            if self.client:
+                # the order service stays the only writer of the shared database
+                from utils.order_server import OrderServiceError
+                try:
+                    added = self.client.add_menu_item(nm, category_val, price_v, gst_v)
+                except (OrderServiceError, OSError) as e:
+                    show_msgbox("Error", f"Could not add item: {e}", "cancel")
+                    return
+            else:
+                added = add_menu_item(nm, category_val, price_v, gst_v)
+            if not added:
                 show_msgbox("Error", "Item already exists", "cancel")
                 return
 
-            try:
-                cur.execute("INSERT INTO menu (item_name, category, price, gst) VALUES (?, ?, ?, ?)",
-                            (nm, category_val, price_v, gst_v))
-                conn.commit()
-            finally:
-                conn.close()
-
             show_msgbox("Success", "Item added", "check")
             name_entry.delete(0, "end")
             cat_entry.delete(0, "end")
@@ -534,19 +595,18 @@ class RestaurantApp:
             if not item_to_delete:
                 show_msgbox("Error", "Select an item to delete", "cancel")
                 return
-            conn = s.connect("db/restaurant.db")
-            cur = conn.cursor()
-            cur.execute("SELECT id FROM menu WHERE lower(item_name) = lower(?) LIMIT 1", (item_to_delete,))
-            row = cur.fetchone()
-            if not row:
-                conn.close()
+            if self.client:
+                from utils.order_server import OrderServiceError
+                try:
+                    deleted = self.client.delete_menu_item(item_to_delete)
+                except (OrderServiceError, OSError) as e:
+                    show_msgbox("Error", f"Could not delete item: {e}", "cancel")
+                    return
+            else:
+                deleted = delete_menu_item(item_to_delete)
+            if deleted is None:
                 show_msgbox("Error", "No matching item found to delete", "cancel")
                 return
-            menu_id = row[0]
-            cur.execute("DELETE FROM menu WHERE id = ?", (menu_id,))
-            deleted = cur.rowcount
-            conn.commit()
-            conn.close()
             if deleted <= 0:
                 show_msgbox("Error", "Failed to delete item", "cancel")
             else:
@@ -558,7 +618,7 @@ class RestaurantApp:
     def refresh_menu(self):
         self._load_menu_from_db()
         names = [i['name'] for i in self.menu]
-        self.item_dropdown.configure(values=names)
+        self.item_dropdown.configure(values=self._dropdown_names())
         if names:
             if self.selected_item.get() not in names:
                 self.selected_item.set(names[0])
@@ -566,7 +626,7 @@ class RestaurantApp:
     def open_reports_window(self):
         rpt_win = ctk.CTkToplevel(self.frame)
         rpt_win.title("Reports")
-        rpt_win.geometry("500x200")
+        rpt_win.geometry("580x680")
         rpt_win.lift()
         rpt_win.focus_force()
         rpt_win.attributes("-topmost", True)
@@ -583,127 +643,224 @@ class RestaurantApp:
         ctrl_frame.grid_columnconfigure(0, weight=1)
         ctrl_frame.grid_columnconfigure(1, weight=1)
 
-    def generate_sales_summary(self, freq, parent_window=None):
-        conn = s.connect("db/restaurant.db")
-        try:
-            df_orders = pd.read_sql_query("SELECT order_id, mode, payment_method, subtotal, gst, discount, total, timestamp FROM orders", conn)
-        except Exception:
-            df_orders = pd.DataFrame(columns=["order_id", "mode", "payment_method", "subtotal", "gst", "discount", "total", "timestamp"])
-        try:
-            df_items = pd.read_sql_query("SELECT order_id, item_name, quantity, price, gst FROM order_items", conn)
-        except Exception:
-            df_items = pd.DataFrame(columns=["order_id", "item_name", "quantity", "price", "gst"])
-        conn.close()
+        job_frame = ctk.CTkFrame(rpt_win)
+        job_frame.pack(fill="x", padx=12, pady=(0, 6))
+        job_label = ctk.CTkLabel(job_frame, text="No report running", anchor="w")
+        job_label.grid(row=0, column=0, columnspan=2, sticky="w", padx=6)
+        job_bar = ctk.CTkProgressBar(job_frame)
+        job_bar.grid(row=1, column=0, sticky="ew", padx=6, pady=(0, 8))
+        job_bar.set(0)
+        cancel_btn = ctk.CTkButton(job_frame, text="Cancel", width=80, state="disabled",
+                                   command=lambda: self.job and self.job.cancel())
+        cancel_btn.grid(row=1, column=1, padx=6, pady=(0, 8))
+        job_frame.grid_columnconfigure(0, weight=1)
+
+        def watch_job():
+            # progress of whatever self.job is, until the window closes
+            if not rpt_win.winfo_exists():
+                return
+            job = self.job
+            if job is not None:
+                fraction = job.fraction()
+                done = f"{job.done:,}" + (f" of {job.total:,}" if job.total else "")
+                if job.finished:
+                    job_label.configure(text=f"{job.name}: {job.state} ({done}, {job.elapsed:.1f}s)")
+                else:
+                    job_label.configure(text=f"{job.name}: {done}")
+                job_bar.set(1.0 if job.state == DONE else fraction or 0)
+                cancel_btn.configure(state="disabled" if job.finished else "normal")
+            rpt_win.after(JOB_POLL_MS, watch_job)
+
+        watch_job()
+
+        tabs = ctk.CTkTabview(rpt_win)
+        tabs.pack(fill="both", expand=True, padx=12, pady=6)
+        top_tab = tabs.add("Top Items")
+        query_tab = tabs.add("Query")
+
+        top_frame = ctk.CTkFrame(top_tab)
+        top_frame.pack(fill="x", pady=6)
+        freq_var = ctk.StringVar(value="Daily")
+        period_var = ctk.StringVar(value=period_key("Daily"))
+        mode_var = ctk.StringVar(value="All")
+        by_var = ctk.StringVar(value="Quantity")
+
+        def on_freq(choice):
+            period_var.set(period_key(choice))
+
+        ctk.CTkComboBox(top_frame, values=["Daily", "Weekly", "Monthly"], variable=freq_var,
+                        command=on_freq, width=110).grid(row=0, column=0, padx=4, pady=6)
+        ctk.CTkEntry(top_frame, textvariable=period_var, width=110).grid(row=0, column=1, padx=4, pady=6)
+        ctk.CTkComboBox(top_frame, values=["All", "Dine-In", "Takeaway"], variable=mode_var,
+                        width=110).grid(row=0, column=2, padx=4, pady=6)
+        ctk.CTkComboBox(top_frame, values=["Quantity", "Revenue"], variable=by_var,
+                        width=110).grid(row=0, column=3, padx=4, pady=6)
+        top_text = ctk.CTkTextbox(top_tab, width=500, height=260, font=("Courier", 12))
+        top_text.pack(pady=6)
+
+        def show_top_items():
+            if not rpt_win.winfo_exists():
+                return
+            if not self.writer.drained():
+                # bills still on their way to the database; look again shortly instead of waiting
+                rpt_win.after(JOB_POLL_MS, show_top_items)
+                return
+            mode = ALL_MODES if mode_var.get() == "All" else mode_var.get()
+            try:
+                rows = top_items(freq_var.get(), period_var.get().strip(), mode, 10, by_var.get().lower())
+            except Exception as e:
+                show_msgbox("Error", f"Top items error: {e}", "cancel")
+                return
+            top_text.configure(state="normal")
+            top_text.delete("1.0", "end")
+            if not rows:
+                top_text.insert("end", "No sales in this period.\n")
+            for rank, (name, qty, revenue) in enumerate(rows, 1):
+                top_text.insert("end", f"{rank:>2}. {name[:26]:<26} {qty:>6}  Rs{revenue:>10.2f}\n")
+            top_text.configure(state="disabled")
+
+        ctk.CTkButton(top_frame, text="Show Top 10", command=show_top_items).grid(row=1, column=0, columnspan=4, pady=6)
+        show_top_items()
+
+        # ad-hoc query: filters and grouping run in SQLite, rows are shown as they arrive
+        from utils.report_query import GROUPS, fetch_report, parse_hours
+        q_frame = ctk.CTkFrame(query_tab)
+        q_frame.pack(fill="x", pady=6)
+        today = datetime.now().strftime("%Y-%m-%d")
+        q_vars = {
+            "start": ctk.StringVar(value=today),
+            "end": ctk.StringVar(value=""),
+            "hours": ctk.StringVar(value=""),
+            "mode": ctk.StringVar(value="All"),
+            "payment": ctk.StringVar(value="All"),
+            "items": ctk.StringVar(value=""),
+            "group": ctk.StringVar(value="hour"),
+        }
+        for col, (label, key) in enumerate([("From", "start"), ("Before", "end"), ("Hours", "hours")]):
+            ctk.CTkLabel(q_frame, text=label).grid(row=0, column=col * 2, padx=(6, 2), pady=4, sticky="e")
+            ctk.CTkEntry(q_frame, textvariable=q_vars[key], width=100,
+                         placeholder_text="19-21" if key == "hours" else "YYYY-MM-DD"
+                         ).grid(row=0, column=col * 2 + 1, padx=2, pady=4)
+        ctk.CTkComboBox(q_frame, values=["All", "Dine-In", "Takeaway"], variable=q_vars["mode"],
+                        width=100).grid(row=1, column=1, padx=2, pady=4)
+        ctk.CTkComboBox(q_frame, values=["All", "Cash", "Card", "UPI"], variable=q_vars["payment"],
+                        width=100).grid(row=1, column=3, padx=2, pady=4)
+        ctk.CTkComboBox(q_frame, values=list(GROUPS), variable=q_vars["group"],
+                        width=100).grid(row=1, column=5, padx=2, pady=4)
+        ctk.CTkLabel(q_frame, text="Mode").grid(row=1, column=0, padx=(6, 2), sticky="e")
+        ctk.CTkLabel(q_frame, text="Payment").grid(row=1, column=2, padx=(6, 2), sticky="e")
+        ctk.CTkLabel(q_frame, text="Group by").grid(row=1, column=4, padx=(6, 2), sticky="e")
+        ctk.CTkLabel(q_frame, text="Items").grid(row=2, column=0, padx=(6, 2), sticky="e")
+        ctk.CTkEntry(q_frame, textvariable=q_vars["items"], width=330,
+                     placeholder_text="comma separated, blank for all").grid(row=2, column=1, columnspan=5,
+                                                                            padx=2, pady=4, sticky="w")
+        q_text = ctk.CTkTextbox(query_tab, width=500, height=220, font=("Courier", 12))
+        q_text.pack(pady=6)
+        running = {"rows": None}
+
+        def pump():
+            # at most REPORT_ROWS_PER_TICK rows per event loop turn keeps the window responsive
+            rows = running["rows"]
+            if rows is None or not rpt_win.winfo_exists():
+                return
+            q_text.configure(state="normal")
+            for _ in range(REPORT_ROWS_PER_TICK):
+                row = next(rows, None)
+                if row is None:
+                    running["rows"] = None
+                    break
+                q_text.insert("end", " ".join(_report_cell(v) for v in row) + "\n")
+            q_text.configure(state="disabled")
+            if running["rows"] is rows:
+                rpt_win.after(1, pump)
+
+        def show_rows(result):
+            columns, rows = result
+            if not rpt_win.winfo_exists():
+                return
+            q_text.configure(state="normal")
+            q_text.delete("1.0", "end")
+            q_text.insert("end", " ".join(_report_cell(c) for c in columns) + "\n")
+            q_text.configure(state="disabled")
+            running["rows"] = iter(rows)
+            pump()
+
+        def run_query():
+            hours = q_vars["hours"].get().strip()
+            items = [i.strip() for i in q_vars["items"].get().split(",") if i.strip()]
+            mode, payment = q_vars["mode"].get(), q_vars["payment"].get()
+            try:
+                hours = parse_hours(hours) if hours else None
+            except ValueError:
+                show_msgbox("Error", "Hours must look like 19-21", "cancel")
+                return
+            # the aggregation runs on a job worker; only the result rows come back here
+            self.start_job("Report query", fetch_report, q_vars["start"].get().strip() or None,
+                           q_vars["end"].get().strip() or None, hours, None,
+                           [] if mode == "All" else [mode], [] if payment == "All" else [payment],
+                           items, q_vars["group"].get(), on_done=show_rows, error="Report query error")
 
-        if df_orders.empty:
-            text = "No orders found in database.\n"
-            return
+        ctk.CTkButton(q_frame, text="Run", command=run_query).grid(row=3, column=0, columnspan=6, pady=6)
 
-        df_orders["timestamp"] = pd.to_datetime(df_orders["timestamp"])
-        df_orders["date"] = df_orders["timestamp"].dt.date
-
-        if freq == "Daily":
-            summary = df_orders.groupby(df_orders["timestamp"].dt.date).agg(
-                orders_count=("order_id", "nunique"),
-                total_sales=("total", "sum"),
-                subtotal_sum=("subtotal", "sum"),
-                gst_sum=("gst", "sum")
-            ).reset_index().rename(columns={"timestamp": "date"})
-        elif freq == "Weekly":
-            df_orders["year_week"] = df_orders["timestamp"].dt.strftime("%Y-W%U")
-            summary = df_orders.groupby("year_week").agg(
-                orders_count=("order_id", "nunique"),
-                total_sales=("total", "sum"),
-                subtotal_sum=("subtotal", "sum"),
-                gst_sum=("gst", "sum")
-            ).reset_index()
-        else: 
-            df_orders["year_month"] = df_orders["timestamp"].dt.strftime("%Y-%m")
-            summary = df_orders.groupby("year_month").agg(
-                orders_count=("order_id", "nunique"),
-                total_sales=("total", "sum"),
-                subtotal_sum=("subtotal", "sum"),
-                gst_sum=("gst", "sum")
-            ).reset_index()
-
-        if not df_items.empty:
-            df_items["quantity"] = pd.to_numeric(df_items["quantity"], errors="coerce").fillna(0).astype(int)
-            top_items = df_items.groupby("item_name").agg(total_qty=("quantity", "sum")).reset_index().sort_values("total_qty", ascending=False)
-            _ = top_items.head(10)
+    def generate_sales_summary(self, freq, on_done=None):
+        freq = freq if freq in PERIOD_COLUMNS else "Monthly"
 
-        try:
-            summary.to_csv(SALES_REPORT_PATH, index=False)
-        except Exception as e:
-            show_msgbox("Error", f"Could not save sales report CSV: {e}", "cancel")
+        def write(progress):
+            with metrics.span("sales_summary"):
+                return write_sales_summary(freq, SALES_REPORT_PATH, progress)
+
+        return self.start_job(f"{freq} sales summary", write, on_done=on_done,
+                              error="Could not save sales report CSV")
 
     def _write_report_text(self, txt):
         pass
 
     def export_sales_report_csv(self):
-        if not os.path.exists(SALES_REPORT_PATH):
-            self.generate_sales_summary("Monthly")
-        open_file(SALES_REPORT_PATH)
+        if os.path.exists(SALES_REPORT_PATH):
+            open_file(SALES_REPORT_PATH)
+            return
+
+        def done(rows):
+            if rows:
+                open_file(SALES_REPORT_PATH)
+            else:
+                show_msgbox("Info", "No orders found in database.", "check")
+
+        self.generate_sales_summary("Monthly", on_done=done)
 
     def export_all_bills_json(self):
-        conn = s.connect("db/restaurant.db")
-        try:
-            df_orders = pd.read_sql_query("SELECT order_id, mode, payment_method, subtotal, gst, discount, total, timestamp FROM orders", conn)
-            df_items = pd.read_sql_query("SELECT order_id, item_name, quantity, price, gst FROM order_items", conn)
-        except Exception:
-            df_orders = pd.DataFrame()
-            df_items = pd.DataFrame()
-        conn.close()
-
-        if df_orders.empty:
-            show_msgbox("Info", "No orders in database to export.", "check")
-            return
+        from utils.exporters import export_bills
 
-        bills = []
-        for oid in df_orders["order_id"].unique():
-            row = df_orders[df_orders["order_id"] == oid].iloc[0]
-            items_df = df_items[df_items["order_id"] == oid] if not df_items.empty else pd.DataFrame()
-            items_list = []
-            if not items_df.empty:
-                for _, it in items_df.iterrows():
-                    items_list.append({
-                        "item_name": str(it["item_name"]),
-                        "quantity": int(it["quantity"]),
-                        "price": float(it["price"]),
-                        "gst": float(it["gst"]),
-                        "line_total": float(it["quantity"]) * float(it["price"])
-                    })
-            bill = {
-                "order_id": int(row["order_id"]),
-                "timestamp": str(row["timestamp"]),
-                "mode": str(row["mode"]),
-                "payment_method": str(row["payment_method"]),
-                "items": items_list,
-                "subtotal": float(row["subtotal"]),
-                "gst_total": float(row["gst"]),
-                "discount_pct": float(row["discount"]),
-                "total": float(row["total"])
-            }
-            bills.append(bill)
+        def done(count):
+            if count == 0:
+                show_msgbox("Info", "No orders in database to export.", "check")
+            else:
+                open_file(ALL_BILLS_JSON_PATH)
 
-        try:
-            with open(ALL_BILLS_JSON_PATH, "w", encoding="utf-8") as f:
-                json.dump(bills, f, ensure_ascii=False, indent=2)
-            open_file(ALL_BILLS_JSON_PATH)
-        except Exception as e:
-            show_msgbox("Error", f"Failed to export all bills JSON: {e}", "cancel")
+        return self.start_job("All bills JSON export", export_bills, ALL_BILLS_JSON_PATH, "json",
+                              on_done=done, error="Failed to export all bills JSON")
 
 def open_main_app(role, login_root):
     app_root = ctk.CTk()
     app_root.title("Restaurant Billing")
     app_root.geometry("800x600")
-    RestaurantApp(app_root, role)
-    app_root.protocol("WM_DELETE_WINDOW", lambda: (login_root.destroy(), app_root.destroy()))
+    app = RestaurantApp(app_root, role)
+    app_root.protocol("WM_DELETE_WINDOW", lambda: (app.shutdown(), close_connections(), login_root.destroy(), app_root.destroy()))
     app_root.mainloop()
 
 def run_app():
-    create_folders()
-    initialize_database()
-    setup_users()
+    try:
+        terminal_id_from_env()
+    except ValueError as e:
+        raise SystemExit(str(e))
+    create_data_folders()
+    if not ORDER_SERVER:
+        # with an order service the schema and the logins are set up by the service
+        create_folders()
+        initialize_database()
+        setup_users()
+    metrics.start_from_env()
     root = ctk.CTk()
+    migrate_json_bills()
     LoginWindow(root)
     root.mainloop()
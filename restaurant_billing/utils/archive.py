@@ -0,0 +1,246 @@
+import argparse
+import csv
+import json
+import mmap
+import os
+import threading
+from array import array
+from datetime import datetime, timedelta
+from utils.filelock import dir_lock
+
+ARCHIVE_DIR = os.path.abspath(os.path.join("data", "archive"))
+
+# same columns as orders_detailed.csv; strings are dictionary-encoded to uint32 codes
+COLUMNS = [
+    ("order_id", "q"),
+    ("timestamp", "q"),
+    ("mode", "I"),
+    ("payment_method", "I"),
+    ("item_name", "I"),
+    ("quantity", "i"),
+    ("price", "d"),
+    ("gst", "d"),
+    ("line_total", "d"),
+    ("subtotal", "d"),
+    ("gst_total", "d"),
+    ("discount_pct", "d"),
+    ("total", "d"),
+]
+TYPECODES = dict(COLUMNS)
+DICT_COLUMNS = ("mode", "payment_method", "item_name")
+
+_EPOCH = datetime(1970, 1, 1)
+_lock = threading.Lock()
+
+
+def to_epoch(timestamp):
+    return int((datetime.fromisoformat(str(timestamp)) - _EPOCH).total_seconds())
+
+
+def from_epoch(seconds):
+    return (_EPOCH + timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read_json(path, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def _dictionary_path(root):
+    return os.path.join(root, "dictionaries.json")
+
+
+def load_dictionaries(root=ARCHIVE_DIR):
+    data = _read_json(_dictionary_path(root), {})
+    return {col: list(data.get(col, [])) for col in DICT_COLUMNS}
+
+
+def partition_name(timestamp):
+    return str(timestamp)[:7]
+
+
+def bill_lines(bill):
+    for it in bill["items"]:
+        yield {
+            "order_id": bill["order_id"], "timestamp": bill["timestamp"], "mode": bill["mode"],
+            "payment_method": bill["payment_method"], "item_name": it["item_name"],
+            "quantity": it["quantity"], "price": it["price"], "gst": it["gst"],
+            "line_total": it["line_total"], "subtotal": bill["subtotal"], "gst_total": bill["gst_total"],
+            "discount_pct": bill["discount_pct"], "total": bill["total"]
+        }
+
+
+def _partition_meta(part_dir):
+    return _read_json(os.path.join(part_dir, "meta.json"), {"rows": 0})
+
+
+def _append_partition(part_dir, columns, seq=None):
+    os.makedirs(part_dir, exist_ok=True)
+    meta_path = os.path.join(part_dir, "meta.json")
+    meta = _partition_meta(part_dir)
+    rows = meta["rows"]
+    added = len(columns["order_id"])
+    for name, typecode in COLUMNS:
+        fp = os.path.join(part_dir, name + ".bin")
+        with open(fp, "ab") as f:
+            # drop bytes past the committed row count left by an interrupted append
+            f.truncate(rows * columns[name].itemsize)
+            f.seek(0, os.SEEK_END)
+            columns[name].tofile(f)
+    meta["rows"] = rows + added
+    if seq is not None:
+        meta["seq"] = max(seq, meta.get("seq", 0))
+    _write_json(meta_path, meta)
+
+
+def append_lines(lines, root=ARCHIVE_DIR):
+    # lines are dicts keyed by column name, as produced by bill_lines or csv.DictReader.
+    # Lines carrying an outbox "seq" are skipped when their partition already holds that
+    # seq, so replaying a batch after a crash does not archive a bill twice
+    with _lock:
+        dictionaries = load_dictionaries(root)
+        codes = {col: {v: i for i, v in enumerate(dictionaries[col])} for col in DICT_COLUMNS}
+        parts = {}
+        applied = {}
+        seqs = {}
+        count = 0
+        for line in lines:
+            part = partition_name(line["timestamp"])
+            seq = line.get("seq")
+            if seq is not None:
+                if part not in applied:
+                    applied[part] = _partition_meta(os.path.join(root, part)).get("seq", 0)
+                if seq <= applied[part]:
+                    continue
+                seqs[part] = max(seq, seqs.get(part, 0))
+            columns = parts.get(part)
+            if columns is None:
+                columns = parts[part] = {name: array(tc) for name, tc in COLUMNS}
+            for col in DICT_COLUMNS:
+                value = str(line[col])
+                code = codes[col].get(value)
+                if code is None:
+                    code = codes[col][value] = len(dictionaries[col])
+                    dictionaries[col].append(value)
+                columns[col].append(code)
+            columns["order_id"].append(int(line["order_id"]))
+            columns["timestamp"].append(to_epoch(line["timestamp"]))
+            columns["quantity"].append(int(line["quantity"]))
+            for name in ("price", "gst", "line_total", "subtotal", "gst_total", "discount_pct", "total"):
+                columns[name].append(float(line[name]))
+            count += 1
+        if not count:
+            return 0
+        os.makedirs(root, exist_ok=True)
+        _write_json(_dictionary_path(root), dictionaries)
+        for part, columns in parts.items():
+            _append_partition(os.path.join(root, part), columns, seqs.get(part))
+        return count
+
+
+def append_bills(bills, root=ARCHIVE_DIR, seqs=None):
+    # seqs: the bills' outbox sequence numbers, when replaying from utils.outbox
+    if seqs is None:
+        return append_lines((line for b in bills for line in bill_lines(b)), root)
+    return append_lines((dict(line, seq=seq) for b, seq in zip(bills, seqs) for line in bill_lines(b)), root)
+
+
+class Partition:
+    # read-only view of one month; numeric columns are zero-copy memoryviews over mmap
+
+    def __init__(self, part_dir):
+        self.path = part_dir
+        self.rows = _partition_meta(part_dir)["rows"]
+        self._maps = []
+        self._views = {}
+
+    def column(self, name):
+        view = self._views.get(name)
+        if view is not None:
+            return view
+        typecode = TYPECODES[name]
+        size = self.rows * array(typecode).itemsize
+        if size == 0:
+            view = memoryview(array(typecode))
+        else:
+            with open(os.path.join(self.path, name + ".bin"), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.append(mm)
+            view = memoryview(mm)[:size].cast(typecode)
+        self._views[name] = view
+        return view
+
+    def close(self):
+        for view in self._views.values():
+            view.release()
+        self._views.clear()
+        for mm in self._maps:
+            mm.close()
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def list_partitions(root=ARCHIVE_DIR, start=None, end=None):
+    # start/end are "YYYY-MM" month keys, both inclusive
+    if not os.path.isdir(root):
+        return []
+    names = sorted(n for n in os.listdir(root) if os.path.isdir(os.path.join(root, n)))
+    return [os.path.join(root, n) for n in names
+            if (start is None or n >= start) and (end is None or n <= end)]
+
+
+def load_columns(columns=None, start=None, end=None, root=ARCHIVE_DIR):
+    # concatenates partitions into typed arrays; string columns hold codes into load_dictionaries()
+    columns = columns or [name for name, _ in COLUMNS]
+    out = {name: array(TYPECODES[name]) for name in columns}
+    for part_dir in list_partitions(root, start, end):
+        with Partition(part_dir) as part:
+            for name in columns:
+                with part.column(name).cast("B") as raw:
+                    out[name].frombytes(raw)
+    return out
+
+
+def convert_csv(csv_path, root=ARCHIVE_DIR, chunk_size=50000):
+    # holds the directory lock so a running bill writer's sync waits for the import
+    total = 0
+    with dir_lock(root), open(csv_path, newline="", encoding="utf-8") as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                total += append_lines(chunk, root)
+                chunk = []
+        if chunk:
+            total += append_lines(chunk, root)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar order-line archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="import an orders_detailed.csv file")
+    conv.add_argument("csv_path", nargs="?", default=os.path.join("data", "orders_detailed.csv"))
+    conv.add_argument("--root", default=ARCHIVE_DIR)
+    args = parser.parse_args(argv)
+    count = convert_csv(args.csv_path, args.root)
+    print(f"Archived {count} order lines into {args.root}")
+
+
+if __name__ == "__main__":
+    main()
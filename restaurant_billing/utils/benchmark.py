@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from utils.db_utils import DB_PATH, initialize_database, close_connections
+from utils.billing import save_bills_to_db, commit_bills, append_bills_to_csv, save_bill_json
+from utils.archive import append_bills
+from utils.bill_store import BillStore
+from utils.rollups import write_sales_summary, PERIODS
+from utils.exporters import export_bills
+from utils.menu_import import import_menu_csv
+from utils.menu_index import MenuIndex
+from utils.workload import generate_bills, generate_menu, write_menu_csv, batched, parse_size
+
+# headless benchmarks of the billing and reporting paths on seeded synthetic data.
+# Each case is a sequence of calls. The first few run under tracemalloc for peak
+# memory and are left out of the timings, since tracing slows Python down.
+
+TRACED_CALLS = 3
+CASES = ("db_save", "commit", "csv_append", "archive_append", "store_append", "json_save", "sales_summary",
+         "export_json", "export_csv", "menu_import", "menu_search")
+SEARCH_QUERIES = 1000
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def measure(name, calls, unit, traced=TRACED_CALLS):
+    # calls: iterable of (fn, units done by that call)
+    latencies, units, elapsed, peak = [], 0, 0.0, 0
+    for i, (fn, n) in enumerate(calls):
+        if i < traced:
+            tracemalloc.start()
+            fn()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            continue
+        start = time.perf_counter()
+        fn()
+        took = time.perf_counter() - start
+        latencies.append(took)
+        units += n
+        elapsed += took
+    latencies.sort()
+    return {
+        "case": name,
+        "unit": unit,
+        "calls": len(latencies),
+        "units": units,
+        "throughput": units / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_kb": peak / 1024.0,
+    }
+
+
+def _batch_calls(bills, batch, fn):
+    for chunk in batched(bills, batch):
+        yield (lambda chunk=chunk: fn(chunk)), len(chunk)
+
+
+def _repeat(fn, units, repeat):
+    # one traced run plus the timed ones; pair with measure(..., traced=1)
+    for _ in range(1 + repeat):
+        yield fn, units
+
+
+def _in_subdir(name, fn):
+    # a database of its own, for save cases that would collide with db_save's orders
+    cwd = os.getcwd()
+    os.makedirs(os.path.join(name, os.path.dirname(DB_PATH)), exist_ok=True)
+    os.chdir(name)
+    try:
+        initialize_database()
+        return fn()
+    finally:
+        os.chdir(cwd)
+
+
+def _sales_summary(path):
+    # what the Reports window does: every period's rollup rows written to CSV
+    return sum(write_sales_summary(freq, path) for freq in PERIODS)
+
+
+def _search_calls(items):
+    # as-you-type lookups on a menu_rows-item menu: each name with its middle letter
+    # dropped, which misses the prefix stages and lands in the trigram search
+    index = MenuIndex({"name": it["item_name"]} for it in items)
+    for it in items[:SEARCH_QUERIES + TRACED_CALLS]:
+        name = it["item_name"]
+        query = name[:len(name) // 2] + name[len(name) // 2 + 1:]
+        yield (lambda q=query: index.search(q)), 1
+
+
+def run_benchmarks(orders=1000, seed=0, batch=50, menu_items=60, json_limit=20000, repeat=3,
+                   menu_rows=5000, cases=CASES, workdir=None):
+    # everything runs in a scratch directory (a temp dir unless workdir is given);
+    # save cases see the same seeded bills, reporting cases read what db_save wrote
+    menu = generate_menu(menu_items, seed)
+
+    def bills(limit=None):
+        return generate_bills(min(orders, limit) if limit else orders, menu, seed)
+
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        os.chdir(tmp)
+        try:
+            os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+            initialize_database()
+            plan = {
+                "db_save": lambda: measure("db_save", _batch_calls(bills(), batch, save_bills_to_db), "bills"),
+                # what the bill writer does: the database commit, then the archive and
+                # bill store catching up from the outbox
+                "commit": lambda: _in_subdir("commit", lambda: measure(
+                    "commit", _batch_calls(bills(), batch, lambda b: commit_bills(
+                        b, archive_dir="archive", store_dir="bill_store")), "bills")),
+                "csv_append": lambda: measure(
+                    "csv_append", _batch_calls(bills(), batch, lambda b: append_bills_to_csv(b, "orders.csv")),
+                    "bills"),
+                "archive_append": lambda: measure(
+                    "archive_append", _batch_calls(bills(), batch, lambda b: append_bills(b, "archive")), "bills"),
+                "store_append": lambda: measure(
+                    "store_append", _batch_calls(bills(), batch, BillStore("bill_store").append), "bills"),
+                # legacy one file per bill; capped so a 1M run does not leave a million files behind
+                "json_save": lambda: measure(
+                    "json_save", ((lambda b=b: save_bill_json(b, "bills"), 1) for b in bills(json_limit)), "bills"),
+                "sales_summary": lambda: measure(
+                    "sales_summary", _repeat(lambda: _sales_summary("sales_report.csv"), 1, repeat), "reports", 1),
+                "export_json": lambda: measure(
+                    "export_json", _repeat(lambda: export_bills("all_bills.json", "json"), orders, repeat), "bills", 1),
+                "export_csv": lambda: measure(
+                    "export_csv", _repeat(lambda: export_bills("orders_detailed.csv", "csv"), orders, repeat),
+                    "bills", 1),
+                # the traced first call inserts every row, the timed ones find them unchanged
+                "menu_import": lambda: measure(
+                    "menu_import", _repeat(lambda: import_menu_csv(write_menu_csv("menu.csv", menu_rows, seed)),
+                                           menu_rows, repeat), "rows", 1),
+                "menu_search": lambda: measure(
+                    "menu_search", _search_calls(generate_menu(menu_rows, seed)), "searches"),
+            }
+            for name in cases:
+                results.append(plan[name]())
+        finally:
+            close_connections()
+            os.chdir(cwd)
+    return results
+
+
+def format_results(results, baseline=None):
+    base = {r["case"]: r for r in baseline or []}
+    lines = [f"{'case':<16}{'calls':>8}{'throughput':>18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KB':>11}"]
+    for r in results:
+        line = (f"{r['case']:<16}{r['calls']:>8}{r['throughput']:>12,.0f} {r['unit'] + '/s':<7}"
+                f"{r['p50_ms']:>8.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['peak_kb']:>11,.0f}")
+        old = base.get(r["case"])
+        if old and old["throughput"]:
+            line += f"  {(r['throughput'] / old['throughput'] - 1) * 100:+.1f}% vs baseline"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless billing/reporting benchmarks")
+    parser.add_argument("--orders", default="1k", help="count or one of 1k, 100k, 1m")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch", type=int, default=50, help="bills per save call")
+    parser.add_argument("--menu-items", type=int, default=60, help="dishes orders are drawn from")
+    parser.add_argument("--menu-rows", type=int, default=5000,
+                        help="rows in the menu import CSV, items in the menu_search index")
+    parser.add_argument("--json-limit", type=int, default=20000, help="cap on per-bill JSON files")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs of the report/export cases")
+    parser.add_argument("--only", help=f"comma separated subset of: {', '.join(CASES)}")
+    parser.add_argument("--workdir", help="parent directory for the scratch files (default: system temp)")
+    parser.add_argument("--json", dest="json_out", help="also write the results here")
+    parser.add_argument("--baseline", help="results JSON from an earlier release to compare against")
+    args = parser.parse_args(argv)
+
+    cases = CASES
+    if args.only:
+        cases = tuple(c.strip() for c in args.only.split(",") if c.strip())
+        unknown = set(cases) - set(CASES)
+        if unknown:
+            parser.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+        if "db_save" not in cases and set(cases) & {"sales_summary", "export_json", "export_csv"}:
+            # the report cases read what db_save wrote
+            cases = ("db_save",) + cases
+    orders = parse_size(args.orders)
+    results = run_benchmarks(orders, args.seed, args.batch, args.menu_items, args.json_limit, args.repeat,
+                             args.menu_rows, cases, args.workdir)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print(f"{orders} orders, seed {args.seed}, batch {args.batch}, python {sys.version.split()[0]}")
+    print(format_results(results, baseline))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"orders": orders, "seed": args.seed, "batch": args.batch, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+import argparse
+import glob
+import heapq
+import json
+import os
+import shutil
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_left
+from utils.filelock import LockBusy, dir_lock
+
+# Append-only bill log replacing one JSON file per bill.
+#   <root>/<n>.seg   segments of records: RECORD header + compact JSON payload
+#                    (an empty payload is a tombstone); a new segment starts
+#                    once the active one passes SEGMENT_BYTES
+#   <root>/index.bin one ENTRY per record, in write order; the newest entry for
+#                    an order_id wins
+# Appends and compactions from other processes are serialized by utils.filelock
+# (outbox sync, migrate and compact take it); readers in other processes stat
+# index.bin on each lookup and pick up new entries or a compaction.
+
+BILL_STORE_DIR = os.path.abspath(os.path.join("data", "bill_store"))
+SEGMENT_BYTES = 64 * 1024 * 1024
+RECORD = struct.Struct("<IIq")     # payload length, crc32(payload), order_id
+ENTRY = struct.Struct("<qIQI")     # order_id, segment, record offset, payload length
+INDEX_FILE = "index.bin"
+COMPLETE_MARKER = "COMPACTED"
+
+
+class BillStoreError(Exception):
+    pass
+
+
+def _segment_name(n):
+    return f"{n:06d}.seg"
+
+
+def _encode(bill):
+    return json.dumps(bill, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class BillStore:
+    def __init__(self, root=BILL_STORE_DIR, segment_bytes=SEGMENT_BYTES):
+        self.root = os.path.abspath(root)
+        self.segment_bytes = segment_bytes
+        self._lock = threading.RLock()
+        self._writer = None
+        self._readers = {}
+        _finish_compaction(self.root)
+        os.makedirs(self.root, exist_ok=True)
+        self._load()
+
+    # index
+
+    def _reset_index(self):
+        # entries in ascending order_id live in parallel arrays (bisect lookups);
+        # out-of-order ids and rewrites go to a small dict that is checked first
+        self.ids = array("q")
+        self.segs = array("I")
+        self.offs = array("Q")
+        self.lens = array("I")
+        self.extra = {}
+        self._ends = {}
+        self._index_size = 0
+        self._index_ino = None
+
+    def _add(self, order_id, seg, off, length):
+        if not self.ids or order_id > self.ids[-1]:
+            self.ids.append(order_id)
+            self.segs.append(seg)
+            self.offs.append(off)
+            self.lens.append(length)
+        else:
+            self.extra[order_id] = (seg, off, length)
+        end = off + RECORD.size + length
+        if end > self._ends.get(seg, 0):
+            self._ends[seg] = end
+
+    def _read_index(self, start):
+        path = os.path.join(self.root, INDEX_FILE)
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+        usable = len(data) - len(data) % ENTRY.size
+        for entry in ENTRY.iter_unpack(data[:usable]):
+            self._add(*entry)
+        self._index_size = start + usable
+        return len(data) != usable
+
+    def _load(self):
+        self._close_files()
+        self._reset_index()
+        path = os.path.join(self.root, INDEX_FILE)
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        if self._read_index(0):
+            # torn final entry from a crash mid-append
+            with open(path, "r+b") as f:
+                f.truncate(self._index_size)
+        self._index_ino = os.stat(path).st_ino
+        self._recover()
+
+    def _segments(self):
+        return sorted(int(os.path.basename(p)[:-4]) for p in glob.glob(os.path.join(self.root, "*.seg")))
+
+    def _recover(self):
+        # re-index records that reached a segment but not index.bin, and cut off a torn tail
+        segments = self._segments()
+        last_indexed = max(self._ends, default=0)
+        recovered = []
+        for seg in segments:
+            if seg < last_indexed:
+                continue
+            path = os.path.join(self.root, _segment_name(seg))
+            pos = self._ends.get(seg, 0)
+            with open(path, "r+b") as f:
+                f.seek(pos)
+                while True:
+                    header = f.read(RECORD.size)
+                    if len(header) < RECORD.size:
+                        break
+                    length, crc, order_id = RECORD.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        break
+                    recovered.append((order_id, seg, pos, length))
+                    pos += RECORD.size + length
+                f.truncate(pos)
+        if recovered:
+            self._write_index(recovered)
+
+    def _write_index(self, entries):
+        with open(os.path.join(self.root, INDEX_FILE), "ab") as f:
+            f.write(b"".join(ENTRY.pack(*e) for e in entries))
+        for e in entries:
+            self._add(*e)
+        self._index_size += ENTRY.size * len(entries)
+
+    def _refresh(self):
+        # another process may have appended or compacted since we loaded
+        try:
+            st = os.stat(os.path.join(self.root, INDEX_FILE))
+        except FileNotFoundError:
+            _finish_compaction(self.root)
+            self._load()
+            return
+        if st.st_ino != self._index_ino or st.st_size < self._index_size:
+            self._load()
+        elif st.st_size > self._index_size:
+            self._read_index(self._index_size)
+
+    def _locate(self, order_id):
+        loc = self.extra.get(order_id)
+        if loc is not None:
+            return loc
+        i = bisect_left(self.ids, order_id)
+        if i < len(self.ids) and self.ids[i] == order_id:
+            return self.segs[i], self.offs[i], self.lens[i]
+        return None
+
+    # reads
+
+    def _reader(self, seg):
+        f = self._readers.get(seg)
+        if f is None:
+            f = self._readers[seg] = open(os.path.join(self.root, _segment_name(seg)), "rb")
+        return f
+
+    def _read(self, order_id, seg, off, length):
+        f = self._reader(seg)
+        f.seek(off)
+        record = f.read(RECORD.size + length)
+        size, crc, stored_id = RECORD.unpack_from(record)
+        payload = record[RECORD.size:]
+        if size != length or stored_id != order_id or zlib.crc32(payload) != crc:
+            raise BillStoreError(f"corrupt record for order {order_id} in segment {seg} at {off}")
+        return payload
+
+    def get_raw(self, order_id):
+        order_id = int(order_id)
+        with self._lock:
+            self._refresh()
+            loc = self._locate(order_id)
+            if loc is None or loc[2] == 0:
+                return None
+            try:
+                return self._read(order_id, *loc)
+            except FileNotFoundError:
+                # segment compacted away under us
+                self._load()
+                loc = self._locate(order_id)
+                return self._read(order_id, *loc) if loc and loc[2] else None
+
+    def get(self, order_id):
+        payload = self.get_raw(order_id)
+        return None if payload is None else json.loads(payload)
+
+    def __contains__(self, order_id):
+        with self._lock:
+            loc = self._locate(int(order_id))
+        return loc is not None and loc[2] != 0
+
+    def order_ids(self, start=None, end=None):
+        # live ids with start <= id < end, ascending; a snapshot, so appends while
+        # iterating are not seen
+        with self._lock:
+            self._refresh()
+            lo = 0 if start is None else bisect_left(self.ids, start)
+            hi = len(self.ids) if end is None else bisect_left(self.ids, end)
+            extra = self.extra
+            main = array("q", (oid for oid, length in zip(self.ids[lo:hi], self.lens[lo:hi])
+                               if length and oid not in extra))
+            more = sorted(oid for oid, loc in extra.items() if loc[2]
+                          and (start is None or oid >= start) and (end is None or oid < end))
+        return heapq.merge(main, more)
+
+    def scan(self, start=None, end=None):
+        for oid in self.order_ids(start, end):
+            bill = self.get(oid)
+            if bill is not None:
+                yield bill
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            live = sum(1 for _ in self.order_ids())
+            segments = self._segments()
+            size = sum(os.path.getsize(os.path.join(self.root, _segment_name(s))) for s in segments)
+            return {"segments": len(segments), "records": self._index_size // ENTRY.size,
+                    "live": live, "bytes": size}
+
+    # writes
+
+    def _active(self):
+        # another process may have appended, or started a segment, since our last write
+        if self._writer is not None and self._writer[0] < max(self._ends, default=0):
+            self._writer[1].close()
+            self._writer = None
+        if self._writer is None:
+            segments = self._segments()
+            seg = segments[-1] if segments else 1
+            self._writer = (seg, open(os.path.join(self.root, _segment_name(seg)), "ab"))
+        seg, f = self._writer
+        f.seek(0, os.SEEK_END)
+        if f.tell() >= self.segment_bytes:
+            f.close()
+            seg += 1
+            self._writer = (seg, open(os.path.join(self.root, _segment_name(seg)), "ab"))
+        return self._writer
+
+    def append_raw(self, records):
+        # records: (order_id, payload bytes); all of them reach the segment before the index
+        with self._lock:
+            # drops a stale segment handle should another process have compacted
+            self._refresh()
+            entries = []
+            seg, f = self._active()
+            buf = bytearray()
+            pos = f.tell()
+            for order_id, payload in records:
+                if buf and pos + len(buf) >= self.segment_bytes:
+                    f.write(buf)
+                    f.flush()
+                    buf = bytearray()
+                    seg, f = self._active()
+                    pos = f.tell()
+                entries.append((int(order_id), seg, pos + len(buf), len(payload)))
+                buf += RECORD.pack(len(payload), zlib.crc32(payload), int(order_id))
+                buf += payload
+            f.write(buf)
+            f.flush()
+            self._write_index(entries)
+            return len(entries)
+
+    def append(self, bills):
+        return self.append_raw((b["order_id"], _encode(b)) for b in bills)
+
+    def delete(self, order_ids):
+        return self.append_raw((oid, b"") for oid in order_ids)
+
+    def compact(self):
+        # rewrites only the live records, in order_id order, then swaps directories;
+        # meant for quiet hours, like VACUUM. Refuses while a writer holds the directory lock
+        with self._lock:
+            try:
+                with dir_lock(self.root, wait=False):
+                    return self._compact()
+            except LockBusy as e:
+                raise BillStoreError(f"not compacting, the store is being written: {e}") from None
+
+    def _compact(self):
+        tmp_root = self.root + ".compact"
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        fresh = BillStore(tmp_root, self.segment_bytes)
+        batch = []
+        for oid in self.order_ids():
+            batch.append((oid, self.get_raw(oid)))
+            if len(batch) >= 1000:
+                fresh.append_raw(batch)
+                batch = []
+        if batch:
+            fresh.append_raw(batch)
+        before, after = self.stats(), fresh.stats()
+        fresh.close()
+        for name in os.listdir(tmp_root):
+            with open(os.path.join(tmp_root, name), "rb+") as f:
+                os.fsync(f.fileno())
+        with open(os.path.join(tmp_root, COMPLETE_MARKER), "w") as f:
+            f.write("ok")
+            f.flush()
+            os.fsync(f.fileno())
+        self._close_files()
+        os.rename(self.root, self.root + ".old")
+        _finish_compaction(self.root)
+        self._load()
+        return before["bytes"], after["bytes"]
+
+    def _close_files(self):
+        for f in self._readers.values():
+            f.close()
+        self._readers = {}
+        if self._writer is not None:
+            self._writer[1].close()
+            self._writer = None
+
+    def close(self):
+        with self._lock:
+            self._close_files()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _finish_compaction(root):
+    # completes a swap interrupted by a crash; an unfinished rewrite is dropped
+    tmp_root, old_root = root + ".compact", root + ".old"
+    if os.path.isdir(tmp_root):
+        if os.path.exists(os.path.join(tmp_root, COMPLETE_MARKER)) and not os.path.isdir(root):
+            os.remove(os.path.join(tmp_root, COMPLETE_MARKER))
+            os.rename(tmp_root, root)
+        else:
+            shutil.rmtree(tmp_root, ignore_errors=True)
+    if os.path.isdir(old_root) and os.path.isdir(root):
+        shutil.rmtree(old_root, ignore_errors=True)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(root=BILL_STORE_DIR):
+    # one shared instance per directory and process
+    root = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = BillStore(root)
+        return store
+
+
+def migrate_json_dir(bills_dir, store=None, remove=False, batch_size=1000):
+    # one-time import of data/bills/bill_<id>.json; safe to re-run, already stored
+    # bills are skipped; holds the directory lock throughout. Returns (migrated, skipped, failed paths)
+    store = store or open_store()
+    migrated = skipped = 0
+    failed, batch, done = [], [], []
+
+    def flush():
+        nonlocal migrated
+        store.append_raw(batch)
+        migrated += len(batch)
+        if remove:
+            for p in done:
+                os.remove(p)
+        batch.clear()
+        done.clear()
+
+    with dir_lock(store.root):
+        paths = glob.glob(os.path.join(bills_dir, "bill_*.json"))
+        for path in sorted(paths, key=lambda p: os.path.basename(p)[5:-5].zfill(20)):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    bill = json.load(f)
+                order_id = int(bill["order_id"])
+            except (OSError, ValueError, KeyError, TypeError):
+                failed.append(path)
+                continue
+            if order_id in store:
+                skipped += 1
+                if remove:
+                    os.remove(path)
+                continue
+            batch.append((order_id, _encode(bill)))
+            done.append(path)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    return migrated, skipped, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append-only bill store")
+    parser.add_argument("--root", default=BILL_STORE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    mig = sub.add_parser("migrate", help="import data/bills/*.json")
+    mig.add_argument("--bills-dir", default=os.path.join("data", "bills"))
+    mig.add_argument("--remove", action="store_true", help="delete each JSON file once it is stored")
+    get = sub.add_parser("get", help="print one bill")
+    get.add_argument("order_id", type=int)
+    scan = sub.add_parser("scan", help="print bills as NDJSON, ordered by order id")
+    scan.add_argument("--start", type=int, help="first order id")
+    scan.add_argument("--end", type=int, help="order id to stop before")
+    sub.add_parser("compact", help="drop superseded and deleted records")
+    sub.add_parser("stats")
+    args = parser.parse_args(argv)
+
+    store = BillStore(args.root)
+    if args.command == "migrate":
+        migrated, skipped, failed = migrate_json_dir(args.bills_dir, store, args.remove)
+        print(f"migrated: {migrated}, already stored: {skipped}, unreadable: {len(failed)}")
+        for path in failed:
+            print(f"  {path}")
+    elif args.command == "get":
+        bill = store.get(args.order_id)
+        if bill is None:
+            raise SystemExit(f"No bill stored for order {args.order_id}")
+        print(json.dumps(bill, ensure_ascii=False, indent=2))
+    elif args.command == "scan":
+        for payload in (store.get_raw(oid) for oid in store.order_ids(args.start, args.end)):
+            print(payload.decode("utf-8"))
+    elif args.command == "compact":
+        try:
+            before, after = store.compact()
+        except BillStoreError as e:
+            raise SystemExit(str(e))
+        print(f"compacted {before} -> {after} bytes")
+    else:
+        print(", ".join(f"{k}: {v}" for k, v in store.stats().items()))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import csv
+import json
+import os
+from datetime import datetime
+from utils import metrics
+from utils.db_utils import DB_PATH, transaction
+from utils.rollups import apply_bills
+from utils.archive import ARCHIVE_DIR
+from utils.bill_store import BILL_STORE_DIR
+from utils.outbox import SYNC_BATCH, sync_artifacts
+from utils.calculator import (to_paise, to_basis_points, from_paise, line_totals, order_totals,
+                              final_paise)
+
+DATA_DIR = os.path.abspath("data")
+BILLS_JSON_DIR = os.path.join(DATA_DIR, "bills")
+CSV_EXPORT_PATH = os.path.join(DATA_DIR, "orders_detailed.csv")
+
+CSV_COLUMNS = [
+    "order_id", "timestamp", "mode", "payment_method", "item_name", "quantity", "price", "gst",
+    "line_total", "subtotal", "gst_total", "discount_pct", "total"
+]
+
+
+def make_line(name, qty, price, gst):
+    return {"name": str(name).strip(), "qty": int(qty), "price": float(price), "gst": float(gst)}
+
+
+def _line_paise(itm):
+    return line_totals(int(itm["qty"]), to_paise(itm["price"]), to_basis_points(itm["gst"]))
+
+
+def compute_totals(lines, discount_pct):
+    subtotal, gst_total, discount_amount, final = order_totals(
+        ((int(itm["qty"]), to_paise(itm["price"]), to_basis_points(itm["gst"])) for itm in lines),
+        to_basis_points(discount_pct))
+    return from_paise(subtotal), from_paise(gst_total), from_paise(discount_amount), from_paise(final)
+
+
+class RunningTotals:
+    # O(1) per added/removed line in exact paise; the discount only touches the final figure
+
+    def __init__(self, lines=()):
+        self.reset()
+        for line in lines:
+            self.add(line)
+
+    def reset(self):
+        self.subtotal_paise = 0
+        self.gst_paise = 0
+
+    @property
+    def subtotal(self):
+        return from_paise(self.subtotal_paise)
+
+    @property
+    def gst_total(self):
+        return from_paise(self.gst_paise)
+
+    def add(self, line):
+        amount, tax = _line_paise(line)
+        self.subtotal_paise += amount
+        self.gst_paise += tax
+        return from_paise(amount)
+
+    def remove(self, line):
+        amount, tax = _line_paise(line)
+        self.subtotal_paise -= amount
+        self.gst_paise -= tax
+        return from_paise(amount)
+
+    def final(self, discount_pct):
+        return from_paise(final_paise(self.subtotal_paise, self.gst_paise, to_basis_points(discount_pct)))
+
+
+def build_bill(order_id, lines, discount_pct=0.0, mode="Dine-In", payment_method="Cash", timestamp=None):
+    if not lines:
+        raise ValueError("Order has no items")
+    discount_pct = max(0.0, float(discount_pct))
+    subtotal, gst_total, _, final = compute_totals(lines, discount_pct)
+    if timestamp is None:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return {
+        "order_id": int(order_id),
+        "timestamp": timestamp,
+        "mode": mode,
+        "payment_method": payment_method,
+        "items": [{
+            "item_name": str(itm["name"]).strip(),
+            "quantity": int(itm["qty"]),
+            "price": float(itm["price"]),
+            "gst": float(itm["gst"]),
+            "line_total": from_paise(_line_paise(itm)[0])
+        } for itm in lines],
+        "subtotal": float(subtotal),
+        "gst_total": float(gst_total),
+        "discount_pct": discount_pct,
+        "total": float(final)
+    }
+
+
+def save_bills_to_db(bills, db_path=DB_PATH):
+    with transaction(db_path) as cur:
+        cur.executemany("""
+            INSERT INTO orders (order_id, mode, payment_method, subtotal, gst, discount, total, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(b["order_id"], b["mode"], b["payment_method"], b["subtotal"], b["gst_total"],
+               b["discount_pct"], b["total"], b["timestamp"]) for b in bills])
+        cur.executemany(
+            "INSERT INTO order_items(order_id,item_name,quantity,price,gst) VALUES(?,?,?,?,?)",
+            [(b["order_id"], it["item_name"], it["quantity"], it["price"], it["gst"])
+             for b in bills for it in b["items"]]
+        )
+        apply_bills(cur, bills)
+        cur.executemany("INSERT INTO outbox (order_id) VALUES (?)", [(b["order_id"],) for b in bills])
+        tab_ids = [(b["tab_id"],) for b in bills if b.get("tab_id") is not None]
+        if tab_ids:
+            # a finished open tab (utils.tabs) goes with the order it became
+            cur.executemany("DELETE FROM open_tabs WHERE tab_id = ?", tab_ids)
+
+
+def bill_to_csv_rows(bill):
+    for it in bill["items"]:
+        yield [bill["order_id"], bill["timestamp"], bill["mode"], bill["payment_method"],
+               it["item_name"], it["quantity"], it["price"], it["gst"], it["line_total"],
+               bill["subtotal"], bill["gst_total"], bill["discount_pct"], bill["total"]]
+
+
+def append_bills_to_csv(bills, csv_path=CSV_EXPORT_PATH):
+    new_file = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+    with open(csv_path, "a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if new_file:
+            w.writerow(CSV_COLUMNS)
+        for b in bills:
+            w.writerows(bill_to_csv_rows(b))
+
+
+def save_bill_json(bill, bills_dir=BILLS_JSON_DIR):
+    os.makedirs(bills_dir, exist_ok=True)
+    fp = os.path.join(bills_dir, f"bill_{bill['order_id']}.json")
+    with open(fp, "w", encoding="utf-8") as f:
+        json.dump(bill, f, ensure_ascii=False, indent=2)
+    return fp
+
+
+def commit_bills(bills, db_path=DB_PATH, archive_dir=ARCHIVE_DIR, store_dir=BILL_STORE_DIR,
+                 sync_every=SYNC_BATCH):
+    # the database transaction is the only durable write; the archive and the bill store
+    # catch up from the outbox once sync_every bills are pending (utils.outbox).
+    # Returns the committed order ids
+    bills = list(bills)
+    if not bills:
+        return []
+    with metrics.span("commit_db"):
+        save_bills_to_db(bills, db_path)
+    metrics.count("bills_committed", len(bills))
+    sync_artifacts(db_path, archive_dir, store_dir, min_pending=sync_every)
+    return [b["order_id"] for b in bills]
+
+
+def commit_bill(bill, **kwargs):
+    return commit_bills([bill], **kwargs)[0]
@@ -1,6 +1,133 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# all money is integer paise and all rates integer basis points (5% GST == 500 bp);
+# every rounding step is half-up, per line for GST and per order for the discount
+
+_CENT = Decimal("0.01")
+
+
+def to_paise(amount):
+    return int(Decimal(str(amount)).quantize(_CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def to_basis_points(percent):
+    return int((Decimal(str(percent)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_paise(paise):
+    return paise / 100.0
+
+
+def _round_div(numerator, denominator):
+    return (numerator + denominator // 2) // denominator
+
+
+def line_totals(qty, price_paise, gst_bp):
+    amount = qty * price_paise
+    return amount, _round_div(amount * gst_bp, 10000)
+
+
+def discount_paise(subtotal, discount_bp):
+    return _round_div(subtotal * max(0, discount_bp), 10000)
+
+
+def final_paise(subtotal, gst, discount_bp):
+    return max(0, subtotal + gst - discount_paise(subtotal, discount_bp))
+
+
+def order_totals(lines, discount_bp=0):
+    # lines: iterable of (qty, price_paise, gst_bp); returns paise (subtotal, gst, discount, total)
+    subtotal = gst = 0
+    for qty, price, rate in lines:
+        amount, tax = line_totals(qty, price, rate)
+        subtotal += amount
+        gst += tax
+    discount = discount_paise(subtotal, discount_bp)
+    return subtotal, gst, discount, max(0, subtotal + gst - discount)
+
+
+# the original billing interface: item[2] is the line amount and GST a flat 5% of the
+# subtotal. Per-line GST rates go through order_totals instead
+LEGACY_GST_BP = 500
+
+
 def calculate_totals(order, discount_percent):
-    subtotal = sum(item[2] for item in order)
-    gst_amount = subtotal * 0.05
-    discount = (discount_percent / 100) * subtotal
-    final_total = subtotal + gst_amount - discount
-    return subtotal, gst_amount, discount, final_total
+    # same tuples and results as before, now in exact paise rounded half-up
+    subtotal = sum(to_paise(item[2]) for item in order)
+    gst = _round_div(subtotal * LEGACY_GST_BP, 10000)
+    discount = discount_paise(subtotal, to_basis_points(discount_percent))
+    return from_paise(subtotal), from_paise(gst), from_paise(discount), from_paise(subtotal + gst - discount)
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("Batch pricing needs numpy: pip install numpy")
+    return np
+
+
+def price_batch(order_idx, qty, price_paise, gst_bp, discount_bp=0):
+    # Vectorised order_totals over many orders at once. Inputs are equal-length
+    # per-line arrays; order_idx tags each line with its order. discount_bp is a
+    # scalar or one value per distinct order (ascending order_idx). Returns
+    # (order ids, subtotal, gst, discount, total) as int64 arrays.
+    np = _numpy()
+    order_idx = np.asarray(order_idx, dtype=np.int64)
+    amount = np.asarray(qty, dtype=np.int64) * np.asarray(price_paise, dtype=np.int64)
+    tax = (amount * np.asarray(gst_bp, dtype=np.int64) + 5000) // 10000
+    if order_idx.size and np.any(order_idx[1:] < order_idx[:-1]):
+        perm = np.argsort(order_idx, kind="stable")
+        order_idx, amount, tax = order_idx[perm], amount[perm], tax[perm]
+    if not order_idx.size:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty, empty
+    starts = np.flatnonzero(np.concatenate(([True], order_idx[1:] != order_idx[:-1])))
+    ids = order_idx[starts]
+    subtotal = np.add.reduceat(amount, starts)
+    gst = np.add.reduceat(tax, starts)
+    disc_bp = np.maximum(np.asarray(discount_bp, dtype=np.int64), 0)
+    discount = (subtotal * disc_bp + 5000) // 10000
+    total = np.maximum(subtotal + gst - discount, 0)
+    return ids, subtotal, gst, discount, total
+
+
+def simulate_discounts(order_idx, qty, price_paise, gst_bp, discount_bps):
+    # what-if: total revenue in paise for each candidate order-level discount
+    np = _numpy()
+    _, subtotal, gst, _, _ = price_batch(order_idx, qty, price_paise, gst_bp)
+    out = []
+    for bp in discount_bps:
+        discount = (subtotal * max(0, int(bp)) + 5000) // 10000
+        out.append(int(np.maximum(subtotal + gst - discount, 0).sum()))
+    return out
+
+
+def load_order_lines(conn, start=None, end=None, chunk_size=200000):
+    # order_items joined to orders as numpy arrays ready for price_batch;
+    # also returns each order's stored discount % in basis points
+    np = _numpy()
+    where, params = [], []
+    if start is not None:
+        where.append("o.timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("o.timestamp < ?")
+        params.append(end)
+    sql = ("SELECT o.order_id, i.quantity, CAST(ROUND(i.price * 100) AS INTEGER), "
+           "CAST(ROUND(i.gst * 100) AS INTEGER), CAST(ROUND(o.discount * 100) AS INTEGER) "
+           "FROM orders o JOIN order_items i ON i.order_id = o.order_id")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY o.order_id"
+    parts = []
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        parts.append(np.array(rows, dtype=np.int64).reshape(-1, 5))
+    data = np.concatenate(parts) if parts else np.zeros((0, 5), dtype=np.int64)
+    order_idx, qty, price, gst, disc = (data[:, k] for k in range(5))
+    firsts = np.flatnonzero(np.concatenate(([True], order_idx[1:] != order_idx[:-1]))) if len(data) else []
+    return order_idx, qty, price, gst, disc[firsts]
@@ -1,12 +1,72 @@
 import sqlite3 as s
 import os
-import pandas as pd
+import threading
+from contextlib import contextmanager
+
+DB_PATH = "db/restaurant.db"
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+)
+
+_local = threading.local()
+
+def _open_connection(path):
+    conn = s.connect(path, timeout=10)
+    conn.execute("PRAGMA busy_timeout=10000")
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection(db_path=DB_PATH):
+    # one long-lived connection per thread and database file; sqlite3 connections
+    # must stay on the thread that created them
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = _local.pool = {}
+    key = os.path.abspath(db_path)
+    conn = pool.get(key)
+    if conn is None:
+        conn = pool[key] = _open_connection(db_path)
+    return conn
+
+@contextmanager
+def transaction(db_path=DB_PATH):
+    conn = get_connection(db_path)
+    if conn.in_transaction:
+        conn.commit()
+    # take the write lock up front so concurrent writers queue on busy_timeout
+    # instead of failing when a deferred read transaction tries to upgrade
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+def close_connections():
+    pool = getattr(_local, "pool", None) or {}
+    for conn in pool.values():
+        try:
+            conn.close()
+        except s.Error:
+            pass
+    pool.clear()
 
 def create_folders():
     os.makedirs("db", exist_ok=True)
 
 def initialize_database():
-    conn = s.connect("db/restaurant.db")
+    conn = get_connection()
+    if schema_version(conn) >= SCHEMA_VERSION:
+        # already set up; skip the DDL so startup stays read-only
+        return
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -44,24 +104,227 @@ def initialize_database():
     ''')
 
     conn.commit()
-    conn.close()
+    migrate(conn)
 
-def load_menu_from_csv(csv_path="data/menu.csv"):
-    conn = s.connect("db/restaurant.db")
-    cursor = conn.cursor()
-    df = pd.read_csv(csv_path)
-    for _, row in df.iterrows():
-        cursor.execute('''
-            INSERT OR IGNORE INTO menu (item_name, category, price, gst)
-            VALUES (?, ?, ?, ?)
-        ''', (row['item_name'], row['category'], row['price'], row['gst']))
-    conn.commit()
-    conn.close()
+def _migration_1_order_indexes(cursor):
+    # rebuild order_items so order_id references orders; SQLite cannot add a
+    # foreign key to an existing table
+    cursor.execute('''
+        CREATE TABLE order_items_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER REFERENCES orders(order_id) ON DELETE CASCADE,
+            item_name TEXT,
+            quantity INTEGER,
+            price REAL,
+            gst REAL DEFAULT 0
+        )
+    ''')
+    # lines whose order is gone cannot satisfy the new key; they are kept aside in
+    # order_items_orphans for review instead of being copied over
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_items_orphans (
+            id INTEGER PRIMARY KEY,
+            order_id INTEGER,
+            item_name TEXT,
+            quantity INTEGER,
+            price REAL,
+            gst REAL
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO order_items_orphans (id, order_id, item_name, quantity, price, gst)
+        SELECT id, order_id, item_name, quantity, price, gst FROM order_items
+        WHERE order_id IS NOT NULL AND order_id NOT IN (SELECT order_id FROM orders)
+    ''')
+    cursor.execute('''
+        INSERT INTO order_items_new (id, order_id, item_name, quantity, price, gst)
+        SELECT id, order_id, item_name, quantity, price, gst FROM order_items
+        WHERE id NOT IN (SELECT id FROM order_items_orphans)
+    ''')
+    cursor.execute("DROP TABLE order_items")
+    cursor.execute("ALTER TABLE order_items_new RENAME TO order_items")
+    # foreign keys are off while migrating, so check by hand before committing
+    broken = cursor.execute("PRAGMA foreign_key_check(order_items)").fetchall()
+    if broken:
+        raise s.IntegrityError(f"order_items still has {len(broken)} rows without an order, "
+                               f"first rowids: {[row[1] for row in broken[:10]]}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_timestamp ON orders(timestamp)")
+
+def _migration_2_sales_rollups(cursor):
+    from utils.rollups import rebuild_rollups
+    rebuild_rollups(cursor)
+
+def _migration_3_menu_version(cursor):
+    # every menu change bumps one counter row so terminals can detect edits with a point read
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS menu_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO menu_version (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS menu_version_{event.lower()} AFTER {event} ON menu
+            BEGIN
+                UPDATE menu_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+def _migration_4_item_analytics(cursor):
+    # item_rollup gains per-mode rows and revenue plus top-k indexes; rebuilt from orders
+    from utils.rollups import rebuild_rollups
+    cursor.execute("DROP TABLE IF EXISTS item_rollup")
+    rebuild_rollups(cursor)
+
+def _migration_5_report_index(cursor):
+    # covers every column the ad-hoc reports filter or sum on (utils.report_query)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_report "
+                   "ON orders(timestamp, mode, payment_method, total, subtotal, gst)")
+
+def _migration_6_outbox(cursor):
+    # one row per committed bill, written in the same transaction; the archive and the
+    # bill store are derived from it and record how far they have caught up (utils.outbox)
+    cursor.execute("CREATE TABLE IF NOT EXISTS outbox ("
+                   "seq INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER NOT NULL)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS artifact_checkpoints ("
+                   "artifact TEXT PRIMARY KEY, seq INTEGER NOT NULL)")
+
+def _migration_7_open_tabs(cursor):
+    # parked orders per terminal (utils.tabs); lines go with their tab
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS open_tabs (
+            tab_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            terminal_id INTEGER NOT NULL,
+            label TEXT NOT NULL,
+            mode TEXT,
+            payment_method TEXT,
+            discount_pct REAL DEFAULT 0,
+            opened_at TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS open_tab_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tab_id INTEGER NOT NULL REFERENCES open_tabs(tab_id) ON DELETE CASCADE,
+            item_name TEXT,
+            quantity INTEGER,
+            price REAL,
+            gst REAL DEFAULT 0
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_open_tabs_terminal ON open_tabs(terminal_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_open_tab_items_tab_id ON open_tab_items(tab_id)")
+
+MIGRATIONS = [
+    (1, _migration_1_order_indexes),
+    (2, _migration_2_sales_rollups),
+    (3, _migration_3_menu_version),
+    (4, _migration_4_item_analytics),
+    (5, _migration_5_report_index),
+    (6, _migration_6_outbox),
+    (7, _migration_7_open_tabs),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn=None):
+    conn = conn or get_connection()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn=None):
+    conn = conn or get_connection()
+    current = schema_version(conn)
+    pending = [(v, fn) for v, fn in MIGRATIONS if v > current]
+    if not pending:
+        return current
+    if conn.in_transaction:
+        conn.commit()
+    # table rebuilds need foreign key enforcement off; the pragma is a no-op inside a transaction
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        for version, fn in pending:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                fn(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
+    return schema_version(conn)
+
+HOT_QUERIES = {
+    "order_items_by_order": (
+        "SELECT item_name, quantity, price, gst FROM order_items WHERE order_id = ?",
+        (1,), ("idx_order_items_order_id",)),
+    "orders_by_date_range": (
+        "SELECT order_id, total FROM orders WHERE timestamp >= ? AND timestamp < ?",
+        # order_id and total are both in idx_orders_report, so it beats idx_orders_timestamp
+        ("2025-01-01", "2025-02-01"), ("COVERING INDEX idx_orders_report",)),
+    "bills_join_by_date_range": (
+        "SELECT o.order_id, i.item_name FROM orders o JOIN order_items i ON i.order_id = o.order_id "
+        "WHERE o.timestamp >= ? AND o.timestamp < ?",
+        ("2025-01-01", "2025-02-01"), ("idx_orders_timestamp", "idx_order_items_order_id")),
+    "report_orders_by_range": (
+        "SELECT mode, COUNT(*), SUM(total), SUM(subtotal), SUM(gst) FROM orders "
+        "WHERE timestamp >= ? AND timestamp < ? AND payment_method = ? GROUP BY mode",
+        ("2025-01-01", "2025-02-01", "UPI"), ("COVERING INDEX idx_orders_report",)),
+    "outbox_pending": (
+        "SELECT seq, order_id FROM outbox WHERE seq > ? ORDER BY seq LIMIT ?",
+        (0, 500), ("INTEGER PRIMARY KEY",)),
+    "top_items_by_quantity": (
+        "SELECT item_name, quantity, revenue_paise FROM item_rollup "
+        "WHERE period_type = ? AND period = ? AND mode = ? ORDER BY quantity DESC LIMIT ?",
+        ("Daily", "2025-01-01", "*", 10), ("idx_item_rollup_top_quantity",)),
+    "top_items_by_revenue": (
+        "SELECT item_name, quantity, revenue_paise FROM item_rollup "
+        "WHERE period_type = ? AND period = ? AND mode = ? ORDER BY revenue_paise DESC LIMIT ?",
+        ("Daily", "2025-01-01", "*", 10), ("idx_item_rollup_top_revenue",)),
+}
+
+def explain_query_plan(sql, params=(), conn=None):
+    conn = conn or get_connection()
+    return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+def check_query_plans(conn=None):
+    # returns {query name: plan} for every hot query that does not use its indexes
+    problems = {}
+    for name, (sql, params, indexes) in HOT_QUERIES.items():
+        plan = explain_query_plan(sql, params, conn)
+        if not all(any(index in step for step in plan) for index in indexes):
+            problems[name] = plan
+    return problems
+
+def load_menu_from_csv(csv_path="data/menu.csv", report_path=None):
+    from utils.menu_import import import_menu_csv
+    return import_menu_csv(csv_path, report_path)
 
 def fetch_menu_items():
-    conn = s.connect("db/restaurant.db")
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute("SELECT item_name, price, gst FROM menu")
-    items = cursor.fetchall()
-    conn.close()
-    return items
+    return cursor.fetchall()
+
+def add_menu_item(name, category, price, gst, db_path=DB_PATH):
+    # False when the menu already has the item, in any letter case
+    with transaction(db_path) as cur:
+        if cur.execute("SELECT 1 FROM menu WHERE lower(item_name) = lower(?) LIMIT 1", (name,)).fetchone():
+            return False
+        cur.execute("INSERT INTO menu (item_name, category, price, gst) VALUES (?, ?, ?, ?)",
+                    (name, category, price, gst))
+        return True
+
+def delete_menu_item(name, db_path=DB_PATH):
+    # rows deleted, or None when no item has that name
+    with transaction(db_path) as cur:
+        row = cur.execute("SELECT id FROM menu WHERE lower(item_name) = lower(?) LIMIT 1", (name,)).fetchone()
+        if row is None:
+            return None
+        cur.execute("DELETE FROM menu WHERE id = ?", (row[0],))
+        return cur.rowcount
@@ -0,0 +1,192 @@
+import csv
+import gzip
+import json
+import os
+from datetime import date, datetime
+from utils import metrics
+from utils.billing import CSV_COLUMNS, bill_to_csv_rows
+from utils.db_utils import get_connection
+
+FORMATS = ("json", "ndjson", "csv")
+
+# orders per read: each page is two short statements, so an export never holds one
+# read open for the whole table and can report progress or stop between pages
+PAGE_SIZE = 500
+
+ORDERS_PAGE = ("SELECT o.order_id, o.timestamp, o.mode, o.payment_method, o.subtotal, o.gst, o.discount, o.total "
+               "FROM orders o")
+ITEMS_PAGE = ("SELECT order_id, item_name, quantity, price, gst FROM order_items "
+              "WHERE order_id IN ({}) ORDER BY order_id, id")
+
+
+def _as_timestamp(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    raise TypeError(f"Unsupported date filter: {value!r}")
+
+
+def _range_where(start=None, end=None, since=None):
+    where, params = [], []
+    start = _as_timestamp(start)
+    if since is not None and (start is None or since > start):
+        start = since
+    if start is not None:
+        where.append("o.timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("o.timestamp < ?")
+        params.append(_as_timestamp(end))
+    return where, params
+
+
+def count_bills(start=None, end=None, conn=None):
+    where, params = _range_where(start, end)
+    sql = "SELECT COUNT(*) FROM orders o" + (" WHERE " + " AND ".join(where) if where else "")
+    return (conn or get_connection()).execute(sql, params).fetchone()[0]
+
+
+def _order_pages(start, end, conn, page_size):
+    # keyset paging: (timestamp, order_id) for date ranges, order_id otherwise;
+    # every page starts its index walk where the previous one stopped
+    ranged = start is not None or end is not None
+    last = None
+    while True:
+        if ranged:
+            where, params = _range_where(start, end, last and last[0])
+            if last:
+                where.append("(o.timestamp > ? OR o.order_id > ?)")
+                params += last
+            order = "o.timestamp, o.order_id"
+        else:
+            where, params = (["o.order_id > ?"], [last[1]]) if last else ([], [])
+            order = "o.order_id"
+        sql = ORDERS_PAGE + (" WHERE " + " AND ".join(where) if where else "") + f" ORDER BY {order} LIMIT ?"
+        rows = conn.execute(sql, params + [page_size]).fetchall()
+        if rows:
+            yield rows
+            last = [rows[-1][1], rows[-1][0]]
+        if len(rows) < page_size:
+            return
+
+
+def _page_bills(orders, conn):
+    if not orders:
+        return
+    items = {}
+    for oid, item_name, qty, price, gst in conn.execute(
+            ITEMS_PAGE.format(",".join("?" * len(orders))), [o[0] for o in orders]):
+        qty = int(qty or 0)
+        price = float(price or 0)
+        items.setdefault(oid, []).append({
+            "item_name": str(item_name),
+            "quantity": qty,
+            "price": price,
+            "gst": float(gst or 0),
+            "line_total": qty * price
+        })
+    for oid, ts, mode, payment, subtotal, gst_total, discount, total in orders:
+        yield {
+            "order_id": int(oid),
+            "timestamp": str(ts),
+            "mode": str(mode),
+            "payment_method": str(payment),
+            "items": items.get(oid, []),
+            "subtotal": float(subtotal or 0),
+            "gst_total": float(gst_total or 0),
+            "discount_pct": float(discount or 0),
+            "total": float(total or 0)
+        }
+
+
+def fetch_bills(order_ids, conn=None):
+    # {order_id: bill} for the given ids, read PAGE_SIZE at a time
+    conn = conn or get_connection()
+    order_ids = list(order_ids)
+    bills = {}
+    for i in range(0, len(order_ids), PAGE_SIZE):
+        page = order_ids[i:i + PAGE_SIZE]
+        orders = conn.execute(ORDERS_PAGE + f" WHERE o.order_id IN ({','.join('?' * len(page))})", page).fetchall()
+        for bill in _page_bills(orders, conn):
+            bills[bill["order_id"]] = bill
+    return bills
+
+
+def iter_bills(start=None, end=None, conn=None, page_size=PAGE_SIZE, progress=None):
+    # bills in order_id order (or timestamp order for a date range), one page of
+    # orders in memory at a time; progress(done) is called after every page
+    conn = conn or get_connection()
+    done = 0
+    for orders in _order_pages(start, end, conn, page_size):
+        yield from _page_bills(orders, conn)
+        done += len(orders)
+        if progress is not None:
+            progress(done)
+
+
+def _open_output(path, compress=None):
+    if compress is None:
+        compress = path.endswith(".gz")
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def write_bills_json(bills, f):
+    count = 0
+    f.write("[")
+    for bill in bills:
+        f.write(",\n  " if count else "\n  ")
+        f.write(json.dumps(bill, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+        count += 1
+    f.write("\n]\n" if count else "]\n")
+    return count
+
+
+def write_bills_ndjson(bills, f):
+    count = 0
+    for bill in bills:
+        f.write(json.dumps(bill, ensure_ascii=False, separators=(",", ":")))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def write_bills_csv(bills, f):
+    w = csv.writer(f)
+    w.writerow(CSV_COLUMNS)
+    count = 0
+    for bill in bills:
+        w.writerows(bill_to_csv_rows(bill))
+        count += 1
+    return count
+
+
+WRITERS = {"json": write_bills_json, "ndjson": write_bills_ndjson, "csv": write_bills_csv}
+
+
+def export_bills(path, fmt="json", start=None, end=None, compress=None, conn=None, progress=None):
+    # progress(done, total) runs between pages; raising from it (utils.jobs.JobCancelled)
+    # abandons the export and leaves any earlier file at `path` untouched
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    on_page = None
+    if progress is not None:
+        total = count_bills(start, end, conn)
+        progress(0, total)
+        on_page = lambda done: progress(done, total)
+    tmp = path + ".part"
+    try:
+        with metrics.span(f"export_{fmt}"), \
+                _open_output(tmp, path.endswith(".gz") if compress is None else compress) as f:
+            count = WRITERS[fmt](iter_bills(start, end, conn, progress=on_page), f)
+        os.replace(tmp, path)
+        metrics.count("bills_exported", count)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return count
@@ -0,0 +1,41 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Exclusive lock between processes over a data directory (the archive, the bill store).
+# The lock file sits next to the directory, <root>.lock, so it survives the bill store
+# swapping its directory during a compaction. Not re-entrant: a process that already
+# holds it must not take it again on another code path.
+
+
+class LockBusy(Exception):
+    pass
+
+
+def lock_path(root):
+    return os.path.abspath(root).rstrip(os.sep) + ".lock"
+
+
+@contextmanager
+def dir_lock(root, wait=True):
+    # wait=False raises LockBusy instead of blocking while another holder is active
+    path = lock_path(root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    f = open(path, "a+b")
+    try:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+        except OSError as e:
+            raise LockBusy(f"{root} is locked by another writer") from e
+        yield
+    finally:
+        f.close()
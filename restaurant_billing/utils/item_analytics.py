@@ -0,0 +1,120 @@
+import argparse
+from datetime import datetime, timedelta
+from utils.db_utils import get_connection, initialize_database
+from utils.calculator import from_paise
+from utils.rollups import ALL_MODES, PERIODS, TOP_ITEMS_BY, period_key, top_items
+
+
+class SpaceSaving:
+    # Space-Saving heavy hitters: at most `capacity` counters. Every reported count
+    # is an overestimate by at most its error, and any item with a true weight above
+    # total / capacity is guaranteed to be kept
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.counts = {}
+        self.total = 0
+
+    def add(self, item, weight=1):
+        self.total += weight
+        entry = self.counts.get(item)
+        if entry is not None:
+            entry[0] += weight
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = [weight, 0]
+            return
+        victim = min(self.counts, key=lambda name: self.counts[name][0])
+        floor = self.counts.pop(victim)[0]
+        self.counts[item] = [floor + weight, floor]
+
+    def top(self, k):
+        ranked = sorted(self.counts.items(), key=lambda kv: (-kv[1][0], kv[0]))[:k]
+        return [(name, count, error) for name, (count, error) in ranked]
+
+
+def _day(value):
+    return value if isinstance(value, datetime) else datetime.strptime(str(value)[:10], "%Y-%m-%d")
+
+
+def cover_range(start, end):
+    # [start, end) as whole months where possible and single days at the edges
+    day, end = _day(start), _day(end)
+    periods = []
+    while day < end:
+        next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        if day.day == 1 and next_month <= end:
+            periods.append(("Monthly", day.strftime(PERIODS["Monthly"])))
+            day = next_month
+        else:
+            periods.append(("Daily", day.strftime(PERIODS["Daily"])))
+            day += timedelta(days=1)
+    return periods
+
+
+def top_items_between(start, end, mode=ALL_MODES, k=10, by="quantity", conn=None):
+    # exact top-k over [start, end): sums the daily rollup rows in the range
+    conn = conn or get_connection()
+    column = TOP_ITEMS_BY[by]
+    rows = conn.execute(
+        "SELECT item_name, SUM(quantity), SUM(revenue_paise) FROM item_rollup "
+        "WHERE period_type = 'Daily' AND period >= ? AND period < ? AND mode = ? "
+        f"GROUP BY item_name ORDER BY SUM({column}) DESC, item_name LIMIT ?",
+        (_day(start).strftime("%Y-%m-%d"), _day(end).strftime("%Y-%m-%d"), mode, int(k))).fetchall()
+    return [(name, qty, from_paise(revenue)) for name, qty, revenue in rows]
+
+
+def approx_top_items_between(start, end, mode=ALL_MODES, k=10, by="quantity", capacity=200, conn=None):
+    # bounded-work top-k for long histories: reads at most `capacity` rows per month
+    # (or edge day) through the top-k index and merges them in a Space-Saving sketch.
+    # Returns [(item_name, estimate, max_error)]; revenue figures are in rupees
+    conn = conn or get_connection()
+    column = TOP_ITEMS_BY[by]
+    sketch = SpaceSaving(capacity)
+    slack = 0
+    for freq, period in cover_range(start, end):
+        rows = conn.execute(
+            f"SELECT item_name, {column} FROM item_rollup WHERE period_type = ? AND period = ? AND mode = ? "
+            f"ORDER BY {column} DESC LIMIT ?", (freq, period, mode, capacity)).fetchall()
+        for name, value in rows:
+            sketch.add(name, value)
+        if len(rows) == capacity:
+            # items cut off below this period's last row may be missing up to its value
+            slack += rows[-1][1]
+    scale = from_paise if by == "revenue" else (lambda v: v)
+    return [(name, scale(count), scale(error + slack)) for name, count, error in sketch.top(k)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Top items by quantity or revenue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    top = sub.add_parser("top", help="one day, week or month")
+    top.add_argument("--freq", choices=sorted(PERIODS), default="Daily")
+    top.add_argument("--period", help="e.g. 2025-08-14, 2025-W32 or 2025-08 (default: current)")
+    rng = sub.add_parser("range", help="any date range, end exclusive")
+    rng.add_argument("--start", required=True)
+    rng.add_argument("--end", required=True)
+    rng.add_argument("--approx", action="store_true", help="Space-Saving sketch over monthly rollups")
+    rng.add_argument("--capacity", type=int, default=200)
+    for p in (top, rng):
+        p.add_argument("--mode", default=ALL_MODES, help="Dine-In, Takeaway or * for all")
+        p.add_argument("--by", choices=sorted(TOP_ITEMS_BY), default="quantity")
+        p.add_argument("-k", type=int, default=10)
+    args = parser.parse_args(argv)
+    initialize_database()
+
+    if args.command == "top":
+        period = args.period or period_key(args.freq)
+        for rank, (name, qty, revenue) in enumerate(top_items(args.freq, period, args.mode, args.k, args.by), 1):
+            print(f"{rank:>3}. {name:<32} qty {qty:>8}  Rs{revenue:>12.2f}")
+    elif args.approx:
+        for rank, (name, estimate, error) in enumerate(
+                approx_top_items_between(args.start, args.end, args.mode, args.k, args.by, args.capacity), 1):
+            print(f"{rank:>3}. {name:<32} {args.by} ~{estimate:,.2f} (+/- {error:,.2f})")
+    else:
+        for rank, (name, qty, revenue) in enumerate(
+                top_items_between(args.start, args.end, args.mode, args.k, args.by), 1):
+            print(f"{rank:>3}. {name:<32} qty {qty:>8}  Rs{revenue:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import queue
+import sqlite3
+import threading
+import time
+from utils import metrics
+from utils.db_utils import get_connection, close_connections
+
+# Background workers for reports and exports, so the billing screen keeps running
+# while a manager pulls a large report. The Tk thread submits a job and polls it
+# from `after`; workers never touch widgets. Cancelling is cooperative: the job's
+# progress callback raises JobCancelled at its next call, and a running SQLite
+# statement is interrupted through a progress handler.
+
+_STOP = object()
+# SQLite VM steps between cancellation checks inside a single statement
+INTERRUPT_STEPS = 20000
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, name, fn, args=(), kwargs=None):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.state = QUEUED
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.elapsed = 0.0
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def progress(self, done, total=None):
+        # handed to the job function as progress=; also its cancellation point
+        self.done = done
+        if total is not None:
+            self.total = total
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    def fraction(self):
+        # None while the total is unknown
+        return min(1.0, self.done / self.total) if self.total else None
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def run(self):
+        if self._cancel.is_set():
+            self.state = CANCELLED
+            self._finished.set()
+            return
+        self.state = RUNNING
+        start = time.perf_counter()
+        conn = get_connection()
+        conn.set_progress_handler(lambda: 1 if self._cancel.is_set() else 0, INTERRUPT_STEPS)
+        try:
+            with metrics.span("report_job"):
+                self.result = self.fn(*self.args, progress=self.progress, **self.kwargs)
+            self.state = DONE
+        except JobCancelled:
+            self.state = CANCELLED
+        except sqlite3.OperationalError as e:
+            if self._cancel.is_set():
+                self.state = CANCELLED
+            else:
+                self.error, self.state = e, FAILED
+        except Exception as e:
+            self.error, self.state = e, FAILED
+        finally:
+            conn.set_progress_handler(None, 0)
+            self.elapsed = time.perf_counter() - start
+            metrics.count(f"jobs_{self.state}")
+            self._finished.set()
+
+
+class JobPool:
+    # a few daemon threads pulling jobs off one queue, each with its own pooled
+    # SQLite connection (WAL lets them read while the bill writer commits)
+
+    def __init__(self, workers=2):
+        self.pending = queue.Queue()
+        self._active = set()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run, name=f"report-job-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, name, fn, *args, **kwargs):
+        # fn(*args, progress=..., **kwargs); returns the Job to poll or cancel
+        job = Job(name, fn, args, kwargs)
+        with self._lock:
+            self._active.add(job)
+        self.pending.put(job)
+        return job
+
+    def _run(self):
+        try:
+            while True:
+                job = self.pending.get()
+                if job is _STOP:
+                    break
+                try:
+                    job.run()
+                finally:
+                    with self._lock:
+                        self._active.discard(job)
+        finally:
+            close_connections()
+
+    def active(self):
+        with self._lock:
+            return list(self._active)
+
+    def stop(self, timeout=10):
+        # cancels whatever is queued or running, then waits for the workers
+        for job in self.active():
+            job.cancel()
+        for _ in self._threads:
+            self.pending.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.monotonic()))
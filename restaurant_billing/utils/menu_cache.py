@@ -0,0 +1,30 @@
+from utils import metrics
+from utils.db_utils import DB_PATH, get_connection
+
+
+def fetch_menu_version(db_path=DB_PATH):
+    row = get_connection(db_path).execute("SELECT version FROM menu_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+class MenuCache:
+    # holds the menu rows and the menu_version they were read at; polling costs
+    # one primary-key read, the menu table is only re-read after an edit anywhere
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.version = None
+        self.items = []
+
+    def changed(self):
+        return fetch_menu_version(self.db_path) != self.version
+
+    def refresh(self, force=False):
+        version = fetch_menu_version(self.db_path)
+        if not force and version == self.version:
+            return False
+        with metrics.span("menu_load"):
+            cursor = get_connection(self.db_path).execute("SELECT item_name, price, gst FROM menu")
+            self.items = cursor.fetchall()
+        self.version = version
+        return True
@@ -0,0 +1,138 @@
+import argparse
+import csv
+import math
+import os
+from contextlib import nullcontext
+from utils.db_utils import DB_PATH, get_connection, transaction, initialize_database
+
+REPORT_COLUMNS = ["row", "item_name", "status", "detail"]
+STATUSES = ("added", "updated", "unchanged", "invalid")
+
+# category/gst stay untouched when the CSV has no such column (NULL here)
+_UPSERT = """
+    INSERT INTO menu (item_name, category, price, gst) VALUES (?, ?, ?, COALESCE(?, 0))
+    ON CONFLICT(item_name) DO UPDATE SET
+        category = COALESCE(excluded.category, menu.category),
+        price = excluded.price,
+        gst = COALESCE(?, menu.gst)
+"""
+
+_LOOKUP_CHUNK = 500
+
+
+def _parse_row(row, has_category, has_gst):
+    name = (row.get("item_name") or "").strip()
+    if not name:
+        raise ValueError("item_name is required")
+    try:
+        price = float(row.get("price") or "")
+    except ValueError:
+        raise ValueError(f"invalid price {row.get('price')!r}")
+    if not math.isfinite(price) or price < 0:
+        raise ValueError(f"invalid price {row.get('price')!r}")
+    gst = None
+    if has_gst:
+        try:
+            gst = float(row.get("gst") or 0)
+        except ValueError:
+            raise ValueError(f"invalid gst {row.get('gst')!r}")
+        if not 0 <= gst <= 100:
+            raise ValueError(f"invalid gst {row.get('gst')!r}")
+    category = (row.get("category") or "").strip() if has_category else None
+    return name, category, price, gst
+
+
+def _fetch_existing(cursor, names):
+    names = list(names)
+    found = {}
+    for i in range(0, len(names), _LOOKUP_CHUNK):
+        part = names[i:i + _LOOKUP_CHUNK]
+        marks = ",".join("?" * len(part))
+        for name, category, price, gst in cursor.execute(
+                f"SELECT item_name, category, price, gst FROM menu WHERE item_name IN ({marks})", part):
+            found[name] = (category, price, gst)
+    return found
+
+
+def _diff(old, new):
+    changes = []
+    old = (old[0] or "",) + tuple(old[1:])
+    for label, before, after in zip(("category", "price", "gst"), old, new):
+        if after is not None and after != before:
+            changes.append(f"{label} {before} -> {after}")
+    return "; ".join(changes)
+
+
+def _apply_chunk(cursor, chunk, seen, report, counts, dry_run):
+    # seen holds names already imported from earlier rows, so later duplicates diff against them
+    existing = _fetch_existing(cursor, {p[1][0] for p in chunk if p[1] is not None and p[1][0] not in seen})
+    upserts = []
+    for row_no, parsed, error in chunk:
+        if parsed is None:
+            counts["invalid"] += 1
+            report.writerow([row_no] + list(error))
+            continue
+        name, category, price, gst = parsed
+        old = seen.get(name)
+        if old is None:
+            old = existing.get(name)
+        if old is None:
+            status, detail = "added", ""
+            new = (category, price, gst if gst is not None else 0.0)
+        else:
+            detail = _diff(old, (category, price, gst))
+            status = "updated" if detail else "unchanged"
+            new = (old[0] if category is None else category, price, old[2] if gst is None else gst)
+        counts[status] += 1
+        report.writerow([row_no, name, status, detail])
+        seen[name] = new
+        if status != "unchanged":
+            upserts.append((name, category, price, gst, gst))
+    if upserts and not dry_run:
+        cursor.executemany(_UPSERT, upserts)
+
+
+def import_menu_csv(csv_path, report_path=None, chunk_size=5000, dry_run=False, db_path=DB_PATH):
+    # streams the CSV in chunks; every upsert lands in one transaction
+    counts = dict.fromkeys(STATUSES, 0)
+    with open(csv_path, newline="", encoding="utf-8-sig") as f, \
+            open(report_path or os.devnull, "w", newline="", encoding="utf-8") as rf:
+        reader = csv.DictReader(f)
+        fields = set(reader.fieldnames or ())
+        missing = {"item_name", "price"} - fields
+        if missing:
+            raise ValueError(f"Menu CSV is missing column(s): {', '.join(sorted(missing))}")
+        has_category, has_gst = "category" in fields, "gst" in fields
+        report = csv.writer(rf)
+        report.writerow(REPORT_COLUMNS)
+        seen = {}
+        ctx = nullcontext(get_connection(db_path).cursor()) if dry_run else transaction(db_path)
+        with ctx as cursor:
+            chunk = []
+            for row_no, row in enumerate(reader, start=2):
+                try:
+                    chunk.append((row_no, _parse_row(row, has_category, has_gst), None))
+                except ValueError as e:
+                    chunk.append((row_no, None, ((row.get("item_name") or "").strip(), "invalid", str(e))))
+                if len(chunk) >= chunk_size:
+                    _apply_chunk(cursor, chunk, seen, report, counts, dry_run)
+                    chunk = []
+            if chunk:
+                _apply_chunk(cursor, chunk, seen, report, counts, dry_run)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/upsert menu items from CSV")
+    parser.add_argument("csv_path")
+    parser.add_argument("--report", help="write a per-row validation/diff report CSV here")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true", help="validate and diff without writing")
+    args = parser.parse_args(argv)
+    initialize_database()
+    counts = import_menu_csv(args.csv_path, args.report, args.chunk_size, args.dry_run)
+    print(", ".join(f"{k}: {v}" for k, v in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
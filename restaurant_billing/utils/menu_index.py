@@ -0,0 +1,127 @@
+import heapq
+import math
+import unicodedata
+from bisect import bisect_left
+
+# posting-list entries the fuzzy stage may walk per search, see MenuIndex._fuzzy
+FUZZY_BUDGET = 1000
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.casefold().split())
+
+
+# int.bit_count is Python 3.10+
+_popcount = getattr(int, "bit_count", None) or (lambda n: bin(n).count("1"))
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MenuIndex:
+    # case/accent-insensitive lookup plus as-you-type search over menu dicts
+    # ({"name", "price", "gst"}); sorted keys give prefix ranges via bisect
+
+    def __init__(self, items=()):
+        self.items = []
+        self.by_key = {}
+        for item in items:
+            key = normalize(item["name"])
+            if key and key not in self.by_key:
+                self.by_key[key] = len(self.items)
+                self.items.append(item)
+        self.keys = sorted(self.by_key)
+        words = set()
+        self.trigrams = {}
+        # each trigram is one bit; a name's trigram set is the OR of its bits, so the
+        # trigrams it shares with a query are a single AND and a popcount
+        self.bits = {}
+        self.masks = [0] * len(self.items)
+        self.gram_counts = [0] * len(self.items)
+        for key, idx in self.by_key.items():
+            for pos, word in enumerate(key.split()):
+                if pos:
+                    words.add((word, idx))
+            grams = _trigrams(key)
+            mask = 0
+            for gram in grams:
+                bit = self.bits.get(gram)
+                if bit is None:
+                    bit = self.bits[gram] = 1 << len(self.bits)
+                mask |= bit
+                self.trigrams.setdefault(gram, []).append(idx)
+            self.masks[idx] = mask
+            self.gram_counts[idx] = len(grams)
+        self.words = sorted(words)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, name):
+        idx = self.by_key.get(normalize(name))
+        return None if idx is None else self.items[idx]
+
+    def names(self, limit=None):
+        return [self.items[self.by_key[k]]["name"] for k in self.keys[:limit]]
+
+    def _prefix(self, query, seen, out, limit):
+        pos = bisect_left(self.keys, query)
+        while pos < len(self.keys) and len(out) < limit and self.keys[pos].startswith(query):
+            idx = self.by_key[self.keys[pos]]
+            if idx not in seen:
+                seen.add(idx)
+                out.append(idx)
+            pos += 1
+
+    def _word_prefix(self, query, seen, out, limit):
+        pos = bisect_left(self.words, (query, -1))
+        while pos < len(self.words) and len(out) < limit and self.words[pos][0].startswith(query):
+            idx = self.words[pos][1]
+            if idx not in seen:
+                seen.add(idx)
+                out.append(idx)
+            pos += 1
+
+    def _fuzzy(self, query, seen, out, limit, cutoff):
+        grams = _trigrams(query)
+        # a name scoring >= cutoff shares at least `need` of the query's trigrams, so it
+        # is in one of the len(postings) - need + 1 rarest posting lists; walking those
+        # is exact. Lists that would take the walk past FUZZY_BUDGET are skipped (the
+        # rarest is always walked): what that misses shares only the query's most common
+        # trigrams, like "chicken" on a menu of chicken dishes, and ranks low anyway
+        need = max(1, math.ceil(cutoff * len(grams) - 1e-9))
+        postings = sorted((p for p in map(self.trigrams.get, grams) if p), key=len)
+        candidates = set()
+        for posting in postings[:len(postings) - need + 1]:
+            if candidates and len(candidates) + len(posting) > FUZZY_BUDGET:
+                break
+            candidates.update(posting)
+        query_mask = sum(self.bits.get(gram, 0) for gram in grams)
+        n, masks, counts = len(grams), self.masks, self.gram_counts
+        scored = []
+        for idx in candidates - seen:
+            common = _popcount(query_mask & masks[idx])
+            if common >= need:
+                score = common / (n + counts[idx] - common)
+                if score >= cutoff:
+                    scored.append((-score, idx))
+        for _, idx in heapq.nsmallest(limit - len(out), scored):
+            seen.add(idx)
+            out.append(idx)
+
+    def search(self, query, limit=20, fuzzy=True, cutoff=0.3):
+        # exact match, then name prefix, then word prefix, then trigram similarity
+        query = normalize(query)
+        if not query:
+            return self.names(limit)
+        seen, out = set(), []
+        self._prefix(query, seen, out, limit)
+        if len(out) < limit:
+            self._word_prefix(query, seen, out, limit)
+        if fuzzy and len(out) < limit:
+            self._fuzzy(query, seen, out, limit, cutoff)
+        return [self.items[idx]["name"] for idx in out]
@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# In-process timings and counters for the billing flow. Recording a span costs a
+# couple of perf_counter calls and a locked bucket increment. Read them over
+# http://127.0.0.1:$RBS_METRICS_PORT/metrics (Prometheus text format), or from a
+# file rewritten every RBS_METRICS_INTERVAL seconds (RBS_METRICS_FILE).
+
+ENABLED = os.environ.get("RBS_METRICS", "1") != "0"
+# 100us doubling up to ~52s
+BUCKETS = tuple(0.0001 * 2 ** i for i in range(20))
+PROFILE_DIR = os.path.abspath(os.path.join("data", "profiles"))
+
+SPAN_FAMILY = ("rbs_span_seconds", "Time spent in instrumented billing steps")
+EVENT_FAMILY = ("rbs_events_total", "Counts of billing events")
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        rank, seen = q * total, 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+_spans = {}
+_events = {}
+_registry_lock = threading.Lock()
+
+
+def _get(table, name, factory):
+    metric = table.get(name)
+    if metric is None:
+        with _registry_lock:
+            metric = table.setdefault(name, factory())
+    return metric
+
+
+def histogram(name):
+    return _get(_spans, name, Histogram)
+
+
+def count(event, n=1):
+    if ENABLED:
+        _get(_events, event, Counter).inc(n)
+
+
+def observe(name, seconds):
+    if ENABLED:
+        histogram(name).observe(seconds)
+
+
+@contextmanager
+def span(name):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram(name).observe(time.perf_counter() - start)
+
+
+def reset():
+    with _registry_lock:
+        _spans.clear()
+        _events.clear()
+
+
+def _fmt(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+def render_prometheus():
+    out = [f"# HELP {SPAN_FAMILY[0]} {SPAN_FAMILY[1]}", f"# TYPE {SPAN_FAMILY[0]} histogram"]
+    for name, h in sorted(_spans.items()):
+        with h._lock:
+            counts, total, hsum = list(h.counts), h.count, h.sum
+        cumulative = 0
+        for bound, c in zip(h.bounds + (float("inf"),), counts):
+            cumulative += c
+            out.append(f'{SPAN_FAMILY[0]}_bucket{{span="{name}",le="{_fmt(bound)}"}} {cumulative}')
+        out.append(f'{SPAN_FAMILY[0]}_sum{{span="{name}"}} {hsum!r}')
+        out.append(f'{SPAN_FAMILY[0]}_count{{span="{name}"}} {total}')
+    out += [f"# HELP {EVENT_FAMILY[0]} {EVENT_FAMILY[1]}", f"# TYPE {EVENT_FAMILY[0]} counter"]
+    for name, c in sorted(_events.items()):
+        out.append(f'{EVENT_FAMILY[0]}{{event="{name}"}} {c.value}')
+    return "\n".join(out) + "\n"
+
+
+def summary():
+    # one line per span: count, mean and bucketed p50/p95/p99 in milliseconds
+    lines = []
+    for name, h in sorted(_spans.items()):
+        mean = h.sum / h.count if h.count else 0.0
+        lines.append(f"{name:<20} n={h.count:<8} mean={mean * 1000:.2f}ms "
+                     f"p50<={h.quantile(0.5) * 1000:.2f}ms p95<={h.quantile(0.95) * 1000:.2f}ms "
+                     f"p99<={h.quantile(0.99) * 1000:.2f}ms")
+    for name, c in sorted(_events.items()):
+        lines.append(f"{name:<20} {c.value}")
+    return "\n".join(lines)
+
+
+def dump(path):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+    return path
+
+
+def start_file_dump(path, interval=15.0):
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            dump(path)
+        dump(path)
+
+    threading.Thread(target=run, name="metrics-dump", daemon=True).start()
+    return stop
+
+
+def serve(port, host="127.0.0.1"):
+    # GET /metrics for the scrape, GET /profile-next-bill to profile the next bill
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, ctype = render_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+            elif self.path == "/profile-next-bill":
+                arm_profile()
+                body, ctype = b"armed\n", "text/plain"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_from_env():
+    started = []
+    port = os.environ.get("RBS_METRICS_PORT")
+    if port:
+        started.append(serve(int(port)))
+    path = os.environ.get("RBS_METRICS_FILE")
+    if path:
+        started.append(start_file_dump(path, float(os.environ.get("RBS_METRICS_INTERVAL", "15"))))
+    if os.environ.get("RBS_PROFILE_BILL") == "1":
+        arm_profile()
+    return started
+
+
+_profile_armed = threading.Event()
+
+
+def arm_profile():
+    _profile_armed.set()
+
+
+def take_profile():
+    # True exactly once after arm_profile()
+    if _profile_armed.is_set():
+        _profile_armed.clear()
+        return True
+    return False
+
+
+@contextmanager
+def profiled(label, out_dir=None):
+    # cProfile around the block; writes <label>.prof and a top-30 text report
+    import cProfile
+    import pstats
+    out_dir = out_dir or PROFILE_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        base = os.path.join(out_dir, label)
+        prof.dump_stats(base + ".prof")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            pstats.Stats(prof, stream=f).sort_stats("cumulative").print_stats(30)
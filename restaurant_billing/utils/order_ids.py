@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# 63-bit ids: | 41 bits ms since EPOCH | 10 bits terminal | 12 bits sequence |
+# unique across up to 1024 terminals at 4096 ids per ms each, and sorted by time
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_EPOCH_MS = int(EPOCH.timestamp() * 1000)
+TERMINAL_BITS = 10
+SEQUENCE_BITS = 12
+MAX_TERMINAL = (1 << TERMINAL_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def terminal_id_from_env():
+    # RBS_TERMINAL_ID. A lone counter may leave it unset and is terminal 0; with an
+    # order service (RBS_ORDER_SERVER) several counters share one database, and two of
+    # them defaulting to 0 would issue the same order and tab ids, so it is required
+    value = os.environ.get("RBS_TERMINAL_ID", "").strip()
+    if not value:
+        if os.environ.get("RBS_ORDER_SERVER"):
+            raise ValueError("RBS_TERMINAL_ID must be set on every counter that uses the order service")
+        return 0
+    terminal_id = int(value)
+    if not 0 <= terminal_id <= MAX_TERMINAL:
+        raise ValueError(f"RBS_TERMINAL_ID must be between 0 and {MAX_TERMINAL}")
+    return terminal_id
+
+
+def _now_ms():
+    return time.time_ns() // 1_000_000 - _EPOCH_MS
+
+
+class OrderIdAllocator:
+    # each running terminal process needs its own terminal_id (terminal_id_from_env)
+
+    def __init__(self, terminal_id=None, clock=_now_ms):
+        if terminal_id is None:
+            terminal_id = terminal_id_from_env()
+        if not 0 <= terminal_id <= MAX_TERMINAL:
+            raise ValueError(f"terminal_id must be between 0 and {MAX_TERMINAL}")
+        self.terminal_id = terminal_id
+        self.clock = clock
+        self.last_ms = -1
+        self.sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            # a clock stepped backwards keeps using the last timestamp instead of reissuing ids
+            now = max(self.clock(), self.last_ms)
+            if now == self.last_ms:
+                self.sequence = (self.sequence + 1) & MAX_SEQUENCE
+                if self.sequence == 0:
+                    while now <= self.last_ms:
+                        now = self.clock()
+            else:
+                self.sequence = 0
+            self.last_ms = now
+            return (now << (TERMINAL_BITS + SEQUENCE_BITS)) | (self.terminal_id << SEQUENCE_BITS) | self.sequence
+
+
+def decode_order_id(order_id):
+    # legacy ids were unix seconds; returns (datetime utc, terminal, sequence)
+    if order_id < (1 << 40):
+        return datetime.fromtimestamp(order_id, tz=timezone.utc), None, None
+    ms = order_id >> (TERMINAL_BITS + SEQUENCE_BITS)
+    terminal = (order_id >> SEQUENCE_BITS) & MAX_TERMINAL
+    return EPOCH + timedelta(milliseconds=ms), terminal, order_id & MAX_SEQUENCE
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def next_order_id():
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = OrderIdAllocator()
+    return _default.next_id()
+
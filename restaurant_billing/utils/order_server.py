@@ -0,0 +1,359 @@
+import argparse
+import asyncio
+import ipaddress
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import metrics
+from utils.billing import commit_bills
+from utils.outbox import SYNC_INTERVAL, sync_artifacts
+from utils.db_utils import DB_PATH, add_menu_item, delete_menu_item, get_connection, initialize_database
+from utils.menu_cache import MenuCache
+from utils.tabs import apply_tab_ops
+from utils.users import setup_users
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# newline-delimited JSON, one request and one response per line:
+#   {"op": "commit", "bills": [...]}  -> {"ok": true, "stored": [order ids]}
+#       (idempotent per order_id, so a client may resend a commit it lost the reply to)
+#   {"op": "tabs", "ops": [...]}      -> {"ok": true}  (open-tab changes, see utils.tabs)
+#   {"op": "menu", "version": n}      -> {"ok": true, "version": n, "items": [...] | "unchanged": true}
+#   {"op": "menu_add", "item_name": ..., "category": ..., "price": p, "gst": g}
+#                                     -> {"ok": true, "added": false when it exists already}
+#   {"op": "menu_delete", "item_name": ...} -> {"ok": true, "deleted": rows | null}
+#   {"op": "ping"}                    -> {"ok": true}
+# failures come back as {"ok": false, "error": "..."}
+
+
+class OrderServiceError(Exception):
+    pass
+
+
+def _require_loopback(host):
+    addr = ipaddress.ip_address(socket.gethostbyname(host))
+    if not addr.is_loopback:
+        raise ValueError(f"Order service only listens on localhost, not {host}")
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or DEFAULT_HOST, int(port or DEFAULT_PORT)
+
+
+class OrderServer:
+    # single writer for the database: bills from every terminal connection are
+    # queued and group-committed on one dedicated thread
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, max_batch=500, max_delay=0.01, commit=commit_bills,
+                 idle=sync_artifacts, db_path=DB_PATH, idle_interval=SYNC_INTERVAL):
+        _require_loopback(host)
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.commit = commit
+        self.db_path = db_path
+        # brings the archive and bill store up to date when no bills are queued, at most
+        # every idle_interval seconds
+        self.idle = idle
+        self.idle_interval = idle_interval
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="order-writer")
+        self.menu = None
+        self.server = None
+        self.queue = None
+        self._batcher = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, limit=16 * 1024 * 1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        # whatever the debounced idle sync has not written yet
+        await self._idle(asyncio.get_running_loop())
+        self.executor.shutdown(wait=True)
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    response = await self._dispatch(request)
+                except Exception as e:
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request):
+        op = request.get("op")
+        loop = asyncio.get_running_loop()
+        if op == "commit":
+            bills = request.get("bills") or []
+            fut = loop.create_future()
+            await self.queue.put((bills, fut))
+            return {"ok": True, "stored": await fut}
+        if op == "tabs":
+            await loop.run_in_executor(self.executor, apply_tab_ops, request.get("ops") or [], self.db_path)
+            return {"ok": True}
+        if op == "menu":
+            return await loop.run_in_executor(self.executor, self._read_menu, request.get("version"))
+        if op == "menu_add":
+            added = await loop.run_in_executor(self.executor, add_menu_item, request["item_name"],
+                                               request.get("category", ""), float(request["price"]),
+                                               float(request.get("gst", 0)), self.db_path)
+            return {"ok": True, "added": added}
+        if op == "menu_delete":
+            deleted = await loop.run_in_executor(self.executor, delete_menu_item, request["item_name"], self.db_path)
+            return {"ok": True, "deleted": deleted}
+        if op == "ping":
+            return {"ok": True}
+        raise ValueError(f"unknown op {op!r}")
+
+    def _read_menu(self, version):
+        # runs on the writer thread so the cache and its connection stay on one thread
+        if self.menu is None:
+            self.menu = MenuCache()
+        self.menu.refresh()
+        if version is not None and version == self.menu.version:
+            return {"ok": True, "version": self.menu.version, "unchanged": True}
+        return {"ok": True, "version": self.menu.version, "items": [list(r) for r in self.menu.items]}
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        await self._idle(loop)
+        idle_due = None
+        while True:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), None if idle_due is None
+                                               else max(0.0, idle_due - loop.time()))
+            except asyncio.TimeoutError:
+                # quiet since the last commits: time for the deferred idle()
+                idle_due = None
+                await self._idle(loop)
+                continue
+            batch = [first]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_delay
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            await self._commit_batch(loop, batch)
+            if self.idle is None:
+                continue
+            if idle_due is None:
+                idle_due = loop.time() + self.idle_interval
+            if self.queue.empty() and loop.time() >= idle_due:
+                idle_due = None
+                await self._idle(loop)
+
+    async def _idle(self, loop):
+        if self.idle is not None:
+            await loop.run_in_executor(self.executor, self.idle)
+
+    def _commit_new(self, bills):
+        # runs on the writer thread. A client resends a commit after a dropped connection,
+        # and the first send may already be committed or be in this same batch; bills whose
+        # order_id is stored already are acknowledged again rather than failing as duplicates
+        ids = [b["order_id"] for b in bills]
+        stored = {oid for (oid,) in get_connection(self.db_path).execute(
+            "SELECT order_id FROM orders WHERE order_id IN (SELECT value FROM json_each(?))", (json.dumps(ids),))}
+        new = []
+        for bill in bills:
+            if bill["order_id"] not in stored:
+                stored.add(bill["order_id"])
+                new.append(bill)
+        if len(new) < len(bills):
+            metrics.count("commit_replayed", len(bills) - len(new))
+        if new:
+            self.commit(new)
+        return ids
+
+    async def _commit_batch(self, loop, batch):
+        try:
+            stored = await loop.run_in_executor(self.executor, self._commit_new, [b for bills, _ in batch for b in bills])
+        except Exception as e:
+            if len(batch) > 1:
+                # one terminal's bad bill must not fail the other terminals' bills
+                for item in batch:
+                    await self._commit_batch(loop, [item])
+                return
+            fut = batch[0][1]
+            if not fut.done():
+                fut.set_exception(OrderServiceError(f"{type(e).__name__}: {e}"))
+            return
+        pos = 0
+        for bills, fut in batch:
+            if not fut.done():
+                fut.set_result(stored[pos:pos + len(bills)])
+            pos += len(bills)
+
+
+class OrderClient:
+    # blocking client used by terminals; safe to share between the UI and writer threads
+
+    def __init__(self, address=f"{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=10):
+        self.host, self.port = parse_address(address)
+        _require_loopback(self.host)
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        for obj in (self._file, self._sock):
+            if obj is not None:
+                try:
+                    obj.close()
+                except OSError:
+                    pass
+        self._sock = self._file = None
+
+    def _roundtrip(self, payload):
+        if self._sock is None:
+            self._connect()
+        self._sock.sendall(payload)
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("order service closed the connection")
+        return json.loads(line)
+
+    def call(self, op, **fields):
+        payload = json.dumps(dict(fields, op=op), ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            try:
+                response = self._roundtrip(payload)
+            except (OSError, ConnectionError):
+                # one reconnect covers a restarted service; a second failure is reported.
+                # Resending is safe: the service acknowledges an already stored commit
+                self._close()
+                response = self._roundtrip(payload)
+        if not response.get("ok"):
+            raise OrderServiceError(response.get("error", "order service error"))
+        return response
+
+    def commit(self, bills):
+        return self.call("commit", bills=list(bills))["stored"]
+
+    def write_tabs(self, ops):
+        self.call("tabs", ops=list(ops))
+
+    def fetch_menu(self, version=None):
+        return self.call("menu", version=version)
+
+    def add_menu_item(self, name, category, price, gst):
+        return self.call("menu_add", item_name=name, category=category, price=price, gst=gst)["added"]
+
+    def delete_menu_item(self, name):
+        return self.call("menu_delete", item_name=name)["deleted"]
+
+    def ping(self):
+        return self.call("ping")["ok"]
+
+
+class RemoteMenuCache:
+    # MenuCache interface backed by the order service. Once watch() is running the
+    # service is polled on a daemon thread, so changed() never waits on the network and
+    # refresh() applies the menu the watcher already fetched
+
+    def __init__(self, client):
+        self.client = client
+        self.version = None
+        self.items = []
+        self._fetched = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def watch(self, interval):
+        threading.Thread(target=self._watch, args=(interval,), name="menu-watch", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            with self._lock:
+                known = self._fetched[0] if self._fetched else self.version
+            try:
+                response = self.client.fetch_menu(known)
+            except (OrderServiceError, OSError):
+                # the service is down or stalled; try again next interval
+                metrics.count("menu_poll_failed")
+                continue
+            if not response.get("unchanged"):
+                with self._lock:
+                    self._fetched = (response["version"], [tuple(r) for r in response["items"]])
+
+    def changed(self):
+        with self._lock:
+            return self._fetched is not None and self._fetched[0] != self.version
+
+    def refresh(self, force=False):
+        with self._lock:
+            fetched, self._fetched = self._fetched, None
+        if fetched is None or force:
+            response = self.client.fetch_menu(None if force else self.version)
+            if response.get("unchanged"):
+                return False
+            fetched = (response["version"], [tuple(r) for r in response["items"]])
+        if fetched[0] == self.version and not force:
+            return False
+        self.version, self.items = fetched
+        return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local order-ingest service (single database writer)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    # terminals skip their own setup in service mode
+    initialize_database()
+    setup_users()
+    server = OrderServer(args.host, args.port)
+    print(f"Order service listening on {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+from utils import metrics
+from utils.db_utils import DB_PATH, get_connection, transaction, initialize_database
+from utils.archive import ARCHIVE_DIR, append_bills
+from utils.bill_store import BILL_STORE_DIR, open_store
+from utils.filelock import dir_lock
+
+# SQLite is the only durable write on the bill path: save_bills_to_db adds one outbox
+# row per bill in the same transaction. The archive and the bill store are derived
+# from the database here, a batch at a time, and each keeps the last outbox seq it
+# holds in artifact_checkpoints. A crash between the commit and an artifact write
+# only delays that artifact; the next sync replays from its checkpoint. CSV and PDF
+# are not kept per bill at all, they are exported from the database on demand.
+# commit_bills syncs once SYNC_BATCH bills are pending. The bill writer and the order
+# service also sync when their queue runs dry, but at most every SYNC_INTERVAL seconds,
+# so a quiet counter still writes its artifacts in batches rather than once per bill.
+# Each batch is read, written and checkpointed under the artifact's directory lock, so
+# a second process syncing (or the CLI) waits instead of appending the same rows twice.
+
+SYNC_BATCH = 500
+SYNC_INTERVAL = 30.0
+
+
+def _write_archive(bills, seqs, root):
+    # the archive skips seqs it already holds, so a replayed batch is not archived twice
+    append_bills(bills, root, seqs)
+
+
+def _write_store(bills, seqs, root):
+    # a replayed bill is appended again and simply replaces the earlier record
+    open_store(root).append(bills)
+
+
+ARTIFACTS = {
+    "archive": (_write_archive, ARCHIVE_DIR),
+    "bill_store": (_write_store, BILL_STORE_DIR),
+}
+
+
+def checkpoint(artifact, conn=None):
+    conn = conn or get_connection()
+    row = conn.execute("SELECT seq FROM artifact_checkpoints WHERE artifact = ?", (artifact,)).fetchone()
+    return row[0] if row else 0
+
+
+def lag(artifact, conn=None):
+    # committed bills the artifact does not hold yet
+    conn = conn or get_connection()
+    return conn.execute("SELECT COUNT(*) FROM outbox WHERE seq > ?", (checkpoint(artifact, conn),)).fetchone()[0]
+
+
+def _behind(artifact, conn):
+    # cheap upper bound on lag(): seqs can have gaps from rolled back commits
+    newest = conn.execute("SELECT MAX(seq) FROM outbox").fetchone()[0]
+    return (newest or 0) - checkpoint(artifact, conn)
+
+
+def sync_artifact(artifact, root=None, db_path=DB_PATH, batch_size=SYNC_BATCH):
+    # returns how many bills were written to the artifact. The files are written with
+    # no transaction open, so the bill writer keeps committing meanwhile; a batch is
+    # only marked done afterwards, in a short transaction of its own. A crash in
+    # between replays the batch, which both artifacts already tolerate
+    from utils.exporters import fetch_bills  # kept off the startup path
+    write, default_root = ARTIFACTS[artifact]
+    root = root or default_root
+    conn = get_connection(db_path)
+    synced = 0
+    while True:
+        with dir_lock(root):
+            rows = conn.execute("SELECT seq, order_id FROM outbox WHERE seq > ? ORDER BY seq LIMIT ?",
+                                (checkpoint(artifact, conn), batch_size)).fetchall()
+            if not rows:
+                return synced
+            found = fetch_bills([oid for _, oid in rows], conn)
+            pairs = [(found[oid], seq) for seq, oid in rows if oid in found]
+            with metrics.span(f"sync_{artifact}"):
+                write([b for b, _ in pairs], [seq for _, seq in pairs], root)
+            with transaction(db_path) as cur:
+                # never moves back, should a sync against another root have gone further
+                cur.execute("INSERT INTO artifact_checkpoints (artifact, seq) VALUES (?, ?) "
+                            "ON CONFLICT(artifact) DO UPDATE SET seq = MAX(seq, excluded.seq)",
+                            (artifact, rows[-1][0]))
+        synced += len(rows)
+        if len(rows) < batch_size:
+            return synced
+
+
+def trim(db_path=DB_PATH):
+    # drop outbox rows every registered artifact has caught up with, including ones
+    # the caller skipped; an artifact that never synced keeps the whole outbox
+    with transaction(db_path) as cur:
+        names = list(ARTIFACTS)
+        floor = cur.execute(
+            f"SELECT MIN(seq), COUNT(*) FROM artifact_checkpoints WHERE artifact IN ({','.join('?' * len(names))})",
+            names).fetchone()
+        if floor[1] == len(names):
+            cur.execute("DELETE FROM outbox WHERE seq <= ?", (floor[0],))
+
+
+def sync_artifacts(db_path=DB_PATH, archive_dir=ARCHIVE_DIR, store_dir=BILL_STORE_DIR, batch_size=SYNC_BATCH,
+                   min_pending=1):
+    # best effort after a commit: the bills are already durable, so a failing artifact
+    # is counted (artifact_sync_failed) and left in the outbox for the next call.
+    # Artifacts fewer than min_pending bills behind are left alone. A falsy dir skips
+    # that artifact, and its checkpoint then holds back the trim
+    synced = {}
+    conn = get_connection(db_path)
+    for artifact, root in (("archive", archive_dir), ("bill_store", store_dir)):
+        if not root:
+            continue
+        try:
+            if _behind(artifact, conn) < min_pending:
+                synced[artifact] = 0
+                continue
+            synced[artifact] = sync_artifact(artifact, root, db_path, batch_size)
+        except Exception:
+            metrics.count("artifact_sync_failed")
+            synced[artifact] = None
+    if synced and None not in synced.values() and any(synced.values()):
+        trim(db_path)
+    return synced
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bring the archive and bill store up to date with the database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="bills each artifact is behind")
+    sub.add_parser("sync", help="write every pending bill")
+    args = parser.parse_args(argv)
+    initialize_database()
+    if args.command == "sync":
+        for artifact, count in sync_artifacts().items():
+            print(f"{artifact}: {'failed' if count is None else f'{count} synced'}")
+    else:
+        for artifact in ARTIFACTS:
+            print(f"{artifact}: checkpoint {checkpoint(artifact)}, {lag(artifact)} pending")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+FONT = "Helvetica"
+LINE_H = 10
+_NEXT = {"new_x": XPos.LMARGIN, "new_y": YPos.NEXT}
+
+
+def _bill_lines(bill):
+    # everything below the title, pre-formatted so rendering is just cell() calls
+    out = [f"Order ID: {bill['order_id']}", f"Date: {bill['timestamp']}", None]
+    for it in bill["items"]:
+        out.append(f"{it['item_name']} x{it['quantity']} Rs{it['price']} | GST:{it['gst']}%")
+    out += [
+        f"Subtotal: Rs{bill['subtotal']:.2f}",
+        f"GST: Rs{bill['gst_total']:.2f}",
+        f"Discount: {bill['discount_pct']}%",
+        f"Total: Rs{bill['total']:.2f}",
+    ]
+    return out
+
+
+class BillDocument(FPDF):
+    # fonts and margins are set once per document; each bill becomes one page
+
+    def __init__(self):
+        super().__init__()
+        self.set_compression(True)
+        self.set_auto_page_break(True, margin=10)
+        self.set_font(FONT, size=12)
+
+    def add_bill(self, bill):
+        self.add_page()
+        self.set_font(FONT, "B", 16)
+        self.cell(0, LINE_H, "Restaurant Bill", align="C", **_NEXT)
+        self.set_font(FONT, size=12)
+        for text in _bill_lines(bill):
+            if text is None:
+                self.ln(5)
+            else:
+                self.cell(0, LINE_H, text, **_NEXT)
+
+
+def bill_pdf_path(out_dir, order_id):
+    return os.path.abspath(os.path.join(out_dir, f"bill_{order_id}.pdf"))
+
+
+def render_bill_pdf(bill, path):
+    doc = BillDocument()
+    doc.add_bill(bill)
+    doc.output(path)
+    return path
+
+
+def render_combined_pdf(bills, path):
+    doc = BillDocument()
+    count = 0
+    for bill in bills:
+        doc.add_bill(bill)
+        count += 1
+    doc.output(path)
+    return count
+
+
+def _render_chunk(bills, out_dir):
+    return [render_bill_pdf(b, bill_pdf_path(out_dir, b["order_id"])) for b in bills]
+
+
+def _chunks(bills, size):
+    chunk = []
+    for bill in bills:
+        chunk.append(bill)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render_bills(bills, out_dir, workers=None, chunk_size=64):
+    # one PDF per bill, fanned out over a process pool in chunks
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [p for chunk in _chunks(bills, chunk_size) for p in _render_chunk(chunk, out_dir)]
+    paths = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for chunk in _chunks(bills, chunk_size):
+            pending.append(pool.submit(_render_chunk, chunk, out_dir))
+            # bound the in-flight work so huge reprints do not sit in memory
+            if len(pending) >= workers * 4:
+                paths.extend(pending.pop(0).result())
+        for fut in pending:
+            paths.extend(fut.result())
+    return paths
+
+
+def sample_bills(n, items_per_bill=5):
+    return [{
+        "order_id": 1000000 + i,
+        "timestamp": "2025-08-14 20:03:21",
+        "mode": "Dine-In",
+        "payment_method": "Cash",
+        "items": [{"item_name": f"Item {j}", "quantity": 2, "price": 150.0, "gst": 5.0, "line_total": 300.0}
+                  for j in range(items_per_bill)],
+        "subtotal": 300.0 * items_per_bill,
+        "gst_total": 15.0 * items_per_bill,
+        "discount_pct": 0.0,
+        "total": 315.0 * items_per_bill,
+    } for i in range(n)]
+
+
+def benchmark(n=500, workers=None):
+    bills = sample_bills(n)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, w in (("single_process", 1), ("process_pool", workers or os.cpu_count() or 1)):
+            start = time.perf_counter()
+            render_bills(bills, os.path.join(tmp, label), workers=w)
+            results[label] = n / (time.perf_counter() - start)
+        start = time.perf_counter()
+        render_combined_pdf(bills, os.path.join(tmp, "combined.pdf"))
+        results["combined"] = n / (time.perf_counter() - start)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch bill PDF rendering")
+    sub = parser.add_subparsers(dest="command", required=True)
+    render = sub.add_parser("render", help="render stored bills from the database")
+    render.add_argument("--start", help="first timestamp/date to include")
+    render.add_argument("--end", help="timestamp/date to stop before")
+    render.add_argument("--out", default=os.path.join("data", "pdfs"), help="directory for per-bill PDFs")
+    render.add_argument("--combined", help="write one multi-page PDF here instead")
+    render.add_argument("--workers", type=int)
+    bench = sub.add_parser("bench", help="measure bills rendered per second")
+    bench.add_argument("--bills", type=int, default=500)
+    bench.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        for label, rate in benchmark(args.bills, args.workers).items():
+            print(f"{label}: {rate:.1f} bills/s")
+        return
+    from utils.exporters import iter_bills
+    bills = iter_bills(args.start, args.end)
+    if args.combined:
+        print(f"Rendered {render_combined_pdf(bills, args.combined)} bills into {args.combined}")
+    else:
+        print(f"Rendered {len(render_bills(bills, args.out, args.workers))} PDFs into {args.out}")
+
+
+if __name__ == "__main__":
+    main()
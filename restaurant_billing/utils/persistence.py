@@ -0,0 +1,176 @@
+import queue
+import threading
+import time
+from itertools import groupby
+from utils import metrics
+from utils.billing import commit_bills
+from utils.outbox import SYNC_INTERVAL, sync_artifacts
+from utils.db_utils import close_connections
+from utils.tabs import apply_tab_ops
+
+_STOP = object()
+
+
+class _TabOps:
+    # open-tab changes (utils.tabs) queued between the bills, applied in submit order
+    def __init__(self, ops):
+        self.ops = ops
+
+
+class _Profiled:
+    # a bill committed on its own under cProfile, see metrics.profiled
+    def __init__(self, bill, label):
+        self.bill = bill
+        self.label = label
+
+
+def _kind(item):
+    return type(item) if isinstance(item, (_TabOps, _Profiled)) else dict
+
+
+class PersistenceWorker:
+    # write-behind queue: the UI thread submits finished bills and returns at once,
+    # a single background thread group-commits them in batches. idle() runs on that
+    # thread at start-up, at most every idle_interval seconds once bills have been
+    # committed and the queue is dry, and on stop (None when another process owns
+    # the database). write_tabs(ops) persists open-tab ops on the same thread
+
+    def __init__(self, commit=commit_bills, max_batch=200, max_delay=0.05, idle=sync_artifacts,
+                 idle_interval=SYNC_INTERVAL, write_tabs=apply_tab_ops):
+        self.commit = commit
+        self.write_tabs = write_tabs
+        self.idle = idle
+        self.idle_interval = idle_interval
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._idle_due = None
+        self.pending = queue.Queue()
+        self.results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="bill-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, bill):
+        self.pending.put(bill)
+
+    def submit_tabs(self, ops):
+        self.pending.put(_TabOps(ops))
+
+    def submit_profiled(self, bill, label):
+        # like submit(); the commit is profiled on the writer thread into <label>.prof
+        self.pending.put(_Profiled(bill, label))
+
+    def _next_batch(self):
+        try:
+            if self._idle_due is None:
+                first = self.pending.get()
+            else:
+                first = self.pending.get(timeout=max(0.0, self._idle_due - time.monotonic()))
+        except queue.Empty:
+            # quiet since the last commits: time for the deferred idle()
+            self._idle()
+            return []
+        if first is _STOP:
+            self.pending.task_done()
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self.pending.get(timeout=timeout) if timeout > 0 else self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self.pending.put(_STOP)
+                self.pending.task_done()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        try:
+            self._idle()
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                if not batch:
+                    continue
+                try:
+                    for kind, items in groupby(batch, _kind):
+                        if kind is _TabOps:
+                            self._write_tabs(list(items))
+                        elif kind is _Profiled:
+                            for item in items:
+                                with metrics.profiled(item.label):
+                                    self._commit([item.bill])
+                        else:
+                            self._commit(list(items))
+                finally:
+                    for _ in batch:
+                        self.pending.task_done()
+                if self.idle is not None:
+                    if self._idle_due is None:
+                        self._idle_due = time.monotonic() + self.idle_interval
+                    if self.pending.empty() and time.monotonic() >= self._idle_due:
+                        self._idle()
+            if self._idle_due is not None:
+                self._idle()
+        finally:
+            close_connections()
+
+    def _idle(self):
+        self._idle_due = None
+        if self.idle is None:
+            return
+        try:
+            self.idle()
+        except Exception:
+            metrics.count("writer_idle_failed")
+
+    def _commit(self, batch):
+        try:
+            with metrics.span("writer_batch"):
+                self.commit(batch)
+            self.results.put((batch, None))
+        except Exception as e:
+            if len(batch) == 1:
+                metrics.count("bills_failed")
+                self.results.put((batch, e))
+                return
+            # isolate the bad bill(s) so one failure does not reject the whole group
+            for bill in batch:
+                self._commit([bill])
+
+    def _write_tabs(self, items):
+        try:
+            with metrics.span("writer_tabs"):
+                self.write_tabs([op for item in items for op in item.ops])
+        except Exception as e:
+            if len(items) == 1:
+                metrics.count("tab_writes_failed")
+                self.results.put(([], e))
+                return
+            for item in items:
+                self._write_tabs([item])
+
+    def poll(self):
+        # drain outcomes on the caller's thread; Tk widgets must only be touched there.
+        # (bills, error) per commit; ([], error) for open-tab ops that failed
+        out = []
+        while True:
+            try:
+                out.append(self.results.get_nowait())
+            except queue.Empty:
+                return out
+
+    def flush(self):
+        self.pending.join()
+
+    def drained(self):
+        # non-blocking flush(): True once every submitted bill is committed or reported
+        return self.pending.unfinished_tasks == 0
+
+    def stop(self, timeout=10):
+        self.pending.put(_STOP)
+        self._thread.join(timeout)
@@ -0,0 +1,99 @@
+import os
+import socket
+import textwrap
+import time
+
+WIDTH = 42
+
+ESC = b"\x1b"
+GS = b"\x1d"
+INIT = ESC + b"@"
+CODEPAGE_PC437 = ESC + b"t\x00"
+ALIGN_LEFT = ESC + b"a\x00"
+ALIGN_CENTER = ESC + b"a\x01"
+BOLD_ON = ESC + b"E\x01"
+BOLD_OFF = ESC + b"E\x00"
+DOUBLE_ON = GS + b"!\x11"
+DOUBLE_OFF = GS + b"!\x00"
+PARTIAL_CUT = GS + b"V\x42\x00"
+
+
+def _money(value):
+    return f"Rs{value:.2f}"
+
+
+def _two_col(left, right, width):
+    space = width - len(right) - 1
+    return f"{left[:space]:<{space}} {right}"
+
+
+def receipt_body(bill, width=WIDTH):
+    # plain lines below the title; shared by the text and ESC/POS renderers
+    rule = "-" * width
+    lines = [
+        f"Order ID: {bill['order_id']}",
+        f"Date: {bill['timestamp']}",
+        f"{bill['mode']} / {bill['payment_method']}",
+        rule,
+    ]
+    for it in bill["items"]:
+        amount = _money(it["line_total"])
+        label = f"{it['item_name']} x{it['quantity']}"
+        wrapped = textwrap.wrap(label, width - len(amount) - 1) or [""]
+        lines.extend(wrapped[:-1])
+        lines.append(_two_col(wrapped[-1], amount, width))
+    lines += [
+        rule,
+        _two_col("Subtotal", _money(bill["subtotal"]), width),
+        _two_col("GST", _money(bill["gst_total"]), width),
+        _two_col("Discount", f"{bill['discount_pct']}%", width),
+    ]
+    return lines
+
+
+def format_receipt(bill, width=WIDTH):
+    lines = ["Restaurant Bill".center(width).rstrip()]
+    lines += receipt_body(bill, width)
+    lines.append(_two_col("TOTAL", _money(bill["total"]), width))
+    return "\n".join(lines) + "\n"
+
+
+def _encode(text):
+    return text.encode("cp437", errors="replace")
+
+
+def to_escpos(bill, width=WIDTH, cut=True):
+    out = [INIT, CODEPAGE_PC437, ALIGN_CENTER, BOLD_ON, DOUBLE_ON, _encode("Restaurant Bill\n"),
+           DOUBLE_OFF, BOLD_OFF, ALIGN_LEFT]
+    out.append(_encode("\n".join(receipt_body(bill, width)) + "\n"))
+    out += [BOLD_ON, _encode(_two_col("TOTAL", _money(bill["total"]), width) + "\n"), BOLD_OFF]
+    out.append(ESC + b"d\x04")
+    if cut:
+        out.append(PARTIAL_CUT)
+    return b"".join(out)
+
+
+def send_receipt(data, target, name="receipt"):
+    # target: tcp://host:port (network printer), a spool directory, or a device/file path
+    if target.startswith("tcp://"):
+        host, _, port = target[len("tcp://"):].rpartition(":")
+        with socket.create_connection((host, int(port)), timeout=3) as sock:
+            sock.sendall(data)
+        return target
+    if os.path.isdir(target):
+        path = os.path.join(target, f"{name}_{time.time_ns()}.bin")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return path
+    with open(target, "ab") as f:
+        f.write(data)
+    return target
+
+
+def print_receipt(bill, target, width=WIDTH):
+    # returns (destination, latency in milliseconds)
+    start = time.perf_counter()
+    dest = send_receipt(to_escpos(bill, width), target, f"receipt_{bill['order_id']}")
+    return dest, (time.perf_counter() - start) * 1000.0
@@ -0,0 +1,133 @@
+import argparse
+import csv
+import sys
+from utils.db_utils import get_connection, initialize_database
+from utils.exporters import _as_timestamp
+
+# Ad-hoc reports aggregated inside SQLite. Order-level reports are answered from
+# idx_orders_report (timestamp, mode, payment_method, total, subtotal, gst) without
+# touching the orders table. Filtering on items or grouping by item joins
+# order_items through idx_order_items_order_id instead.
+
+GROUPS = {
+    "none": "'all'",
+    "day": "substr(o.timestamp, 1, 10)",
+    "month": "substr(o.timestamp, 1, 7)",
+    "hour": "substr(o.timestamp, 12, 2)",
+    "weekday": "strftime('%w', o.timestamp)",
+    "mode": "o.mode",
+    "payment": "o.payment_method",
+    "item": "i.item_name",
+}
+ORDER_COLUMNS = ["orders", "total_sales", "subtotal", "gst", "avg_ticket"]
+ITEM_COLUMNS = ["orders", "quantity", "revenue"]
+WEEKDAYS = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+
+
+def _in(column, values, where, params):
+    values = [v for v in values or () if v not in (None, "")]
+    if values:
+        where.append(f"{column} IN ({','.join('?' * len(values))})")
+        params.extend(values)
+
+
+def build_report_sql(start=None, end=None, hours=None, weekdays=None, modes=None, payments=None,
+                     items=None, group_by="day"):
+    # returns (sql, params, columns); hours is (first hour, last hour) inclusive, e.g. (19, 21)
+    # for 7-10pm, weekdays are 0=Sunday..6=Saturday
+    if group_by not in GROUPS:
+        raise ValueError(f"Unknown grouping {group_by!r}; use one of {', '.join(GROUPS)}")
+    where, params = [], []
+    if start is not None:
+        where.append("o.timestamp >= ?")
+        params.append(_as_timestamp(start))
+    if end is not None:
+        where.append("o.timestamp < ?")
+        params.append(_as_timestamp(end))
+    if hours is not None:
+        where.append("CAST(substr(o.timestamp, 12, 2) AS INTEGER) BETWEEN ? AND ?")
+        params.extend(int(h) for h in hours)
+    if weekdays:
+        _in("CAST(strftime('%w', o.timestamp) AS INTEGER)", [int(d) for d in weekdays], where, params)
+    _in("o.mode", modes, where, params)
+    _in("o.payment_method", payments, where, params)
+
+    group = GROUPS[group_by]
+    if items or group_by == "item":
+        _in("i.item_name", items, where, params)
+        sql = (f"SELECT {group} AS grp, COUNT(DISTINCT o.order_id), SUM(i.quantity), "
+               f"ROUND(SUM(i.quantity * i.price), 2) "
+               f"FROM orders o JOIN order_items i ON i.order_id = o.order_id")
+        columns = ITEM_COLUMNS
+    else:
+        sql = (f"SELECT {group} AS grp, COUNT(*), ROUND(SUM(o.total), 2), ROUND(SUM(o.subtotal), 2), "
+               f"ROUND(SUM(o.gst), 2), ROUND(AVG(o.total), 2) FROM orders o")
+        columns = ORDER_COLUMNS
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " GROUP BY grp"
+    # biggest first for categorical groups, chronological for time buckets
+    sql += " ORDER BY 3 DESC" if group_by in ("item", "mode", "payment") else " ORDER BY grp"
+    return sql, params, [group_by] + columns
+
+
+def run_report(start=None, end=None, hours=None, weekdays=None, modes=None, payments=None, items=None,
+               group_by="day", conn=None, chunk_size=500):
+    # returns (columns, rows); rows is a generator so callers can show results as they arrive
+    sql, params, columns = build_report_sql(start, end, hours, weekdays, modes, payments, items, group_by)
+    cursor = (conn or get_connection()).execute(sql, params)
+
+    def rows():
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                return
+            for row in chunk:
+                if group_by == "weekday" and row[0] is not None:
+                    row = (WEEKDAYS[int(row[0])],) + tuple(row[1:])
+                yield row
+
+    return columns, rows()
+
+
+def fetch_report(start=None, end=None, hours=None, weekdays=None, modes=None, payments=None, items=None,
+                 group_by="day", progress=None, conn=None, chunk_size=500):
+    # run_report collected into a list, for background jobs (utils.jobs);
+    # progress(rows so far) is called once per chunk
+    columns, rows = run_report(start, end, hours, weekdays, modes, payments, items, group_by, conn, chunk_size)
+    out = []
+    for row in rows:
+        out.append(row)
+        if progress is not None and len(out) % chunk_size == 0:
+            progress(len(out))
+    return columns, out
+
+
+def parse_hours(value):
+    # "19-21" -> (19, 21)
+    first, _, last = value.partition("-")
+    return int(first), int(last or first)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ad-hoc sales report aggregated in SQLite")
+    parser.add_argument("--start", help="first date/timestamp included")
+    parser.add_argument("--end", help="date/timestamp to stop before")
+    parser.add_argument("--hours", help="hour range, inclusive, e.g. 19-21")
+    parser.add_argument("--weekday", action="append", choices=WEEKDAYS, help="repeatable")
+    parser.add_argument("--mode", action="append", help="repeatable")
+    parser.add_argument("--payment", action="append", help="repeatable")
+    parser.add_argument("--item", action="append", help="repeatable")
+    parser.add_argument("--group-by", choices=list(GROUPS), default="day")
+    args = parser.parse_args(argv)
+    initialize_database()
+    columns, rows = run_report(args.start, args.end, parse_hours(args.hours) if args.hours else None,
+                               [WEEKDAYS.index(d) for d in args.weekday or ()], args.mode, args.payment,
+                               args.item, args.group_by)
+    w = csv.writer(sys.stdout)
+    w.writerow(columns)
+    w.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
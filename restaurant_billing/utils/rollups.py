@@ -0,0 +1,214 @@
+import argparse
+import csv
+import os
+from datetime import datetime
+from utils.db_utils import get_connection, transaction, initialize_database
+from utils.calculator import to_paise, from_paise
+
+PERIODS = {
+    "Daily": "%Y-%m-%d",
+    "Weekly": "%Y-W%U",
+    "Monthly": "%Y-%m",
+}
+
+PERIOD_COLUMNS = {"Daily": "date", "Weekly": "year_week", "Monthly": "year_month"}
+
+SUMMARY_COLUMNS = ["orders_count", "total_sales", "subtotal_sum", "gst_sum"]
+
+# item_rollup keeps one row per order mode plus an ALL_MODES row per item;
+# revenue is the line subtotal (qty x price, before GST and discount) in paise
+ALL_MODES = "*"
+TOP_ITEMS_BY = {"quantity": "quantity", "revenue": "revenue_paise"}
+
+_UPSERT_SALES = """
+    INSERT INTO sales_rollup (period_type, period, orders_count, total_sales, subtotal_sum, gst_sum)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(period_type, period) DO UPDATE SET
+        orders_count = orders_count + excluded.orders_count,
+        total_sales = total_sales + excluded.total_sales,
+        subtotal_sum = subtotal_sum + excluded.subtotal_sum,
+        gst_sum = gst_sum + excluded.gst_sum
+"""
+
+_UPSERT_ITEMS = """
+    INSERT INTO item_rollup (period_type, period, mode, item_name, quantity, revenue_paise)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(period_type, period, mode, item_name) DO UPDATE SET
+        quantity = quantity + excluded.quantity,
+        revenue_paise = revenue_paise + excluded.revenue_paise
+"""
+
+
+def create_rollup_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_rollup (
+            period_type TEXT NOT NULL,
+            period TEXT NOT NULL,
+            orders_count INTEGER NOT NULL DEFAULT 0,
+            total_sales REAL NOT NULL DEFAULT 0,
+            subtotal_sum REAL NOT NULL DEFAULT 0,
+            gst_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (period_type, period)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS item_rollup (
+            period_type TEXT NOT NULL,
+            period TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue_paise INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period_type, period, mode, item_name)
+        ) WITHOUT ROWID
+    ''')
+    # top-k is a walk down one of these, k rows whatever the menu size
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_item_rollup_top_quantity "
+                   "ON item_rollup(period_type, period, mode, quantity DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_item_rollup_top_revenue "
+                   "ON item_rollup(period_type, period, mode, revenue_paise DESC)")
+
+
+class _PeriodKeys:
+    # bills cluster on a handful of dates, so parse each date once
+    def __init__(self):
+        self.cache = {}
+
+    def __call__(self, timestamp):
+        day = str(timestamp)[:10]
+        keys = self.cache.get(day)
+        if keys is None:
+            d = datetime.strptime(day, "%Y-%m-%d")
+            keys = self.cache[day] = [(p, d.strftime(fmt)) for p, fmt in PERIODS.items()]
+        return keys
+
+
+def _accumulate(sales, items, keys, order_row, lines, mode):
+    total, subtotal, gst = order_row
+    for key in keys:
+        acc = sales.get(key)
+        if acc is None:
+            acc = sales[key] = [0, 0.0, 0.0, 0.0]
+        acc[0] += 1
+        acc[1] += total or 0.0
+        acc[2] += subtotal or 0.0
+        acc[3] += gst or 0.0
+    _accumulate_items(items, keys, mode, lines)
+
+
+def _accumulate_items(items, keys, mode, lines):
+    modes = (mode or "", ALL_MODES)
+    for key in keys:
+        for m in modes:
+            for item_name, qty, revenue in lines:
+                ikey = key + (m, item_name)
+                acc = items.get(ikey)
+                if acc is None:
+                    acc = items[ikey] = [0, 0]
+                acc[0] += int(qty or 0)
+                acc[1] += revenue
+
+
+def _write(cursor, sales, items):
+    cursor.executemany(_UPSERT_SALES, [k + tuple(v) for k, v in sales.items()])
+    cursor.executemany(_UPSERT_ITEMS, [k + tuple(v) for k, v in items.items()])
+
+
+def apply_bills(cursor, bills):
+    # called inside the order-insert transaction so rollups never drift from orders
+    sales, items = {}, {}
+    period_keys = _PeriodKeys()
+    for b in bills:
+        _accumulate(sales, items, period_keys(b["timestamp"]),
+                    (b["total"], b["subtotal"], b["gst_total"]),
+                    [(it["item_name"], it["quantity"], to_paise(it["line_total"])) for it in b["items"]],
+                    b["mode"])
+    _write(cursor, sales, items)
+
+
+def rebuild_rollups(cursor):
+    create_rollup_tables(cursor)
+    cursor.execute("DELETE FROM sales_rollup")
+    cursor.execute("DELETE FROM item_rollup")
+    sales, items = {}, {}
+    period_keys = _PeriodKeys()
+    conn = cursor.connection
+    for ts, total, subtotal, gst in conn.execute(
+            "SELECT timestamp, total, subtotal, gst FROM orders WHERE timestamp IS NOT NULL"):
+        _accumulate(sales, items, period_keys(ts), (total, subtotal, gst), (), None)
+    for ts, mode, item_name, qty, price in conn.execute(
+            "SELECT o.timestamp, o.mode, i.item_name, i.quantity, i.price FROM order_items i "
+            "JOIN orders o ON o.order_id = i.order_id WHERE o.timestamp IS NOT NULL"):
+        _accumulate_items(items, period_keys(ts), mode, [(item_name, qty, int(qty or 0) * to_paise(price or 0))])
+    _write(cursor, sales, items)
+    return len(sales)
+
+
+def fetch_sales_summary(freq, conn=None):
+    conn = conn or get_connection()
+    return conn.execute(
+        "SELECT period, orders_count, total_sales, subtotal_sum, gst_sum FROM sales_rollup "
+        "WHERE period_type = ? ORDER BY period", (freq,)).fetchall()
+
+
+def write_sales_summary(freq, path, progress=None, conn=None):
+    # the Reports CSV for one period type; returns the row count and writes nothing
+    # when there are no orders
+    rows = fetch_sales_summary(freq, conn)
+    if not rows:
+        return 0
+    tmp = path + ".part"
+    try:
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow([PERIOD_COLUMNS[freq]] + SUMMARY_COLUMNS)
+            for i in range(0, len(rows), 1000):
+                w.writerows(rows[i:i + 1000])
+                if progress is not None:
+                    progress(min(i + 1000, len(rows)), len(rows))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return len(rows)
+
+
+def fetch_item_quantities(freq, period, conn=None):
+    conn = conn or get_connection()
+    return conn.execute(
+        "SELECT item_name, quantity FROM item_rollup WHERE period_type = ? AND period = ? AND mode = ? "
+        "ORDER BY quantity DESC, item_name", (freq, period, ALL_MODES)).fetchall()
+
+
+def period_key(freq, when=None):
+    # the period a date falls in, e.g. period_key("Weekly", "2025-08-14") -> "2025-W32"
+    if when is None:
+        when = datetime.now()
+    elif isinstance(when, str):
+        when = datetime.strptime(when[:10], "%Y-%m-%d")
+    return when.strftime(PERIODS[freq])
+
+
+def top_items(freq, period, mode=ALL_MODES, k=10, by="quantity", conn=None):
+    # [(item_name, quantity, revenue rupees)] for one period and mode ("*" = all modes)
+    conn = conn or get_connection()
+    rows = conn.execute(
+        "SELECT item_name, quantity, revenue_paise FROM item_rollup "
+        "WHERE period_type = ? AND period = ? AND mode = ? "
+        f"ORDER BY {TOP_ITEMS_BY[by]} DESC LIMIT ?", (freq, period, mode, int(k))).fetchall()
+    return [(name, qty, from_paise(revenue)) for name, qty, revenue in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain sales rollup tables")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+    initialize_database()
+    with transaction() as cursor:
+        periods = rebuild_rollups(cursor)
+    print(f"Rebuilt rollups: {periods} periods")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULE = "main_ui"
+BUDGET_MS = 600
+# only needed once a report, PDF or the order service is used; importing any of
+# these while the login window is coming up is a regression
+LAZY_MODULES = ("pandas", "numpy", "fpdf", "CTkMessagebox", "asyncio", "utils.pdf_render",
+                "utils.order_server", "utils.exporters", "utils.report_query")
+
+
+def import_times(module=DEFAULT_MODULE, python=sys.executable):
+    # runs `python -X importtime` in a fresh interpreter; returns
+    # (name, self_us, cumulative_us, depth) in the order the modules finished loading
+    code = (f"import sys; sys.path[:0] = [{os.path.join(ROOT, 'ui')!r}, {ROOT!r}]; "
+            f"import {module}")
+    proc = subprocess.run([python, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode:
+        lines = proc.stderr.strip().splitlines()
+        raise RuntimeError(f"import {module} failed: {lines[-1] if lines else proc.returncode}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        try:
+            self_us, cum_us = int(self_us), int(cum_us)
+        except ValueError:
+            continue  # header line
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), self_us, cum_us, depth))
+    return rows
+
+
+def profile(module=DEFAULT_MODULE, runs=3):
+    # best of several runs; the first one also pays for a cold disk cache
+    best = None
+    for _ in range(max(1, runs)):
+        rows = import_times(module)
+        total = next((cum for name, _, cum, _ in rows if name == module), 0)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    total, rows = best
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    loaded = {name for name, _, _, _ in rows}
+    return {
+        "module": module,
+        "total_ms": total / 1000.0,
+        "rows": rows,
+        "packages": sorted(by_package.items(), key=lambda kv: kv[1], reverse=True),
+        "eager": [m for m in LAZY_MODULES if m in loaded],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup import-time breakdown")
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="module the app imports at launch")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="rows to show per table")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS,
+                        help="fail when importing the module takes longer than this")
+    args = parser.parse_args(argv)
+
+    try:
+        result = profile(args.module, args.runs)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    print(f"import {result['module']}: {result['total_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print("\nby package (self ms):")
+    for pkg, us in result["packages"][:args.top]:
+        print(f"  {us / 1000.0:8.1f}  {pkg}")
+    print("\nslowest modules (cumulative ms):")
+    for name, _, cum, _ in sorted(result["rows"], key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"  {cum / 1000.0:8.1f}  {name}")
+
+    failed = False
+    if result["eager"]:
+        print(f"\nFAIL: imported at startup but should be lazy: {', '.join(result['eager'])}")
+        failed = True
+    if result["total_ms"] > args.budget_ms:
+        print(f"\nFAIL: startup imports over budget by {result['total_ms'] - args.budget_ms:.1f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
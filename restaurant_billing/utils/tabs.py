@@ -0,0 +1,140 @@
+from datetime import datetime
+from utils.billing import RunningTotals, build_bill, make_line
+from utils.db_utils import DB_PATH, get_connection, transaction
+from utils.order_ids import next_order_id, terminal_id_from_env
+
+# Open orders (tables and tabs) held in memory, so switching between them is a dict
+# lookup. Every change becomes a small op written through to open_tabs/open_tab_items,
+# so a crash loses no more than the ops still queued, and load() brings a terminal's
+# tabs back on start-up. The UI hands the ops to its bill writer thread (or the order
+# service) so the Tk thread never waits on the database write lock; tab and line ids
+# come from the order id allocator, so nothing has to be read back.
+# A finished tab becomes an ordinary bill carrying its tab_id; save_bills_to_db
+# deletes the tab in the same transaction that inserts the order.
+
+DEFAULT_TAB = "Counter"
+# columns an "update" op may set
+TAB_FIELDS = ("mode", "payment_method", "discount_pct")
+
+
+def apply_tab_ops(ops, db_path=DB_PATH):
+    # in order, in one transaction. Replaying ops is harmless (ids are fixed by the
+    # terminal), so a client may resend them after a dropped connection
+    with transaction(db_path) as cur:
+        for op in ops:
+            kind = op["op"]
+            if kind == "open":
+                cur.execute("INSERT OR IGNORE INTO open_tabs (tab_id, terminal_id, label, mode, payment_method, "
+                            "discount_pct, opened_at) VALUES (?, ?, ?, ?, ?, 0, ?)",
+                            (op["tab_id"], op["terminal_id"], op["label"], op["mode"], op["payment_method"],
+                             op["opened_at"]))
+            elif kind == "line":
+                cur.execute("INSERT OR IGNORE INTO open_tab_items (id, tab_id, item_name, quantity, price, gst) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (op["id"], op["tab_id"], op["name"], op["qty"], op["price"], op["gst"]))
+            elif kind == "update":
+                changes = {k: v for k, v in op["changes"].items() if k in TAB_FIELDS}
+                if changes:
+                    cur.execute(f"UPDATE open_tabs SET {', '.join(k + ' = ?' for k in changes)} WHERE tab_id = ?",
+                                list(changes.values()) + [op["tab_id"]])
+            elif kind == "close":
+                cur.execute("DELETE FROM open_tabs WHERE tab_id = ?", (op["tab_id"],))
+            else:
+                raise ValueError(f"unknown tab op {kind!r}")
+
+
+class Tab:
+    def __init__(self, tab_id, label, mode="Dine-In", payment_method="Cash", discount_pct=0.0, opened_at=None):
+        self.tab_id = tab_id
+        self.label = label
+        self.mode = mode
+        self.payment_method = payment_method
+        self.discount_pct = discount_pct
+        self.opened_at = opened_at
+        self.lines = []
+        # each line's amount as added, so showing the tab again recomputes nothing
+        self.amounts = []
+        self.totals = RunningTotals()
+
+    def _append(self, line):
+        amount = self.totals.add(line)
+        self.lines.append(line)
+        self.amounts.append(amount)
+        return amount
+
+
+class TabManager:
+    # one per terminal (RBS_TERMINAL_ID); tabs are keyed by label in opening order.
+    # write(ops) persists a list of ops; by default they are applied right here
+
+    def __init__(self, terminal_id=None, db_path=DB_PATH, write=None):
+        if terminal_id is None:
+            terminal_id = terminal_id_from_env()
+        self.terminal_id = terminal_id
+        self.db_path = db_path
+        self.write = write or (lambda ops: apply_tab_ops(ops, db_path))
+        self.tabs = {}
+
+    def load(self):
+        # this terminal's tabs and lines as persisted; returns the tabs
+        conn = get_connection(self.db_path)
+        self.tabs = {}
+        by_id = {}
+        for tab_id, label, mode, payment, discount, opened_at in conn.execute(
+                "SELECT tab_id, label, mode, payment_method, discount_pct, opened_at FROM open_tabs "
+                "WHERE terminal_id = ? ORDER BY tab_id", (self.terminal_id,)):
+            if label in self.tabs:
+                # a tab whose bill never committed, next to a reopened one of the same name
+                label = f"{label} #{tab_id}"
+            self.tabs[label] = by_id[tab_id] = Tab(tab_id, label, mode, payment, discount or 0.0, opened_at)
+        if by_id:
+            for tab_id, name, qty, price, gst in conn.execute(
+                    "SELECT i.tab_id, i.item_name, i.quantity, i.price, i.gst FROM open_tab_items i "
+                    "JOIN open_tabs t ON t.tab_id = i.tab_id WHERE t.terminal_id = ? ORDER BY i.id",
+                    (self.terminal_id,)):
+                by_id[tab_id]._append(make_line(name, qty, price, gst))
+        return list(self.tabs.values())
+
+    def labels(self):
+        return list(self.tabs)
+
+    def get(self, label):
+        return self.tabs.get(label)
+
+    def open(self, label, mode="Dine-In", payment_method="Cash"):
+        # the open tab with this label, or a new empty one
+        tab = self.tabs.get(label)
+        if tab is not None:
+            return tab
+        tab = Tab(next_order_id(), label, mode, payment_method, 0.0, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self.write([{"op": "open", "tab_id": tab.tab_id, "terminal_id": self.terminal_id, "label": label,
+                     "mode": mode, "payment_method": payment_method, "opened_at": tab.opened_at}])
+        self.tabs[label] = tab
+        return tab
+
+    def add_line(self, tab, line):
+        # returns the line amount
+        self.write([dict(line, op="line", id=next_order_id(), tab_id=tab.tab_id)])
+        return tab._append(line)
+
+    def update(self, tab, mode=None, payment_method=None, discount_pct=None):
+        changes = {k: v for k, v in (("mode", mode), ("payment_method", payment_method),
+                                      ("discount_pct", discount_pct))
+                   if v is not None and getattr(tab, k) != v}
+        if not changes:
+            return
+        self.write([{"op": "update", "tab_id": tab.tab_id, "changes": changes}])
+        for k, v in changes.items():
+            setattr(tab, k, v)
+
+    def close(self, tab):
+        # discards the tab and its lines
+        self.write([{"op": "close", "tab_id": tab.tab_id}])
+        self.tabs.pop(tab.label, None)
+
+    def finalize(self, tab, order_id, timestamp=None):
+        # the tab's bill; the tab leaves memory now and the database when the bill commits
+        bill = build_bill(order_id, tab.lines, tab.discount_pct, tab.mode, tab.payment_method, timestamp)
+        bill["tab_id"] = tab.tab_id
+        self.tabs.pop(tab.label, None)
+        return bill
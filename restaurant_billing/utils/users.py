@@ -0,0 +1,43 @@
+import hashlib
+import sqlite3
+from utils.db_utils import get_connection, transaction
+
+# login accounts; the order service creates them when terminals share its database
+
+
+def hash_password(pw):
+    return hashlib.sha256(pw.encode()).hexdigest()
+
+
+def check_login(username, password):
+    cur = get_connection().cursor()
+    cur.execute("SELECT password_hash, role FROM users WHERE username=?", (username,))
+    row = cur.fetchone()
+    return row[1] if row and row[0] == hash_password(password) else None
+
+
+def _users_ready():
+    try:
+        row = get_connection().execute(
+            "SELECT COUNT(*) FROM users WHERE username IN ('admin', 'cashier')").fetchone()
+    except sqlite3.OperationalError:
+        return False
+    return row[0] == 2
+
+
+def setup_users():
+    # read-only check first so a normal start never takes the write lock
+    if _users_ready():
+        return
+    with transaction() as cur:
+        cur.execute('''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password_hash TEXT,
+            role TEXT)''')
+        if not cur.execute("SELECT 1 FROM users WHERE username='admin'").fetchone():
+            cur.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                        ("admin", hash_password("admin123"), "admin"))
+        if not cur.execute("SELECT 1 FROM users WHERE username='cashier'").fetchone():
+            cur.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                        ("cashier", hash_password("cashier123"), "cashier"))
@@ -0,0 +1,148 @@
+import argparse
+import csv
+import random
+from datetime import datetime, timedelta
+from utils.billing import build_bill, make_line
+from utils.order_ids import OrderIdAllocator, EPOCH
+
+# seeded, realistic-looking menus and orders for benchmarks and load tests;
+# the same seed always produces the same menu and the same bills
+
+SIZES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+MENU_BASE = {
+    "Starters": ["Paneer Tikka", "Veg Spring Roll", "Chicken 65", "Gobi Manchurian", "Hara Bhara Kebab",
+                 "Chilli Paneer", "Fish Fingers", "Tandoori Chicken"],
+    "Mains": ["Butter Chicken", "Dal Makhani", "Paneer Butter Masala", "Veg Biryani", "Chicken Biryani",
+              "Mutton Rogan Josh", "Palak Paneer", "Chole Bhature", "Masala Dosa", "Pasta", "Pizza", "Burger"],
+    "Breads": ["Butter Naan", "Garlic Naan", "Tandoori Roti", "Laccha Paratha", "Kulcha"],
+    "Sides": ["Fries", "Jeera Rice", "Raita", "Green Salad", "Papad"],
+    "Desserts": ["Gulab Jamun", "Rasmalai", "Brownie", "Kulfi", "Ice Cream"],
+    "Beverages": ["Coffee", "Masala Chai", "Lassi", "Fresh Lime Soda", "Cold Coffee", "Red bull"],
+}
+PRICE_RANGES = {"Starters": (150, 380), "Mains": (180, 450), "Breads": (30, 90), "Sides": (40, 160),
+                "Desserts": (80, 220), "Beverages": (40, 200)}
+VARIANTS = ["Special", "Jain", "Spicy", "Classic", "Family", "Mini", "Chef's", "Tandoori", "Smoky", "Royal"]
+
+MODES = (["Dine-In", "Takeaway"], [60, 40])
+PAYMENTS = (["Cash", "Card", "UPI"], [35, 25, 40])
+DISCOUNTS = ([0.0, 5.0, 10.0, 15.0], [82, 9, 6, 3])
+LINES_PER_ORDER = ([1, 2, 3, 4, 5, 6], [28, 30, 20, 12, 6, 4])
+QUANTITIES = ([1, 2, 3, 4], [66, 22, 8, 4])
+# share of the day's orders falling in each hour from 11:00 to 23:00; lunch and dinner peaks
+HOURS = (list(range(11, 24)), [5, 9, 12, 10, 5, 3, 3, 5, 9, 13, 12, 8, 6])
+ORDERS_PER_DAY = 400
+
+
+def parse_size(value):
+    value = str(value).strip().lower()
+    if value in SIZES:
+        return SIZES[value]
+    return int(value.replace("_", ""))
+
+
+def generate_menu(n_items=60, seed=0):
+    # dicts with item_name, category, price and gst; the first items are the
+    # plain base dishes, later ones are variants ("Spicy Pasta", ...)
+    rng = random.Random(seed)
+    base = [(name, cat) for cat, names in MENU_BASE.items() for name in names]
+    items, seen = [], set()
+    for i in range(n_items):
+        name, cat = base[i % len(base)]
+        if i >= len(base):
+            name = f"{rng.choice(VARIANTS)} {name}"
+            if name in seen:
+                name = f"{name} {i}"
+        seen.add(name)
+        lo, hi = PRICE_RANGES[cat]
+        gst = 18.0 if cat == "Beverages" and rng.random() < 0.3 else 5.0
+        items.append({"item_name": name, "category": cat, "price": float(rng.randrange(lo, hi + 1, 10)), "gst": gst})
+    return items
+
+
+def write_menu_csv(path, n_items=60, seed=0):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=["item_name", "category", "price", "gst"])
+        w.writeheader()
+        w.writerows(generate_menu(n_items, seed))
+    return path
+
+
+def _day_seconds(rng, count):
+    hours, weights = HOURS
+    return sorted(h * 3600 + rng.randrange(3600) for h in rng.choices(hours, weights, k=count))
+
+
+def generate_bills(n_orders, menu=None, seed=0, start=datetime(2025, 1, 1), terminals=4,
+                   orders_per_day=ORDERS_PER_DAY):
+    # yields bill dicts in bill.json layout, in timestamp order, with order ids
+    # from the real allocator (one per terminal) so they sort and decode like live ones
+    rng = random.Random(seed)
+    menu = menu or generate_menu(seed=seed)
+    by_name = {item["item_name"]: item for item in menu}
+    popularity = list(menu)
+    rng.shuffle(popularity)
+    cum_weights, acc = [], 0.0
+    for rank in range(len(popularity)):
+        acc += 1.0 / (rank + 1) ** 0.8
+        cum_weights.append(acc)
+    now_ms = [0]
+    allocators = [OrderIdAllocator(t, clock=lambda: now_ms[0]) for t in range(terminals)]
+    days = max(1, -(-n_orders // orders_per_day))
+    made = 0
+    for day in range(days):
+        count = min(orders_per_day, n_orders - made)
+        midnight = start + timedelta(days=day)
+        for sec in _day_seconds(rng, count):
+            when = midnight + timedelta(seconds=sec)
+            now_ms[0] = int((when.replace(tzinfo=EPOCH.tzinfo) - EPOCH).total_seconds() * 1000)
+            qty = {}
+            for item in rng.choices(popularity, cum_weights=cum_weights, k=rng.choices(*LINES_PER_ORDER)[0]):
+                # the same dish picked twice becomes one line with a larger quantity
+                qty[item["item_name"]] = qty.get(item["item_name"], 0) + rng.choices(*QUANTITIES)[0]
+            lines = [make_line(name, n, by_name[name]["price"], by_name[name]["gst"]) for name, n in qty.items()]
+            yield build_bill(rng.choice(allocators).next_id(), lines, rng.choices(*DISCOUNTS)[0],
+                             rng.choices(*MODES)[0], rng.choices(*PAYMENTS)[0],
+                             when.strftime("%Y-%m-%d %H:%M:%S"))
+        made += count
+
+
+def batched(bills, size):
+    batch = []
+    for bill in bills:
+        batch.append(bill)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main(argv=None):
+    from utils.exporters import WRITERS, _open_output
+    parser = argparse.ArgumentParser(description="Seeded synthetic menus and orders")
+    sub = parser.add_subparsers(dest="command", required=True)
+    menu = sub.add_parser("menu", help="write a menu CSV")
+    menu.add_argument("out")
+    menu.add_argument("--items", type=int, default=60)
+    menu.add_argument("--seed", type=int, default=0)
+    orders = sub.add_parser("orders", help="write bills as json, ndjson or csv (.gz compresses)")
+    orders.add_argument("out")
+    orders.add_argument("--orders", default="1k", help="count or one of 1k, 100k, 1m")
+    orders.add_argument("--format", choices=sorted(WRITERS), default="ndjson")
+    orders.add_argument("--menu-items", type=int, default=60)
+    orders.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "menu":
+        write_menu_csv(args.out, args.items, args.seed)
+        print(f"Wrote {args.items} menu items to {args.out}")
+        return
+    bills = generate_bills(parse_size(args.orders), generate_menu(args.menu_items, args.seed), args.seed)
+    with _open_output(args.out) as f:
+        count = WRITERS[args.format](bills, f)
+    print(f"Wrote {count} bills to {args.out}")
+
+
+if __name__ == "__main__":
+    main()